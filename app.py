@@ -2,12 +2,8 @@ import os
 import secrets
 from functools import wraps
 from pathlib import Path
-import base64 
-import io
 import json
 
-from PIL import Image 
-
 
 is_production = os.environ.get("INVERBIO_ENV") == "prod" or os.environ.get("INVERBIO_ENV") == "production"
 BASE_DIR = Path(__file__).parent
@@ -26,11 +22,14 @@ else:
     check_setup(required_vars_file=Path("assistant/required_env_vars.txt")) # test
 
 import time
-from flask import Flask, request, jsonify, send_from_directory, abort
+from flask import Flask, request, jsonify, send_from_directory, abort, Response, stream_with_context
 from flask_cors import CORS
 from assistant.agent import Agent
 from assistant.agent_config import AgentConfig
 from assistant.logger import log_execution
+from assistant.streaming import format_sse
+from assistant.utils.image_store import get_image_store
+from assistant.utils.image_preprocess import ImagePreprocessor
 from icecream import ic
 from barcode.barcode import get_product_by_barcode
 API_KEY = os.environ.get("INVERBIO_API_KEY")  
@@ -59,15 +58,7 @@ def require_api_key(route_func):
     return wrapper
 
 
-def _downscale_image(raw: bytes) -> bytes:
-    """ verkleinert Bild auf MAX_SIDE und JPEG_QUAL, sonst unverändert """
-    img = Image.open(io.BytesIO(raw))
-    if max(img.size) <= MAX_SIDE:
-        return raw
-    img.thumbnail((MAX_SIDE, MAX_SIDE), Image.LANCZOS)
-    buf = io.BytesIO()
-    img.save(buf, format="JPEG", quality=JPEG_QUAL)
-    return buf.getvalue()
+image_preprocessor = ImagePreprocessor(max_side=MAX_SIDE, jpeg_quality=JPEG_QUAL)
 
 def _files_to_b64(files):
     pass
@@ -110,28 +101,30 @@ def index():
 #     user = data.get("user", {})
 #     answer, thread_id = agent.chat(content, user)
 #     return jsonify(response=answer, thread_id=thread_id), 200
-@log_execution()
-@app.route("/chat", methods=["POST"])
-@require_api_key
-def chat():
-
+def _parse_chat_request():
+    """
+    Liest den /chat-Payload (JSON oder multipart mit Dateien).
+    :return: (content, user, None) oder (None, None, error_response)
+    """
     if request.content_type and request.content_type.startswith("multipart/"):
         payload_str = request.form.get("payload")
         if not payload_str:
-            return jsonify(error="Form field 'payload' missing."), 400
+            return None, None, (jsonify(error="Form field 'payload' missing."), 400)
 
         try:
             data = json.loads(payload_str)
         except json.JSONDecodeError:
-            return jsonify(error="Invalid JSON in 'payload'."), 400
-
-        # Dateien → Base64‑Data‑URLs
-        images_b64 = []
-        for up in request.files.getlist("files"):
-            raw = up.read()
-            raw = _downscale_image(raw)           # optionales Resize
-            b64 = base64.b64encode(raw).decode()
-            images_b64.append(f"data:{up.mimetype};base64,{b64}")
+            return None, None, (jsonify(error="Invalid JSON in 'payload'."), 400)
+
+        # Dateien → ImageStore-Referenzen (img://sha256/...), kein Base64 im Request-Pfad
+        image_store = get_image_store()
+        uploads = request.files.getlist("files")
+        # Resize parallel (ImagePreprocessor), danach in den Store
+        processed = image_preprocessor.process_many([up.read() for up in uploads])
+        images_b64 = [
+            image_store.put(raw, mime or up.mimetype)
+            for up, (raw, mime) in zip(uploads, processed)
+        ]
 
         # JSON‑Struktur beibehalten
         data.setdefault("content", {}).setdefault("images", []).extend(images_b64)
@@ -143,13 +136,44 @@ def chat():
  
     content = data.get("content") or {}
     if content.get("msg") is None:
-        return jsonify(error="Parameter 'content' with 'msg' is required."), 400
+        return None, None, (jsonify(error="Parameter 'content' with 'msg' is required."), 400)
     raw_barcodes = _get_raw_barcodes_from_content(content)
     content["barcodes"] = raw_barcodes or []
     user = data.get("user", {})
+    return content, user, None
+
+@log_execution()
+@app.route("/chat", methods=["POST"])
+@require_api_key
+def chat():
+    content, user, error = _parse_chat_request()
+    if error:
+        return error
     response, suggestions, thread_id, dev_notes = agent.chat(content, user)
     return jsonify(response=response, suggestions=suggestions, thread_id=thread_id, dev_notes=dev_notes), 200
 
+@log_execution()
+@app.route("/chat/stream", methods=["POST"])
+@require_api_key
+def chat_stream():
+    """
+    Wie /chat, aber als Server-Sent-Events: tool_start/tool_end, token-Deltas der Antwort
+    und zum Schluss ein "final"-Event mit response, suggestions, thread_id und dev_notes.
+    """
+    content, user, error = _parse_chat_request()
+    if error:
+        return error
+
+    def generate():
+        for event in agent.chat_stream(content, user):
+            yield format_sse(event)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @log_execution()
 @app.route("/messages", methods=["GET", "POST"])
 @require_api_key
@@ -161,15 +185,21 @@ def get_messages_by_thread_id():
         return jsonify(error="Parameter 'thread_id' ist erforderlich."), 400
 
     thread_id = data.get("thread_id")
-    t0 = time.time()
-
-    print(f"Agent initialized in {time.time() - t0:.2f}s")
+    try:
+        limit = int(data["limit"]) if data.get("limit") not in (None, "") else None
+        before = int(data["before"]) if data.get("before") not in (None, "") else None
+    except (TypeError, ValueError):
+        return jsonify(error="Parameter 'limit' und 'before' müssen Ganzzahlen sein."), 400
+    if limit is not None and limit <= 0:
+        return jsonify(error="Parameter 'limit' muss größer als 0 sein."), 400
 
     t0 = time.time()
-    messages = agent.get_messages_by_thread_id(thread_id) if thread_id else []
+    messages = agent.get_messages_by_thread_id(thread_id, limit=limit, before=before) if thread_id else []
     print(f"Messages fetched in {time.time() - t0:.2f}s")
 
-    return jsonify(messages=messages), 200
+    # Cursor für die nächste (ältere) Seite
+    next_before = messages[0].get("seq") if (limit and len(messages) == limit and messages) else None
+    return jsonify(messages=messages, next_before=next_before), 200
 @log_execution()
 @app.route("/product_by_barcode", methods=["GET"])
 @require_api_key
@@ -0,0 +1,217 @@
+"""
+ASGI-Einstiegspunkt (Starlette) mit denselben Routen und Verträgen wie app.py
+(/chat, /messages, /product_by_barcode, X-API-Key).
+
+Der Chat läuft über Agent.achat (graph.ainvoke): ein wartender LLM-/Tool-Call belegt
+keinen Worker-Thread, ein Prozess bedient viele Konversationen gleichzeitig.
+Blockierende Aufrufe (User-DB, Barcode-Lookup, Bildverarbeitung) laufen im Thread-Pool.
+
+Start:
+    uvicorn asgi:app --host 0.0.0.0 --port 8000
+"""
+import json
+import os
+import secrets
+import time
+from functools import wraps
+from pathlib import Path
+
+is_production = os.environ.get("INVERBIO_ENV") == "prod" or os.environ.get("INVERBIO_ENV") == "production"
+BASE_DIR = Path(__file__).resolve().parent
+os.environ["BASE_DIR"] = str(BASE_DIR)
+if is_production:
+    from setup_assistant import check_setup
+    check_setup(required_vars_file=BASE_DIR / "assistant" / "required_env_vars.txt")
+else:
+    from assistant.utils.env_check import load_and_check_env
+    load_and_check_env()
+    from setup_assistant import check_setup
+    check_setup(required_vars_file=Path("assistant/required_env_vars.txt"))
+
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse as StarletteJSONResponse
+from starlette.routing import Route
+
+from assistant.agent import Agent
+from assistant.agent_config import AgentConfig
+from assistant.logger import log_execution
+from assistant.utils.image_preprocess import ImagePreprocessor
+from assistant.utils.image_store import get_image_store
+from barcode.barcode import get_product_by_barcode
+
+API_KEY = os.environ.get("INVERBIO_API_KEY")
+MAX_SIDE   = 1280      # for image resize
+JPEG_QUAL  = 85        # for image resize
+
+class JSONResponse(StarletteJSONResponse):
+    """
+    JSONResponse mit Fallback-Serializer: DuckDB-Zeilen enthalten Decimal/datetime,
+    die der Starlette-Standard nicht kann (Flask-jsonify in app.py schon).
+    """
+
+    def render(self, content) -> bytes:
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+                          default=str).encode("utf-8")
+
+
+image_preprocessor = ImagePreprocessor(max_side=MAX_SIDE, jpeg_quality=JPEG_QUAL)
+agent_config = AgentConfig.as_default()
+agent = Agent(agent_config)
+
+
+def require_api_key(route_func):
+    @wraps(route_func)
+    async def wrapper(request: Request):
+        #  Preflight-Anfragen (OPTIONS) nicht blockieren:
+        if request.method == "OPTIONS":
+            return await route_func(request)
+
+        key = request.headers.get("X-API-Key")
+        if key and API_KEY and secrets.compare_digest(key, API_KEY):
+            return await route_func(request)
+
+        return JSONResponse({"error": "Invalid or missing API key"}, status_code=401)
+    return wrapper
+
+
+def _error(msg: str, status_code: int = 400) -> JSONResponse:
+    return JSONResponse({"error": msg}, status_code=status_code)
+
+
+def _get_raw_barcodes_from_content(content: dict) -> list[str] | None:
+    """ Extrahiert die Barcodes aus dem gegebenen Content-Dictionary. """
+    barcodes = content.get("barcodes", [])
+    raw_barcodes = []
+    for barcode in barcodes:
+        if barcode.get("exists", False):
+            product = barcode.get("product", {})
+            raw_barcodes.append(product.get("barcode",  product.get("Barcode")))
+    return raw_barcodes
+
+
+def _store_uploads(raws: list, mimetypes: list) -> list:
+    processed = image_preprocessor.process_many(raws)
+    image_store = get_image_store()
+    return [image_store.put(raw, mime or up_mime) for (raw, mime), up_mime in zip(processed, mimetypes)]
+
+
+async def _read_json(request: Request) -> dict:
+    # wie Flask get_json(silent=True)
+    try:
+        data = await request.json()
+    except (ValueError, UnicodeDecodeError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+async def _parse_chat_request(request: Request):
+    """
+    Liest den /chat-Payload (JSON oder multipart mit Dateien), analog zu app._parse_chat_request.
+    :return: (content, user, None) oder (None, None, error_response)
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/"):
+        form = await request.form()
+        payload_str = form.get("payload")
+        if not payload_str:
+            return None, None, _error("Form field 'payload' missing.")
+        try:
+            data = json.loads(payload_str)
+        except json.JSONDecodeError:
+            return None, None, _error("Invalid JSON in 'payload'.")
+
+        uploads = [up for up in form.getlist("files") if hasattr(up, "read")]
+        raws = [await up.read() for up in uploads]
+        refs = await run_in_threadpool(_store_uploads, raws, [up.content_type for up in uploads])
+        data.setdefault("content", {}).setdefault("images", []).extend(refs)
+    else:
+        data = await _read_json(request)
+
+    content = data.get("content") or {}
+    if content.get("msg") is None:
+        return None, None, _error("Parameter 'content' with 'msg' is required.")
+    raw_barcodes = _get_raw_barcodes_from_content(content)
+    content["barcodes"] = raw_barcodes or []
+    user = data.get("user", {})
+    return content, user, None
+
+
+@require_api_key
+@log_execution()
+async def chat(request: Request):
+    content, user, error = await _parse_chat_request(request)
+    if error:
+        return error
+    response, suggestions, thread_id, dev_notes = await agent.achat(content, user)
+    return JSONResponse(dict(response=response, suggestions=suggestions, thread_id=thread_id, dev_notes=dev_notes))
+
+
+@require_api_key
+@log_execution()
+async def get_messages_by_thread_id(request: Request):
+    # POST -> JSON-Body, GET -> Query-Params
+    data = await _read_json(request) if request.method == "POST" else request.query_params
+    if not data or "thread_id" not in data:
+        return _error("Parameter 'thread_id' ist erforderlich.")
+
+    thread_id = data.get("thread_id")
+    try:
+        limit = int(data["limit"]) if data.get("limit") not in (None, "") else None
+        before = int(data["before"]) if data.get("before") not in (None, "") else None
+    except (TypeError, ValueError):
+        return _error("Parameter 'limit' und 'before' müssen Ganzzahlen sein.")
+    if limit is not None and limit <= 0:
+        return _error("Parameter 'limit' muss größer als 0 sein.")
+
+    t0 = time.time()
+    messages = (
+        await run_in_threadpool(agent.get_messages_by_thread_id, thread_id, limit=limit, before=before)
+        if thread_id else []
+    )
+    print(f"Messages fetched in {time.time() - t0:.2f}s")
+
+    # Cursor für die nächste (ältere) Seite
+    next_before = messages[0].get("seq") if (limit and len(messages) == limit and messages) else None
+    return JSONResponse(dict(messages=messages, next_before=next_before))
+
+
+@require_api_key
+@log_execution()
+async def get_product_by_barcode_route(request: Request):
+    barcode = request.query_params.get("barcode")
+    if not barcode:
+        return _error("Parameter 'barcode' ist erforderlich.")
+
+    product = await run_in_threadpool(get_product_by_barcode, barcode)
+    if not product:
+        return JSONResponse(dict(exists=False, product={}))
+
+    return JSONResponse(dict(exists=True, product=product))
+
+
+app = Starlette(
+    routes=[
+        Route("/chat", chat, methods=["POST"]),
+        Route("/messages", get_messages_by_thread_id, methods=["GET", "POST"]),
+        Route("/product_by_barcode", get_product_by_barcode_route, methods=["GET"]),
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=["*"],
+            allow_methods=["*"],
+            allow_headers=["Content-Type", "X-API-Key"],
+        ),
+    ],
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    os.environ["INVERBIO_ENV"] = "dev"
+    uvicorn.run(app, host="127.0.0.1", port=8000)
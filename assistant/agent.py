@@ -1,4 +1,5 @@
 import os
+import asyncio
 from langchain_openai import ChatOpenAI
 from sympy import content
 from assistant import state
@@ -6,7 +7,9 @@ from assistant.llm_factory import get_llm
 from assistant.image_utils import create_msg_with_img
 from langgraph.prebuilt import ToolNode, tools_condition
 from assistant.state import ComplexState, get_checkpoint, get_value_from_state
+from assistant.checkpointers.async_bridge import ThreadedAsyncSaver
 from assistant.summary import check_summary, summarize_conversation
+from assistant.summary_worker import SummaryWorker
 from barcode.barcode import _normalize_barcodes
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.state import CompiledStateGraph
@@ -14,36 +17,81 @@ from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, Remo
 from langchain_core.prompts import PromptTemplate, ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 from assistant.schemas import AgentResponseFormat
-from assistant.logger import log_execution
+from assistant.logger import log_execution, get_assistant_logger, import_tool_logs_into_store
 from pathlib import Path
 import uuid
-from typing import Iterable, Tuple
+from typing import Iterable, Iterator, Tuple
 from assistant.user.database import get_user_db
 from langsmith import Client
 from assistant.tools import get_farmely_tools, get_retriever_tool, get_tool
+from assistant.tools.tool_cache import get_tool_result_cache
 import json
 from langgraph.types import StateSnapshot
 from assistant.image_utils import _encode_image, _decode_image
 from typing import List, Dict, Any, Literal, Optional
 import requests
+import threading
+import contextlib
+from concurrent.futures import Future, ThreadPoolExecutor
 import time
 import datetime
 from icecream import ic
-from assistant.agent_config import AgentConfig
+from assistant.agent_config import AgentConfig, DEFAULT_HISTORY_IMAGE_MODE, DEFAULT_IMAGE_STORE, DEFAULT_SUMMARY_MODE
 from barcode.barcode import get_product_by_barcode, get_products_by_barcodes
 import pytz
 from pydantic import ValidationError
 from assistant.suggestion_utils import _collect_all_suggestions, _make_suggestions_msg_all
-from assistant.prompt_utils import get_prompt_template_with_placeholders
+from assistant.prompt_utils import get_prompt_template
 from assistant.logger import LocalToolLogger
+from assistant.streaming import ResponseFieldStreamer, chunk_text
+from assistant.parallel_tools import ParallelToolNode, ToolTimings, TOOL_TIMINGS_KEY
+from assistant.utils.image_cache import get_image_thumbnail_cache
+from assistant.utils.image_store import get_image_store, is_image_ref, resolve_image_refs
+from collections import OrderedDict
+
+BERLIN_TZ = pytz.timezone('Europe/Berlin')
+SYSTEM_MSG_CACHE_SIZE = 256
+
 class Agent:
     def __init__(self, config:AgentConfig = None):
         self.config = config or AgentConfig.as_default()
         self.graph = None
+        self.async_graph = None
+        self._checkpointer = None
         self.user_db = get_user_db(self.config.get("user_db", "sqlite"), data_source_from_env=True)
+        # alte JSONL-Tool-Logs einmalig beim Start in den Store übernehmen (nicht pro Turn/Request)
+        if self.config.get("tool_store_file", "logs/tool_runs.sqlite"):
+            import_tool_logs_into_store(
+                self.config.get("tool_logfile", "logs/tool_logs.jsonl"),
+                self.config.get("tool_store_file", "logs/tool_runs.sqlite"),
+            )
         self.langsmith_client = Client()
-        self.current_system_msg = None
-        self._last_system_msg_fetch = None
+        # System-Message: Template + Format-Instructions einmal laden, Render-Cache pro (user_name, Minute)
+        self._system_template: str = ""
+        self._format_instructions: str = ""
+        self._system_msg_cache: "OrderedDict[tuple, List[SystemMessage]]" = OrderedDict()
+        self._system_msg_lock = threading.Lock()
+        self._static_system_msg: List[SystemMessage] = []
+        self.load_prompt_templates()
+        self._prompt_cache_lock = threading.Lock()
+        self._prompt_cache_stats: Dict[str, Any] = {
+            "calls": 0, "calls_hit": 0, "calls_miss": 0,
+            "input_tokens": 0, "cached_tokens": 0,
+            "latency_s_hit": 0.0, "latency_s_miss": 0.0,
+        }
+        # LLM-Client, Tools (inkl. Chroma-Retriever) und Formatter werden einmal gebaut und wiederverwendet
+        self._llm_lock = threading.RLock()
+        self._tools: Optional[List[Any]] = None
+        self._llm_and_tools: Optional[Tuple[tuple, ChatOpenAI, List[Any]]] = None
+        self._formatter_llms: Dict[tuple, Any] = {}
+        # Zusammenfassung im Hintergrund statt im Request-Pfad (config `summary_mode`)
+        self.summary_worker: Optional[SummaryWorker] = (
+            SummaryWorker(self.get_graph) if self._summary_in_background() else None
+        )
+        # Transcript-Append nach der Antwort (ein Worker: Turns werden in Reihenfolge geschrieben)
+        self._transcript_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript")
+        self._transcript_pending: Dict[str, Future] = {}
+        self._transcript_lock = threading.Lock()
 
     def get_langsmith_client(self) -> Client:
         return self.langsmith_client
@@ -51,19 +99,56 @@ class Agent:
     def get_prompt_from_langsmith(self, prompt_identifier: str) -> ChatPromptTemplate:
         return self.langsmith_client.pull_prompt(prompt_identifier)
 
-    def init_llm_and_tools(self) -> Tuple[ChatOpenAI, List[Any]]:
+    def get_tools(self, force_reload: bool = False) -> List[Any]:
+        """
+        Farmely-Tools (Chroma-Client, Embeddings, ...) einmal pro Agent bauen.
+        Dieselben Instanzen werden an das LLM gebunden und im ToolNode genutzt.
+        """
+        with self._llm_lock:
+            if force_reload or self._tools is None:
+                self._tools = get_farmely_tools(cache=self.config.get("tool_cache", True))
+            return self._tools
+
+    def init_llm_and_tools(self, force_reload: bool = False) -> Tuple[ChatOpenAI, List[Any]]:
+        """
+        Liefert das an die Tools gebundene LLM. Wird nur neu gebaut, wenn sich
+        llm_provider/llm_model in der Config geändert haben oder force_reload gesetzt ist.
+        """
         llm_provider = self.config.get("llm_provider", "openai")
         llm_model = self.config.get("llm_model", "gpt-5-mini")
-        llm: ChatOpenAI = get_llm(llm_provider, llm_model)
-        tools = get_farmely_tools()
-        llm = llm.bind_tools(tools, tool_choice="auto")
+        key = (llm_provider, llm_model)
+        with self._llm_lock:
+            if force_reload or self._llm_and_tools is None or self._llm_and_tools[0] != key:
+                llm: ChatOpenAI = get_llm(llm_provider, llm_model)
+                tools = self.get_tools(force_reload=force_reload)
+                llm = llm.bind_tools(tools, tool_choice="auto")
+                self._llm_and_tools = (key, llm, tools)
+            _, llm, tools = self._llm_and_tools
         return llm, tools
+
+    def reload_llm_and_tools(self) -> None:
+        """
+        Explizites Neuladen nach Config-Änderungen (Modell, Tools, Vector Store).
+        Baut auch die Graphen (sync und async) neu, damit der ToolNode die neuen Tools nutzt.
+        """
+        with self._llm_lock:
+            self._formatter_llms.clear()
+            self.load_prompt_templates()
+            self.init_llm_and_tools(force_reload=True)
+            if self.graph is not None:
+                self.graph = self.create_graph()
+            if self.async_graph is not None:
+                self.async_graph = self.create_graph(use_async=True)
+
     def init_formatter_llm(self, format_cls=AgentResponseFormat):
-   
-        llm = get_llm(self.config.get("llm_provider","openai"),
-                      "gpt-5-nano")
-                    # self.config.get("llm_model","gpt-5-nano")) # TODO SPECIFY AS PARAMETER
-        return llm.with_structured_output(format_cls)
+        key = (self.config.get("llm_provider", "openai"), "gpt-5-nano", format_cls)
+        with self._llm_lock:
+            if key not in self._formatter_llms:
+                llm = get_llm(self.config.get("llm_provider","openai"),
+                              "gpt-5-nano")
+                            # self.config.get("llm_model","gpt-5-nano")) # TODO SPECIFY AS PARAMETER
+                self._formatter_llms[key] = llm.with_structured_output(format_cls)
+            return self._formatter_llms[key]
     def _format_products_for_prompt(self, products):
         if not products:
             return ""
@@ -152,28 +237,58 @@ class Agent:
     #             output_schema   = output_schema,
     #         ).to_messages()
     #     return base_sys 
+    def load_prompt_templates(self) -> None:
+        """
+        Liest das System-Prompt-Template und die JSON-Format-Instructions einmalig ein
+        (beim Start bzw. explizit nach Änderungen am Prompt).
+        """
+        template = get_prompt_template("assistant_system_message")
+        format_instructions = self.get_format_instructions()
+        # Prompt-Cache-Layout: volatile Platzhalter verweisen auf die spätere RUNTIME-CONTEXT-Message
+        static_content = template.format(
+            user_name="<RUNTIME-CONTEXT: user_name>",
+            current_day="<RUNTIME-CONTEXT: current_day>",
+            current_time="<RUNTIME-CONTEXT: current_time>",
+            output_schema=format_instructions,
+        )
+        with self._system_msg_lock:
+            self._system_template = template
+            self._format_instructions = format_instructions
+            self._static_system_msg = [SystemMessage(content=static_content, additional_kwargs={"internal": True})]
+            self._system_msg_cache.clear()
+
+    def get_static_system_message(self) -> List[SystemMessage]:
+        """System-Message ohne volatile Teile (byte-stabil für Provider-Prompt-Caching)."""
+        return self._static_system_msg
+
     @log_execution()
-    def get_system_message(self, state: ComplexState) -> SystemMessage:
-        # fetch system message every 15 minutes -> for TdN set to 1 Min. So its nearly on time
-        if not self._last_system_msg_fetch or (time.time() - self._last_system_msg_fetch) > 60:
-            berlin_tz = pytz.timezone('Europe/Berlin')
-            now_berlin = datetime.datetime.now(berlin_tz)
-
-            current_day = now_berlin.strftime("%A, %d.%m.%Y")
-            current_time = now_berlin.strftime("%H:%M")
-            output_schema = self.get_format_instructions()
-            template = get_prompt_template_with_placeholders(
-                "assistant_system_message",
-                user_name=state["user"].get("name", "Anonym"),
-                current_day=current_day,
-                current_time=current_time,
-                output_schema=output_schema,
-            )
-            system_msg = [SystemMessage(content=template, additional_kwargs={"internal": True})]
-            self.current_system_msg = system_msg
-            self._last_system_msg_fetch = time.time()
-        else:
-            system_msg = self.current_system_msg
+    def get_system_message(self, state: ComplexState) -> List[SystemMessage]:
+        # Cache pro (user_name, Tag, Minute): korrekte Prompts pro User, Uhrzeit minutengenau
+        now_berlin = datetime.datetime.now(BERLIN_TZ)
+        current_day = now_berlin.strftime("%A, %d.%m.%Y")
+        current_time = now_berlin.strftime("%H:%M")
+        user_name = (state.get("user") or {}).get("name", "Anonym")
+        key = (user_name, current_day, current_time)
+
+        with self._system_msg_lock:
+            system_msg = self._system_msg_cache.get(key)
+            if system_msg is not None:
+                self._system_msg_cache.move_to_end(key)
+                return system_msg
+            template = self._system_template
+            output_schema = self._format_instructions
+
+        content = template.format(
+            user_name=user_name,
+            current_day=current_day,
+            current_time=current_time,
+            output_schema=output_schema,
+        )
+        system_msg = [SystemMessage(content=content, additional_kwargs={"internal": True})]
+        with self._system_msg_lock:
+            self._system_msg_cache[key] = system_msg
+            while len(self._system_msg_cache) > SYSTEM_MSG_CACHE_SIZE:
+                self._system_msg_cache.popitem(last=False)
         return system_msg
     def _remap_tool_call_ids_for_openai(self, messages):
         """Mappt ToolMessage.tool_call_id (call_*) auf die von OpenAI erwarteten fc_* IDs."""
@@ -189,13 +304,29 @@ class Agent:
             else:
                 out.append(m)
         return out
-    @log_execution()
-    def respond(self, state: ComplexState):
-
-
-        system_message = self.get_system_message(state)
-
+    def get_runtime_context_message(self, state: ComplexState) -> List[SystemMessage]:
+        """
+        Volatile Teile des System-Prompts (Datum, Uhrzeit, User-Name) als eigene Message.
+        Wird nur im Prompt-Cache-Layout genutzt und steht hinter dem statischen Präfix.
+        """
+        now_berlin = datetime.datetime.now(BERLIN_TZ)
+        payload = {
+            "current_day":  now_berlin.strftime("%A, %d.%m.%Y"),
+            "current_time": now_berlin.strftime("%H:%M"),
+            "user_name":    (state.get("user") or {}).get("name", "Anonym"),
+        }
+        return [SystemMessage(
+            content=f"<RUNTIME-CONTEXT>\n{json.dumps(payload, ensure_ascii=False)}\n</RUNTIME-CONTEXT>",
+            additional_kwargs={"internal": True}
+        )]
 
+    def build_messages_for_llm(self, state: ComplexState) -> Tuple[List[Any], HumanMessage]:
+        """
+        Baut die Message-Liste für das Tool-LLM.
+        Mit `prompt_cache_layout` bleibt der Präfix (Instruktionen, Output-Schema, Tools, Verlauf)
+        byte-stabil, damit der Provider-Prompt-Cache greift; alles Volatile steht dahinter.
+        """
+        cache_layout = bool(self.config.get("prompt_cache_layout", False))
 
         history_raw = state["messages"]
 
@@ -241,21 +372,118 @@ class Agent:
             )
             cur_ctx_msg = [cur_ctx_msg]
 
-        messages_for_llm = (
-            system_message +
-            summary_msg +
-            gen_ctx_msg +
-            history_before_last +
-            ( [suggestions_msg] if suggestions_msg else [] ) +
-            cur_ctx_msg +   #  Current Context direkt vor User
-            [last_user] + # last user message
-            history_after_last # required for tool calls to work properly
+        if cache_layout:
+            messages_for_llm = (
+                self.get_static_system_message() +   # byte-stabil: Instruktionen + Output-Schema
+                history_before_last +
+                # ab hier volatil
+                summary_msg +
+                gen_ctx_msg +
+                ( [suggestions_msg] if suggestions_msg else [] ) +
+                self.get_runtime_context_message(state) +
+                cur_ctx_msg +
+                [last_user] +
+                history_after_last
+            )
+        else:
+            messages_for_llm = (
+                self.get_system_message(state) +
+                summary_msg +
+                gen_ctx_msg +
+                history_before_last +
+                ( [suggestions_msg] if suggestions_msg else [] ) +
+                cur_ctx_msg +   #  Current Context direkt vor User
+                [last_user] + # last user message
+                history_after_last # required for tool calls to work properly
+            )
+        return messages_for_llm, last_user
+
+    def _record_prompt_cache_usage(self, ai: AIMessage, latency_s: float) -> Dict[str, Any]:
+        """
+        Liest gecachte Prompt-Tokens aus den Response-Metadaten und loggt Hit-Rate/Latenz.
+        """
+        usage = getattr(ai, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens")
+        cached_tokens = (usage.get("input_token_details") or {}).get("cache_read")
+        if cached_tokens is None:
+            # Fallback: rohe OpenAI-Metadaten (Chat Completions)
+            token_usage = (getattr(ai, "response_metadata", None) or {}).get("token_usage") or {}
+            cached_tokens = (token_usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+            if input_tokens is None:
+                input_tokens = token_usage.get("prompt_tokens")
+        input_tokens = int(input_tokens or 0)
+        cached_tokens = int(cached_tokens or 0)
+
+        with self._prompt_cache_lock:
+            st = self._prompt_cache_stats
+            st["calls"] += 1
+            st["input_tokens"] += input_tokens
+            st["cached_tokens"] += cached_tokens
+            bucket = "latency_s_hit" if cached_tokens else "latency_s_miss"
+            st[bucket] += latency_s
+            st["calls_hit" if cached_tokens else "calls_miss"] += 1
+
+        usage_rec = {
+            "layout": "cache" if self.config.get("prompt_cache_layout", False) else "default",
+            "input_tokens": input_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_hit_ratio": (cached_tokens / input_tokens) if input_tokens else 0.0,
+            "latency_s": latency_s,
+        }
+        get_assistant_logger().info(
+            "prompt_cache layout=%s input_tokens=%d cached_tokens=%d hit_ratio=%.2f latency=%.2fs",
+            usage_rec["layout"], input_tokens, cached_tokens, usage_rec["cache_hit_ratio"], latency_s,
         )
-        
+        return usage_rec
+
+    def get_prompt_cache_stats(self) -> Dict[str, Any]:
+        """
+        Aggregierte Prompt-Cache-Metriken seit Start. `saved_input_token_equivalents` schätzt die
+        Kostenersparnis über den Rabatt auf gecachte Tokens (config `prompt_cache_discount`, Default 0.9).
+        """
+        discount = float(self.config.get("prompt_cache_discount", 0.9))
+        with self._prompt_cache_lock:
+            st = dict(self._prompt_cache_stats)
+        return {
+            **st,
+            "cache_hit_ratio": (st["cached_tokens"] / st["input_tokens"]) if st["input_tokens"] else 0.0,
+            "avg_latency_s_hit": (st["latency_s_hit"] / st["calls_hit"]) if st["calls_hit"] else None,
+            "avg_latency_s_miss": (st["latency_s_miss"] / st["calls_miss"]) if st["calls_miss"] else None,
+            "saved_input_token_equivalents": st["cached_tokens"] * discount,
+        }
+
+    def get_tool_cache_stats(self) -> Dict[str, Any]:
+        """Treffer/Fehlschläge pro Tool im ToolResultCache."""
+        return get_tool_result_cache().stats()
+
+    @log_execution()
+    def respond(self, state: ComplexState):
+        messages_for_llm, last_user = self.build_messages_for_llm(state)
+
         llm, _  = self.init_llm_and_tools()
 
-        raw_ai: AIMessage = llm.invoke(messages_for_llm)
- 
+        _start = time.perf_counter()
+        # Bild-Referenzen erst hier in data-URLs auflösen (Checkpoint enthält nur Referenzen)
+        raw_ai: AIMessage = llm.invoke(resolve_image_refs(messages_for_llm))
+        self._record_prompt_cache_usage(raw_ai, time.perf_counter() - _start)
+
+        return {
+            "messages": [raw_ai],
+            "messages_history": [last_user],
+        }
+
+    @log_execution()
+    async def arespond(self, state: ComplexState):
+        """Wie respond(), aber mit llm.ainvoke (Knoten des Async-Graphen)."""
+        messages_for_llm, last_user = self.build_messages_for_llm(state)
+
+        llm, _  = self.init_llm_and_tools()
+
+        _start = time.perf_counter()
+        # Referenzen auflösen liest ggf. Dateien -> nicht im Event-Loop
+        resolved = await asyncio.to_thread(resolve_image_refs, messages_for_llm)
+        raw_ai: AIMessage = await llm.ainvoke(resolved)
+        self._record_prompt_cache_usage(raw_ai, time.perf_counter() - _start)
 
         return {
             "messages": [raw_ai],
@@ -356,17 +584,8 @@ class Agent:
         # --- Produkte lookup (best effort) ---
         mentioned = []
         try:
-            if len(barcodes) == 1:
-                product = get_product_by_barcode(barcodes[0])
-                if product:
-                    mentioned.append(product)
-            else:
-                products = get_products_by_barcodes(barcodes)
-                if products:
-                    if isinstance(products, dict):
-                        mentioned.extend(products.values())
-                    else:
-                        mentioned.extend(products)
+            # eine Query für alle Barcodes, Reihenfolge bleibt erhalten
+            mentioned.extend(get_products_by_barcodes(barcodes))
         except Exception as e:
             # Nicht crashen, wir fügen dann nur die Barcode-Note hinzu
             pass
@@ -503,20 +722,43 @@ class Agent:
     #     graph = agent_flow.compile(checkpointer=cp)
 
     #     return graph
-    def create_graph(self) -> CompiledStateGraph:
+    @staticmethod
+    def _in_thread(func):
+        """Sync-Knoten als Coroutine, die im Thread-Pool läuft (DB-/HTTP-I/O blockiert nicht den Event-Loop)."""
+        async def node(state: ComplexState):
+            return await asyncio.to_thread(func, state)
+        node.__name__ = getattr(func, "__name__", "node")
+        return node
+
+    def create_graph(self, use_async: bool = False) -> CompiledStateGraph:
+        """
+        :param use_async: Graph für ainvoke – respond nutzt llm.ainvoke, die übrigen Sync-Knoten
+                          laufen per asyncio.to_thread, der Checkpointer über ThreadedAsyncSaver.
+        """
         agent_flow = StateGraph(ComplexState)
+        node = self._in_thread if use_async else (lambda f: f)
 
         # --------- Nodes, die nichts mit Tools zu tun haben ----------
-        agent_flow.add_node("load_user_profile", self.load_user_profile)
-        agent_flow.add_node("extract_context",   self.extract_context)
-        agent_flow.add_node("respond",             self.respond)            # LLM / Tool-Caller
-        agent_flow.add_node("format_output",     self.format_output)    # structured output
-        agent_flow.add_node("summarize_conversation", summarize_conversation)
+        agent_flow.add_node("load_user_profile", node(self.load_user_profile))
+        agent_flow.add_node("extract_context",   node(self.extract_context))
+        agent_flow.add_node("respond",           self.arespond if use_async else self.respond)  # LLM / Tool-Caller
+        agent_flow.add_node("format_output",     node(self.format_output))    # structured output
+        agent_flow.add_node("summarize_conversation", node(summarize_conversation))
 
         # --------- EIN ToolNode für alle Farmely-Tools ----------
-        tools = get_farmely_tools()                    # liefert [rag_tool, stock_tool, …]
-        tool_node = ToolNode(tools)
-        agent_flow.add_node("custom_tools", tool_node)
+        tools = self.get_tools()                       # liefert [rag_tool, stock_tool, …]
+        if self.config.get("parallel_tools", True):
+            # unabhängige Tool-Calls eines Turns parallel, mit Limit pro Tool und Timeout
+            tool_node = ParallelToolNode(
+                tools,
+                concurrency=self.config.get("tool_concurrency", {}),
+                default_concurrency=self.config.get("tool_default_concurrency", 4),
+                timeout_s=self.config.get("tool_timeout_s", 30),
+                max_workers=self.config.get("tool_max_workers", 8),
+            )
+            agent_flow.add_node("custom_tools", tool_node.ainvoke if use_async else tool_node)
+        else:
+            agent_flow.add_node("custom_tools", ToolNode(tools))
 
         # --------- Routing ----------
         agent_flow.set_entry_point("load_user_profile")
@@ -540,26 +782,65 @@ class Agent:
         agent_flow.add_edge("custom_tools", "respond")
 
         # --------- Zusammenfassung nach dem Formatieren ----------
-        agent_flow.add_conditional_edges(
-            "format_output",
-            check_summary,
-            {
-                "summarize_conversation": "summarize_conversation",
-                END:                      END,
-            }
-        )
+        if self._summary_in_background():
+            # SummaryWorker schreibt das Ergebnis später als "summarize_conversation" in den Checkpoint
+            agent_flow.add_edge("format_output", END)
+        else:
+            agent_flow.add_conditional_edges(
+                "format_output",
+                check_summary,
+                {
+                    "summarize_conversation": "summarize_conversation",
+                    END:                      END,
+                }
+            )
         agent_flow.add_edge("summarize_conversation", END)
 
         # --------- Compile ----------
-        cp = get_checkpoint(type=self.config.get("checkpoint_type", "sqlite"))
-        graph = agent_flow.compile(checkpointer=cp)
+        cp = self.get_checkpointer()
+        graph = agent_flow.compile(checkpointer=ThreadedAsyncSaver(cp) if use_async else cp)
 
         return graph
+
+    def get_checkpointer(self):
+        # ein Checkpointer (eine DB-Verbindung) für Sync- und Async-Graph
+        if self._checkpointer is None:
+            self._checkpointer = get_checkpoint(type=self.config.get("checkpoint_type", "sqlite"))
+        return self._checkpointer
+    def _summary_in_background(self) -> bool:
+        return self.config.get("summary_mode", DEFAULT_SUMMARY_MODE) == "background"
+
+    def _thread_lock(self, thread_id: str):
+        """Hält einen Turn exklusiv gegenüber dem Summary-Worker (nur im Hintergrund-Modus)."""
+        if self.summary_worker is None:
+            return contextlib.nullcontext()
+        return self.summary_worker.thread_lock(thread_id)
+
+    def _athread_lock(self, thread_id: str):
+        if self.summary_worker is None:
+            return contextlib.nullcontext()
+        return self.summary_worker.athread_lock(thread_id)
+
+    def _schedule_summary(self, thread_id: str, result: dict) -> None:
+        if self.summary_worker is None or not result:
+            return
+        if check_summary(result) == "summarize_conversation":
+            self.summary_worker.submit(thread_id)
+
+    def get_summary_metrics(self) -> Dict[str, Any]:
+        """Queue-Tiefe, Lag und Zähler des Summary-Workers (leer im Inline-Modus)."""
+        return self.summary_worker.metrics() if self.summary_worker else {}
+
     def get_graph(self, force_new=False) -> CompiledStateGraph:
         if force_new or self.graph is None:
             self.graph = self.create_graph()
         return self.graph
 
+    def get_async_graph(self, force_new=False) -> CompiledStateGraph:
+        if force_new or self.async_graph is None:
+            self.async_graph = self.create_graph(use_async=True)
+        return self.async_graph
+
     def show_history(self, state: ComplexState):
         history = state.values.get("messages_history", [])
         for m in history:
@@ -571,121 +852,243 @@ class Agent:
                 print(f"System: {m.content}\n")
 
 
-    def get_messages_by_thread_id(self, thread_id: str) -> List[Dict[str, Any]]:
+    def _read_tool_logger(self) -> LocalToolLogger:
         # Logger nur zum Lesen
         logger = getattr(self, "tool_logger", None)
         if logger is None or not isinstance(logger, LocalToolLogger):
-            logger = LocalToolLogger(write_file=False)
-
-        # --- Helper: Message-ID robust extrahieren ---
-        def _extract_message_id_from_msg(msg: Any) -> Optional[str]:
-            # 1) direkte ID
-            mid = getattr(msg, "id", None)
-            if isinstance(mid, (str, int)) and str(mid).strip():
-                return str(mid)
-
-            # 2) response_metadata.id
-            rm = getattr(msg, "response_metadata", None)
-            if isinstance(rm, dict):
-                x = rm.get("id") or rm.get("message_id")
-                if isinstance(x, (str, int)) and str(x).strip():
-                    return str(x)
-
-            # 3) additional_kwargs.id
-            ak = getattr(msg, "additional_kwargs", None)
-            if isinstance(ak, dict):
-                x = ak.get("id") or ak.get("message_id")
-                if isinstance(x, (str, int)) and str(x).strip():
-                    return str(x)
-
+            logger = LocalToolLogger(
+                logfile=self.config.get("tool_logfile", "logs/tool_logs.jsonl"),
+                write_file=False,
+                store_file=self.config.get("tool_store_file", "logs/tool_runs.sqlite"),
+            )
+        return logger
+
+    @staticmethod
+    def _extract_message_id_from_msg(msg: Any) -> Optional[str]:
+        # 1) direkte ID
+        mid = getattr(msg, "id", None)
+        if isinstance(mid, (str, int)) and str(mid).strip():
+            return str(mid)
+
+        # 2) response_metadata.id
+        rm = getattr(msg, "response_metadata", None)
+        if isinstance(rm, dict):
+            x = rm.get("id") or rm.get("message_id")
+            if isinstance(x, (str, int)) and str(x).strip():
+                return str(x)
+
+        # 3) additional_kwargs.id
+        ak = getattr(msg, "additional_kwargs", None)
+        if isinstance(ak, dict):
+            x = ak.get("id") or ak.get("message_id")
+            if isinstance(x, (str, int)) and str(x).strip():
+                return str(x)
+
+        return None
+
+    def _render_transcript_entry(self, msg: Any, logger: LocalToolLogger) -> Optional[Dict[str, Any]]:
+        """Eine State-Message als Transcript-Eintrag (role, content, images, dev_notes) oder None."""
+        if isinstance(msg, RemoveMessage) or isinstance(msg, ToolMessage):
             return None
+        if getattr(msg, "additional_kwargs", {}).get("internal") and not isinstance(msg, AIMessage):
+            return None
+        raw = msg.content
+        if not raw:
+            return None
+
+        # --- Text & Bilder extrahieren ---
+        # Remote-Bilder bleiben hier URLs; ggf. inlinen erst _resolve_history_images (gesammelt, parallel)
+        if isinstance(raw, str):
+            text_content = raw
+            images_b64 = None
+        else:
+            texts: List[str] = []
+            imgs: List[str] = []
+            for part in raw:
+                if part.get("type") == "text":
+                    t = part.get("text", "").strip()
+                    if t:
+                        texts.append(t)
+                elif part.get("type") == "image_url":
+                    url = (part.get("image_url", {}) or {}).get("url")
+                    if url:
+                        imgs.append(url)
+            text_content = (" ".join(texts).strip() or None)
+            images_b64 = imgs if imgs else None
+
+        # --- Tool-Runs per Message-ID korrelieren ---
+        dev_notes = {}
+        message_id = self._extract_message_id_from_msg(msg)
+        if isinstance(msg, AIMessage):
+            tools_for_msg = logger.get_tools_by_message_id(message_id) if message_id else []
+            dev_notes = {
+                "message_id": message_id,
+                "tool_runs": tools_for_msg,  # Liste von Tool-Run-Summaries
+            }
+            # Optionaler Fallback/Kompatibilität:
+            # falls msg.id ein echter tool-run_id wäre (alt), liefere trotzdem Summary
+            if (not tools_for_msg) and isinstance(message_id, str) and message_id.startswith("run"):
+                rs = logger.get_run_summary_by_run_id(message_id)
+                if rs:
+                    dev_notes.setdefault("tool_runs", [])
+                    # vereinheitlichen (Liste)
+                    dev_notes["tool_runs"] = [rs]
+
+        return {
+            "role": "assistant" if isinstance(msg, AIMessage) else "user",
+            "content": text_content,
+            "images": images_b64,
+            "dev_notes": dev_notes,
+            "message_id": message_id,
+        }
+
+    def _resolve_history_images(self, entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        config `history_image_mode`:
+          "inline" – als data-URL-Thumbnails einbetten (Default, wie bisher; lokaler Cache, parallele
+                     Downloads, Timeout, Größenlimit); nicht ladbare Bilder bleiben URLs
+          "url"    – Remote-URLs (z. B. Bucket-URLs aus FirebaseImageFirestoreSaver) unverändert zurückgeben (opt-in)
+        """
+        # lokale Bild-Referenzen (ImageStore) immer als data-URL ausliefern
+        if any(is_image_ref(img) for e in entries for img in (e.get("images") or [])):
+            store = get_image_store()
+            for e in entries:
+                if e.get("images"):
+                    e["images"] = [self._image_ref_to_data_url(store, img) for img in e["images"]]
+        if self.config.get("history_image_mode", DEFAULT_HISTORY_IMAGE_MODE) != "inline":
+            return entries
+        remote = [
+            img for e in entries for img in (e.get("images") or [])
+            if isinstance(img, str) and not img.startswith("data:")
+        ]
+        if not remote:
+            return entries
+        inlined = get_image_thumbnail_cache().get_many(remote)
+        for e in entries:
+            if e.get("images"):
+                e["images"] = [inlined.get(img) or img for img in e["images"]]
+        return entries
+
+    @staticmethod
+    def _image_ref_to_data_url(store, img: str) -> str:
+        if not is_image_ref(img):
+            return img
+        try:
+            return store.to_data_url(img)
+        except (OSError, ValueError):
+            return img
+
+    def _transcript_enabled(self) -> bool:
+        return bool(self.config.get("transcript_read_model", True)) and hasattr(self.user_db, "get_thread_messages")
+
+    def _append_transcript(self, thread_id: str, result: dict) -> None:
+        """
+        Post-Turn-Hook: neue Nachrichten des Turns ins Transcript (Read-Model für /messages) schreiben.
+        Gerendert wird nur das Ende von messages_history bis zur letzten bekannten Nachricht.
+        """
+        if not self._transcript_enabled() or not result:
+            return
+        try:
+            history = result.get("messages_history") or []
+            known = set(self.user_db.get_thread_message_ids(thread_id))
+            new_msgs = []
+            for msg in reversed(history):
+                mid = self._extract_message_id_from_msg(msg)
+                if mid in known:
+                    break
+                new_msgs.append(msg)
+            if not known and len(history) > 2:
+                # Thread existierte schon vor dem Read-Model -> Backfill beim nächsten Lesen
+                return
+            logger = self._read_tool_logger()
+            entries = [e for e in (self._render_transcript_entry(m, logger) for m in reversed(new_msgs)) if e]
+            self.user_db.append_thread_messages(thread_id, entries)
+        except Exception:
+            get_assistant_logger().warning("Appending transcript for thread '%s' failed", thread_id, exc_info=True)
+
+    def _schedule_transcript(self, thread_id: str, result: dict) -> None:
+        """_append_transcript im Worker-Thread, damit /chat nicht auf die User-DB wartet."""
+        if not self._transcript_enabled() or not result:
+            return
+        fut = self._transcript_pool.submit(self._append_transcript, thread_id, result)
+        with self._transcript_lock:
+            self._transcript_pending[thread_id] = fut
+        fut.add_done_callback(lambda f: self._forget_transcript(thread_id, f))
+
+    def _forget_transcript(self, thread_id: str, fut: Future) -> None:
+        with self._transcript_lock:
+            if self._transcript_pending.get(thread_id) is fut:
+                del self._transcript_pending[thread_id]
+
+    def _wait_for_transcript(self, thread_id: str, timeout_s: float = 5.0) -> None:
+        """Read-your-writes für /messages: auf einen noch laufenden Append dieses Threads warten."""
+        with self._transcript_lock:
+            fut = self._transcript_pending.get(thread_id)
+        if fut is not None:
+            try:
+                fut.result(timeout=timeout_s)
+            except Exception:
+                pass
+
+    def get_messages_by_thread_id(self, thread_id: str, limit: Optional[int] = None,
+                                  before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Chat-Transcript eines Threads. Liest aus dem Read-Model (user_db.thread_messages, ein
+        indizierter Query, Pagination über ``limit`` und ``before``=seq-Cursor). Threads ohne
+        Transcript werden einmalig aus dem Checkpoint gerendert und nachgetragen.
+        """
+        if self._transcript_enabled():
+            self._wait_for_transcript(thread_id)
+            rows = self.user_db.get_thread_messages(thread_id, limit=limit, before=before)
+            if rows or before is not None:
+                return self._resolve_history_images([self._transcript_row_to_entry(r) for r in rows])
 
         graph = self.get_graph()
         config = {"configurable": {"thread_id": thread_id}}
         state = graph.get_state(config)
 
         messages = state.values.get("messages_history") or state.values.get("messages", [])
+        logger = self._read_tool_logger()
         messages_content: List[Dict[str, Any]] = []
-
         for msg in messages:
-            if isinstance(msg, RemoveMessage) or isinstance(msg, ToolMessage):
-                continue
-            if getattr(msg, "additional_kwargs", {}).get("internal") and not isinstance(msg, AIMessage):
-                continue
-            raw = msg.content
-            if not raw:
-                continue
-
-            # --- Text & Bilder extrahieren (wie gehabt) ---
-            if isinstance(raw, str):
-                text_content = raw
-                images_b64 = None
-            else:
-                texts: List[str] = []
-                imgs: List[str] = []
-                for part in raw:
-                    if part.get("type") == "text":
-                        t = part.get("text", "").strip()
-                        if t:
-                            texts.append(t)
-                    elif part.get("type") == "image_url":
-                        info = part.get("image_url", {})
-                        url = info.get("url")
-                        prefix = info.get("prefix", "data:image/png;base64")
-                        if not url:
-                            continue
-                        if url.startswith("data:") and ";base64," in url:
-                            data_uri = url
-                        else:
-                            resp = requests.get(url)
-                            resp.raise_for_status()
-                            b64 = _encode_image(resp.content)
-                            data_uri = f"{prefix},{b64}"
-                        imgs.append(data_uri)
-                text_content = (" ".join(texts).strip() or None)
-                images_b64 = imgs if imgs else None
-
-            # --- Tool-Runs per Message-ID korrelieren ---
-            dev_notes = {}
-            if isinstance(msg, AIMessage):
-                message_id = _extract_message_id_from_msg(msg)
-                tools_for_msg = logger.get_tools_by_message_id(message_id) if message_id else []
-                dev_notes = {
-                    "message_id": message_id,
-                    "tool_runs": tools_for_msg,  # Liste von Tool-Run-Summaries
-                }
-                # Optionaler Fallback/Kompatibilität:
-                # falls msg.id ein echter tool-run_id wäre (alt), liefere trotzdem Summary
-                if (not tools_for_msg) and isinstance(message_id, str) and message_id.startswith("run"):
-                    rs = logger.get_run_summary_by_run_id(message_id)
-                    if rs:
-                        dev_notes.setdefault("tool_runs", [])
-                        # vereinheitlichen (Liste)
-                        dev_notes["tool_runs"] = [rs]
-
-            entry = {
-                "role": "assistant" if isinstance(msg, AIMessage) else "user",
-                "content": text_content,
-                "images": images_b64,
-                "dev_notes": dev_notes,
-            }
-            messages_content.append(entry)
-    
-        return messages_content
+            entry = self._render_transcript_entry(msg, logger)
+            if entry:
+                messages_content.append(entry)
+
+        if self._transcript_enabled() and state.values.get("messages_history"):
+            # Backfill, danach paginiert aus dem Read-Model
+            try:
+                if self.user_db.append_thread_messages(thread_id, messages_content):
+                    rows = self.user_db.get_thread_messages(thread_id, limit=limit, before=before)
+                    return self._resolve_history_images([self._transcript_row_to_entry(r) for r in rows])
+            except Exception:
+                get_assistant_logger().warning("Transcript backfill for thread '%s' failed", thread_id, exc_info=True)
+
+        for entry in messages_content:
+            entry.pop("message_id", None)
+        if limit is not None:
+            messages_content = messages_content[-int(limit):]
+        return self._resolve_history_images(messages_content)
+
+    @staticmethod
+    def _transcript_row_to_entry(row: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "role": row.get("role"),
+            "content": row.get("content"),
+            "images": row.get("images"),
+            "dev_notes": row.get("dev_notes") or {},
+            "seq": row.get("seq"),
+        }
 
 
     def create_additional_context(self, state: StateSnapshot, content: dict, user: dict) -> str:
         additional_context = {}
         barcode = content.get("barcode", None)
         if barcode:
-            if isinstance(barcode, str):
-                products = get_product_by_barcode(barcode)
-                products = [products] if products else []
-            else:
-                products = get_products_by_barcodes(barcode)
+            products = get_products_by_barcodes(barcode)
             if products:
-                additional_context["mentioned_products"] = products.values() if isinstance(products, dict) else products
-                additional_context["current_products"] = products.values() if isinstance(products, dict) else products
+                additional_context["mentioned_products"] = products
+                additional_context["current_products"] = products
         return additional_context
     def get_user_information(self, user: dict) -> dict:
         user_id = user.get("user_id") if user else None
@@ -708,8 +1111,9 @@ class Agent:
 
         normalized = _normalize_barcodes(barcode_raw)
 
+        image_store = get_image_store() if self.config.get("image_store", DEFAULT_IMAGE_STORE) else None
         msg = (
-            create_msg_with_img(text, images) if images
+            create_msg_with_img(text, images, image_store=image_store) if images
             else HumanMessage(content=text)
         )
 
@@ -728,11 +1132,14 @@ class Agent:
             logfile=self.config.get("tool_logfile", "logs/tool_logs.jsonl"),
             write_file=self.config.get("tool_logfile_write", True),
             extra_ctx={"thread_id": thread_id, "user_id": user_id},
+            store_file=self.config.get("tool_store_file", "logs/tool_runs.sqlite"),
         )
         return tool_logger
 
-    @log_execution()
-    def chat(self, content: dict, user: dict = None):
+    def _prepare_chat(self, content: dict, user: dict = None):
+        """
+        Gemeinsamer Setup-Teil für chat/chat_stream: Thread anlegen, Tool-Logger, Graph-Config und -Input.
+        """
         user_id = user.get("user_id") if user else None
         thread_id = user.get("thread_id") if user else None
         graph = self.get_graph()
@@ -745,13 +1152,14 @@ class Agent:
         tool_logger = self.setup_tool_logger(user_id, thread_id)
 
         config = {
-            "configurable": {"thread_id": thread_id},
+            "configurable": {"thread_id": thread_id, TOOL_TIMINGS_KEY: ToolTimings()},
             "callbacks": [tool_logger], 
         }
 
         graph_input = self.create_graph_input(content, user_id)
-        result = graph.invoke(graph_input, config)
+        return graph, config, graph_input, thread_id, tool_logger
 
+    def _finalize_chat(self, result: dict, tool_logger: LocalToolLogger, config: Optional[dict] = None):
         message = result["messages"][-1]
         response = message.content
         suggestions = (message.additional_kwargs.get("suggestions") or [])
@@ -763,9 +1171,134 @@ class Agent:
         dev_notes = {
             "tool_runs": tool_runs
         }
-    
+        timings = ((config or {}).get("configurable") or {}).get(TOOL_TIMINGS_KEY)
+        if isinstance(timings, ToolTimings):
+            # Wall-Time pro Tool-Call und Überlappung je Tool-Phase
+            dev_notes["tool_phases"] = timings.phases()
+        return response, suggestions, dev_notes
+
+    @log_execution()
+    def chat(self, content: dict, user: dict = None):
+        graph, config, graph_input, thread_id, tool_logger = self._prepare_chat(content, user)
+
+        with self._thread_lock(thread_id):
+            result = graph.invoke(graph_input, config)
+
+        response, suggestions, dev_notes = self._finalize_chat(result, tool_logger, config)
+        self._schedule_summary(thread_id, result)
+        self._schedule_transcript(thread_id, result)
         return response, suggestions, thread_id, dev_notes
 
+    @log_execution()
+    async def achat(self, content: dict, user: dict = None):
+        """
+        Async-Variante von chat() für den ASGI-Server (asgi.py): der Graph läuft per ainvoke,
+        blockierende Schritte (User-DB, Transcript, Tool-Logs) im Thread-Pool.
+        Rückgabe wie chat().
+        """
+        _, config, graph_input, thread_id, tool_logger = await asyncio.to_thread(self._prepare_chat, content, user)
+        graph = self.get_async_graph()
+
+        async with self._athread_lock(thread_id):
+            result = await graph.ainvoke(graph_input, config)
+
+        response, suggestions, dev_notes = await asyncio.to_thread(self._finalize_chat, result, tool_logger, config)
+        self._schedule_summary(thread_id, result)
+        self._schedule_transcript(thread_id, result)
+        return response, suggestions, thread_id, dev_notes
+
+    def chat_stream(self, content: dict, user: dict = None) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming-Variante von chat(). Liefert Events als Dicts:
+          {"event": "start",       "thread_id": ...}
+          {"event": "tool_start",  "tool_name": ..., "tool_call_id": ..., "args": {...}}
+          {"event": "tool_end",    "tool_name": ..., "tool_call_id": ..., "status": ...}
+          {"event": "token",       "text": ...}          # Deltas des Antwort-Texts (Feld "response")
+          {"event": "token_reset"}                       # bisher gestreamter Text war doch ein Tool-Turn
+          {"event": "final",       "response", "suggestions", "thread_id", "dev_notes"}  # wie chat()
+          {"event": "error",       "error": ...}
+        """
+        # der Generator läuft erst, wenn die Streaming-Response (200) schon begonnen hat:
+        # Fehler beim Setup als error-Event melden statt den Stream abzubrechen
+        try:
+            graph, config, graph_input, thread_id, tool_logger = self._prepare_chat(content, user)
+        except Exception as e:
+            get_assistant_logger().error("chat_stream setup failed: %s", e.__class__.__name__, exc_info=True)
+            yield {"event": "error", "error": str(e)}
+            return
+        yield {"event": "start", "thread_id": thread_id}
+
+        streamer: Optional[ResponseFieldStreamer] = None
+        current_step = None
+        emitted_tokens = False
+        final_values: Optional[dict] = None
+        try:
+            with self._thread_lock(thread_id):
+                for mode, payload in graph.stream(graph_input, config, stream_mode=["updates", "messages", "values"]):
+                    if mode == "messages":
+                        chunk, meta = payload
+                        if (meta or {}).get("langgraph_node") != "respond":
+                            continue
+                        if getattr(chunk, "tool_call_chunks", None):
+                            continue
+                        step = (meta or {}).get("langgraph_step")
+                        if streamer is None or step != current_step:
+                            current_step = step
+                            streamer = ResponseFieldStreamer()
+                        delta = streamer.feed(chunk_text(chunk.content))
+                        if delta:
+                            emitted_tokens = True
+                            yield {"event": "token", "text": delta}
+
+                    elif mode == "updates":
+                        for node, update in (payload or {}).items():
+                            if not isinstance(update, dict):
+                                continue
+                            for m in update.get("messages") or []:
+                                if node == "respond" and isinstance(m, AIMessage) and getattr(m, "tool_calls", None):
+                                    if emitted_tokens:
+                                        emitted_tokens = False
+                                        yield {"event": "token_reset"}
+                                    for tc in m.tool_calls:
+                                        yield {
+                                            "event": "tool_start",
+                                            "tool_name": tc.get("name"),
+                                            "tool_call_id": tc.get("id"),
+                                            "args": tc.get("args"),
+                                        }
+                                elif node == "custom_tools" and isinstance(m, ToolMessage):
+                                    yield {
+                                        "event": "tool_end",
+                                        "tool_name": m.name,
+                                        "tool_call_id": m.tool_call_id,
+                                        "status": getattr(m, "status", "success"),
+                                    }
+
+                    elif mode == "values":
+                        final_values = payload
+        except Exception as e:
+            tool_logger.reset()
+            get_assistant_logger().error("chat_stream failed: %s", e.__class__.__name__, exc_info=True)
+            yield {"event": "error", "error": str(e)}
+            return
+
+        if not final_values or not final_values.get("messages"):
+            tool_logger.reset()
+            yield {"event": "error", "error": "No response generated."}
+            return
+
+        response, suggestions, dev_notes = self._finalize_chat(final_values, tool_logger, config)
+        self._schedule_summary(thread_id, final_values)
+        yield {
+            "event": "final",
+            "response": response,
+            "suggestions": suggestions,
+            "thread_id": thread_id,
+            "dev_notes": dev_notes,
+        }
+        # nach dem finalen Event, damit der Client nicht darauf wartet
+        self._schedule_transcript(thread_id, final_values)
+
 
 # if __name__ == "__main__":
 #     agent = Agent()
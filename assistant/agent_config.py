@@ -1,6 +1,16 @@
+import os
 from dataclasses import dataclass
 from typing import Optional, Union, Literal
 
+# Defaults, die auch für Teil-Configs gelten (Agent liest sie per config.get(key, DEFAULT_...))
+# "inline" (Graph-Node) oder "background" (SummaryWorker nach der Antwort)
+DEFAULT_SUMMARY_MODE = "background"
+# Bilder in der Historie: "inline" (data-URL-Thumbnails, bisheriges Verhalten) oder "url" (wie gespeichert, opt-in)
+DEFAULT_HISTORY_IMAGE_MODE = "inline"
+# lokaler ImageStore nur, wenn IMAGE_STORE_DIR bewusst gesetzt ist (z. B. auf ein geteiltes Volume);
+# sonst wandern Bilder wie bisher als data-URL in die Messages (Firestore lädt sie in den Bucket)
+DEFAULT_IMAGE_STORE = bool(os.environ.get("IMAGE_STORE_DIR"))
+
 class AgentConfig:
     def __init__(self, config: Optional[dict] = {}):
         self.set_values_from_dict(config)
@@ -61,4 +71,19 @@ class AgentConfig:
             "user_db": "postgres",
             "checkpoint_type": "postgres",
             "rag_db": "chroma",
+            # statischer Prompt-Präfix zuerst, volatile Teile (Zeit, Name, Summary, ...) danach
+            "prompt_cache_layout": False,
+            "summary_mode": DEFAULT_SUMMARY_MODE,
+            # /messages aus user_db.thread_messages statt aus dem Checkpoint
+            "transcript_read_model": True,
+            "history_image_mode": DEFAULT_HISTORY_IMAGE_MODE,
+            # Upload-Bilder im lokalen ImageStore ablegen, Messages enthalten nur Referenzen
+            "image_store": DEFAULT_IMAGE_STORE,
+            # Tool-Calls eines Turns parallel ausführen (ParallelToolNode), Limits pro Tool-Name
+            "parallel_tools": True,
+            "tool_timeout_s": 30,
+            "tool_default_concurrency": 4,
+            "tool_concurrency": {"run_product_sql": 4, "fetch_product_stock": 8, "fetch_product_stock_batch": 2},
+            # Tool-Ergebnisse cachen (Policies in tools.TOOL_CACHE_POLICIES)
+            "tool_cache": True,
         })
\ No newline at end of file
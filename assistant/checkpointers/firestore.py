@@ -6,6 +6,7 @@ from urllib.parse import urlparse
 from langchain.schema import HumanMessage, AIMessage
 from langgraph_checkpoint_firestore.firestoreSaver import FirestoreSaver
 from assistant.utils.firebase_utils import get_storage_bucket
+from assistant.utils.image_store import get_image_store, is_image_ref, parse_image_ref
 from langgraph.checkpoint.base import CheckpointTuple
 from icecream import ic
 from typing import Optional
@@ -44,7 +45,9 @@ class FirebaseImageFirestoreSaver(FirestoreSaver):
 
     def _replace_data_urls(self, obj: Any, thread_id: str, checkpoint_id: str, counter_ref: dict):
         """
-        Rekursive Hilfsfunktion: ersetzt alle data:* URLs in obj durch public URLs.
+        Rekursive Hilfsfunktion: ersetzt alle data:* URLs und ImageStore-Referenzen (img://sha256/...)
+        in obj durch public URLs. Referenzen zeigen auf den lokalen ImageStore dieses Hosts und wären
+        nach einem Neustart bzw. auf anderen Instanzen nicht mehr auflösbar.
         counter_ref ist ein dict mit Schlüssel 'count', um den Zähler zu teilen.
         """
         # LangChain Messages
@@ -67,6 +70,19 @@ class FirebaseImageFirestoreSaver(FirestoreSaver):
                     obj['image_url']['url'] = public_url
                     obj['image_url']['prefix'] = prefix
                     counter_ref['count'] += 1
+                elif is_image_ref(data_url):
+                    try:
+                        digest, mime = parse_image_ref(data_url)
+                        raw = get_image_store().get(data_url)
+                    except (OSError, ValueError):
+                        # nicht (mehr) lokal vorhanden -> Referenz bleibt stehen
+                        return
+                    ext = mime.split('/', 1)[1]
+                    # inhaltsadressiert: gleiches Bild in mehreren Checkpoints nur einmal im Bucket
+                    dest = f"{thread_id}/{digest}.{ext}"
+                    obj['image_url']['url'] = self._upload_image(raw, dest, content_type=mime)
+                    obj['image_url']['prefix'] = f"data:{mime};base64"
+                    counter_ref['count'] += 1
                 return
             # sonst recursiv
             for v in obj.values():
@@ -4,7 +4,8 @@ from io import BytesIO
 import mimetypes
 import re
 from langchain_core.messages import HumanMessage
-from typing import Iterable, Optional
+from typing import Iterable, Optional, Tuple
+from assistant.utils.image_store import ImageStore, get_image_store, is_image_ref
 def _encode_image(image_data:bytes) -> str:
     return base64.b64encode(image_data).decode("utf-8")
 
@@ -69,21 +70,31 @@ def _mime_from_bytes(raw: bytes) -> Optional[str]:
     return format_to_mime.get(fmt)
 
 
-def _normalize_image_string(img_str: str) -> str:
+def _image_bytes_from_string(img_str: str) -> Tuple[bytes, Optional[str]]:
     """
-    Wandelt einen Base64-String oder eine data:-URL in eine gültige data:-URL mit erkanntem MIME-Typ um.
+    Dekodiert einen Base64-String oder eine data:-URL (einmalig) zu (raw, mime).
     """
     s = img_str.strip()
-    if _is_data_url(s):
-        return s
-
+    m = _DATA_URL_RE.match(s)
     try:
-        raw = base64.b64decode(s, validate=True)
+        if m:
+            return base64.b64decode(m.group("b64")), m.group("mime").lower()
+        return base64.b64decode(s, validate=True), None
     except Exception:
         raise ValueError(
             "Bild-String ist weder eine gültige data:-URL noch ein gültiger Base64-String."
         )
 
+
+def _normalize_image_string(img_str: str) -> str:
+    """
+    Wandelt einen Base64-String oder eine data:-URL in eine gültige data:-URL mit erkanntem MIME-Typ um.
+    """
+    s = img_str.strip()
+    if _is_data_url(s):
+        return s
+
+    raw, _ = _image_bytes_from_string(s)
     mime = _mime_from_bytes(raw) or "image/png"
     return _build_data_url(mime, _encode_image(raw))
 
@@ -100,18 +111,29 @@ def _make_image_content_item(data_url: str) -> dict:
 def create_msg_with_img(
     user_query: str,
     images: Optional[Iterable[str]] = None,
-    image_path: Optional[str] = None
+    image_path: Optional[str] = None,
+    image_store: Optional[ImageStore] = None,
 ) -> HumanMessage:
     """
     Erzeugt eine HumanMessage mit Text und optional einem oder mehreren Bildern.
     Unterstützt mehrere Bildtypen (png, jpg/jpeg, gif, webp, bmp, tiff, svg).
+    Mit ``image_store`` enthält die Message nur Referenzen (img://sha256/...) statt data-URLs,
+    ohne werden auch übergebene Referenzen zu data-URLs aufgelöst.
     """
     content: list[dict] = []
 
     if images:
         for img_str in images:
-            data_url = _normalize_image_string(img_str)
-            content.append(_make_image_content_item(data_url))
+            if is_image_ref(img_str):
+                # Upload-Routes legen Dateien immer im Store ab; ohne image_store (Default, solange
+                # IMAGE_STORE_DIR nicht gesetzt ist) kommt wie früher die data-URL in die Message
+                url = img_str if image_store is not None else get_image_store().to_data_url(img_str)
+            elif image_store is not None:
+                raw, mime = _image_bytes_from_string(img_str)
+                url = image_store.put(raw, mime)
+            else:
+                url = _normalize_image_string(img_str)
+            content.append(_make_image_content_item(url))
 
     elif image_path:
         with open(image_path, "rb") as f:
@@ -1,6 +1,8 @@
 import functools
+import inspect
 import logging
 from typing import Any, Callable, Optional, Type, Dict, List
+import threading
 import time
 from datetime import datetime, timezone, timedelta
 import datetime as dt
@@ -8,6 +10,9 @@ from pathlib import Path
 import json
 from langchain_core.callbacks import BaseCallbackHandler
 from assistant.utils.tool_out_serializer import serialize_tool_output
+from assistant.utils.tool_run_store import ToolRunStore, get_tool_run_store
+from assistant.utils.buffered_writer import BufferedLineWriter, get_line_writer
+from assistant.utils.log_segments import iter_records as iter_log_segments, list_segments
 from icecream import ic
 
 def get_assistant_logger(
@@ -74,6 +79,25 @@ def log_execution(
     def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
         log = get_assistant_logger() if logger is None else logger
 
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                try:
+                    _start = time.time()
+                    result = await func(*args, **kwargs)
+                    log.log(
+                        level_success,
+                        "Function '%s' executed successfully. duration=%.2fms",
+                        func.__name__,  (time.time() - _start) * 1000
+                    )
+                    return result
+                except Exception as e:
+                    log.error("Function '%s' failed: %s",
+                              func.__name__, e.__class__.__name__, exc_info=True)
+                    raise
+
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args: Any, **kwargs: Any) -> Any:
             try:
@@ -122,6 +146,34 @@ def _parse_iso_z(s: str):
     except Exception:
         return None
 
+def _fmt_iso_z(t: datetime) -> str:
+    return t.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S") + "Z"
+
+def _fmt_run(r: Dict[str, Any]) -> Dict[str, Any]:
+    """Einheitliches Tool-Run-Summary (aus JSONL-Rekonstruktion oder ToolRunStore-Zeile)."""
+    output = r.get("output")
+    if output is None and any(r.get(k) is not None for k in ("output_text", "output_json", "output_kind")):
+        output_json = r.get("output_json")
+        if isinstance(output_json, str):
+            try:
+                output_json = json.loads(output_json)
+            except Exception:
+                pass
+        output = {"kind": r.get("output_kind"), "text": r.get("output_text"), "json": output_json}
+    return {
+        "run_id": _to_str_safe(r.get("run_id")),
+        "parent_run_id": _to_str_safe(r.get("parent_run_id")),
+        "tool_name": _to_str_safe(r.get("tool_name")),
+        "input": _to_str_safe(r.get("input")),
+        "output": output,
+        "execution_time_s": float(r["execution_time_s"]) if r.get("execution_time_s") is not None else None,
+        "cache_hit": bool(r.get("cache_hit")),
+        "ts_start": _to_str_safe(r.get("ts_start")),
+        "ts_end": _to_str_safe(r.get("ts_end")),
+        "user_id": _to_str_safe(r.get("user_id")),
+        "thread_id": _to_str_safe(r.get("thread_id")),
+    }
+
 class LocalToolLogger(BaseCallbackHandler):
     """
     - Loggt Tool-Events (start/end/error) inkl. parent_run_id.
@@ -130,13 +182,18 @@ class LocalToolLogger(BaseCallbackHandler):
 
     Fileformat (JSONL), Beispielevents:
       {"event":"tool_start", "run_id":"...", "parent_run_id":"...", "tool_name":"...", "input":"...", "ts_start":"...", "user_id":"...", "thread_id":"..."}
-      {"event":"tool_end",   "run_id":"...", "parent_run_id":"...", "tool_name":"...", "execution_time_s":0.12, "ts_end":"...", "user_id":"...", "thread_id":"..."}
+      {"event":"tool_end",   "run_id":"...", "parent_run_id":"...", "tool_name":"...", "execution_time_s":0.12, "cache_hit":false, "ts_end":"...", "user_id":"...", "thread_id":"..."}
       {"event":"tool_error", ...}
       {"event":"llm_end",    "llm_run_id":"...", "parent_run_id":"...", "message_ids":["...","..."], "ts_end":"...", "user_id":"...", "thread_id":"..."}
 
     Hinweis:
       - message_ids werden best effort aus LLM-Response extrahiert (versch. Clients legen IDs woanders ab).
       - Ein LLM-Run kann mehrere Messages erzeugen.
+
+    Abfragen laufen über den indizierten ToolRunStore (SQLite, ``store_file``), der jedes Event
+    über seine Queue erhält und im Hintergrund gebündelt schreibt. Die JSONL-Datei ist nur noch ein optionaler Export;
+    ohne Store (store_file=None) wird wie früher aus der JSONL-Datei gelesen.
+    Eine bestehende JSONL-Datei wird einmalig beim Start importiert (import_tool_logs_into_store).
     """
 
     def __init__(
@@ -144,11 +201,24 @@ class LocalToolLogger(BaseCallbackHandler):
         logfile: str = "logs/tool_logs.jsonl",
         write_file: bool = True,
         extra_ctx: Optional[Dict[str, Any]] = None,
+        store_file: Optional[str] = "logs/tool_runs.sqlite",
+        write_store: bool = True,
     ):
         self.write_file = write_file
         self.logfile = Path(logfile)
+        self._writer: Optional[BufferedLineWriter] = None
         if write_file:
             self.logfile.parent.mkdir(parents=True, exist_ok=True)
+            # gepuffert, Hintergrund-Thread schreibt (siehe BufferedLineWriter)
+            self._writer = get_line_writer(self.logfile)
+        self.write_store = write_store
+        self.store: Optional[ToolRunStore] = None
+        if store_file:
+            try:
+                self.store = get_tool_run_store(store_file)
+            except Exception:
+                get_assistant_logger().warning("Tool run store '%s' not available, falling back to JSONL", store_file, exc_info=True)
+                self.store = None
         self._ctx = _ctx_sanitized(extra_ctx)
         self._starts: Dict[str, float] = {}                    # tool run start perf counter
         self._runs: Dict[str, Dict[str, Any]] = {}             # in-memory tool runs (letzter Stand)
@@ -176,6 +246,7 @@ class LocalToolLogger(BaseCallbackHandler):
             **self._ctx,
         }
         self._append_file(rec)
+        self._write_store(rec)
 
     # -------- TOOL lifecycle --------
     def on_tool_start(
@@ -200,7 +271,9 @@ class LocalToolLogger(BaseCallbackHandler):
             **self._ctx,
         }
         self._runs[run_id] = rec
-        self._append_file({"event": "tool_start", **rec})
+        start_rec = {"event": "tool_start", **rec}
+        self._append_file(start_rec)
+        self._write_store(start_rec)
     def on_tool_end(self, output: Any, *, run_id: str, parent_run_id: Optional[str] = None, **kwargs: Any) -> None:
         start = self._starts.pop(run_id, None)
         dur = (time.perf_counter() - start) if start is not None else None
@@ -215,7 +288,7 @@ class LocalToolLogger(BaseCallbackHandler):
             # Output in Memory mitführen (optional)
             rec["output"] = output_ser  # <<—— hier hängt jetzt alles jsonable dran
 
-            self._append_file({
+            end_rec = {
                 "event": "tool_end",
                 "run_id": rec["run_id"],
                 "parent_run_id": rec.get("parent_run_id"),
@@ -228,10 +301,20 @@ class LocalToolLogger(BaseCallbackHandler):
                 "output_text": output_ser.get("text"),
                 "output_json": output_ser.get("json"),
                 "output_kind": output_ser.get("kind"),
+                "cache_hit": bool(rec.get("cache_hit")),
                 # Wenn du ALLES im File haben willst (inkl. Bilder etc.):
                 # Achtung: kann groß werden.
                 # "output_full": output_ser,
-            })
+            }
+            self._append_file(end_rec)
+            self._write_store(end_rec)
+
+    def on_custom_event(self, name: str, data: Any, *, run_id: Any, **kwargs: Any) -> None:
+        # tool_cache.cached_tool meldet Treffer mit der run_id des Tool-Runs
+        if name == "tool_cache_hit":
+            rec = self._runs.get(run_id) or self._runs.get(str(run_id))
+            if rec is not None:
+                rec["cache_hit"] = True
 
     def on_tool_error(self, error: BaseException, *, run_id: str, parent_run_id: Optional[str] = None, **kwargs: Any) -> None:
         # kein error-Objekt speichern
@@ -243,7 +326,7 @@ class LocalToolLogger(BaseCallbackHandler):
             rec["ts_end"] = _iso_now()
             if parent_run_id and not rec.get("parent_run_id"):
                 rec["parent_run_id"] = _to_str_safe(parent_run_id)
-            self._append_file({
+            err_rec = {
                 "event": "tool_error",
                 "run_id": rec["run_id"],
                 "parent_run_id": rec.get("parent_run_id"),
@@ -252,7 +335,9 @@ class LocalToolLogger(BaseCallbackHandler):
                 "ts_end": rec["ts_end"],
                 "user_id": rec.get("user_id"),
                 "thread_id": rec.get("thread_id"),
-            })
+            }
+            self._append_file(err_rec)
+            self._write_store(err_rec)
 
     # -------- Message-ID Extraction (best effort) --------
     def _extract_message_ids(self, response: Any) -> List[str]:
@@ -335,21 +420,15 @@ class LocalToolLogger(BaseCallbackHandler):
         return None
 
     # -------- JSONL Reader --------
-    def _iter_log_records(self):
+    def _iter_log_records(self, thread_id: Optional[str] = None):
+        """
+        Events aus rotierten Segmenten + aktiver Datei. Mit thread_id werden nur Segmente
+        geöffnet, deren Sidecar-Index den Thread enthält.
+        """
+        if self._writer is not None:
+            self._writer.flush()
         try:
-            if not self.logfile.exists():
-                return
-            with self.logfile.open("r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        rec = json.loads(line)
-                        if isinstance(rec, dict):
-                            yield rec
-                    except Exception:
-                        continue
+            yield from iter_log_segments(self.logfile, thread_id=thread_id)
         except Exception:
             return
     def _build_llm_events_from_file(self) -> list[dict]:
@@ -367,6 +446,40 @@ class LocalToolLogger(BaseCallbackHandler):
         return events
     
     def get_tools_by_message_id(self, message_id: str) -> List[Dict[str, Any]]:
+        if self.store is None:
+            return self._get_tools_by_message_id_from_file(message_id)
+        store = self.store
+
+        # 1) Direkte Zuordnung: message_id -> llm_run_id(s) -> Tool-Runs mit diesem Parent
+        llm_runs = store.get_llm_runs_by_message_id(str(message_id))
+        candidate_llm_runs = [e["llm_run_id"] for e in llm_runs]
+        out = [_fmt_run(r) for r in store.get_runs_by_parent_ids(candidate_llm_runs)]
+        if out:
+            return out
+
+        # 2) Fallback A: Sibling-Heuristik über gemeinsamen Parent des LLM-Runs
+        parents_of_llm = [e["parent_run_id"] for e in llm_runs if e.get("parent_run_id")]
+        sibling = [_fmt_run(r) for r in store.get_runs_by_parent_ids(parents_of_llm)]
+        if sibling:
+            return sibling
+
+        # 3) Fallback B: Zeitfenster-Heuristik im selben Thread
+        window_sec = 120
+        time_based: List[Dict[str, Any]] = []
+        for e in llm_runs:
+            t = _parse_iso_z(e.get("ts_end") or "")
+            if not t or not e.get("thread_id"):
+                continue
+            rows = store.get_runs_in_window(
+                e["thread_id"],
+                _fmt_iso_z(t - timedelta(seconds=window_sec)),
+                _fmt_iso_z(t + timedelta(seconds=10)),
+            )
+            time_based.extend(_fmt_run(r) for r in rows)
+        time_based.sort(key=lambda r: r.get("ts_start") or "")
+        return time_based
+
+    def _get_tools_by_message_id_from_file(self, message_id: str) -> List[Dict[str, Any]]:
         runs = self._build_runs_from_file()
         llm_events = self._build_llm_events_from_file()
 
@@ -384,6 +497,7 @@ class LocalToolLogger(BaseCallbackHandler):
                 "input": _to_str_safe(r.get("input")),
                 "output": r.get("output"),#_to_str_safe(r.get("output")),
                 "execution_time_s": float(r["execution_time_s"]) if r.get("execution_time_s") is not None else None,
+                "cache_hit": bool(r.get("cache_hit")),
                 "ts_start": _to_str_safe(r.get("ts_start")),
                 "ts_end": _to_str_safe(r.get("ts_end")),
                 "user_id": _to_str_safe(r.get("user_id")),
@@ -427,12 +541,12 @@ class LocalToolLogger(BaseCallbackHandler):
 
         time_based.sort(key=lambda r: r.get("ts_start") or "")
         return time_based
-    def _build_runs_from_file(self) -> Dict[str, Dict[str, Any]]:
+    def _build_runs_from_file(self, thread_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
         """
         Rekonstruiert den letzten bekannten Zustand pro tool run_id aus der JSONL-Datei.
         """
         runs: Dict[str, Dict[str, Any]] = {}
-        for rec in self._iter_log_records() or []:
+        for rec in self._iter_log_records(thread_id) or []:
             rid = rec.get("run_id")
             ev = rec.get("event")
 
@@ -451,7 +565,7 @@ class LocalToolLogger(BaseCallbackHandler):
                 }
             elif ev in ("tool_end", "tool_error") and rid:
                 cur = runs.get(rid, {"run_id": rid})
-                for k in ("parent_run_id", "tool_name", "ts_end", "execution_time_s", "user_id", "thread_id"):
+                for k in ("parent_run_id", "tool_name", "ts_end", "execution_time_s", "cache_hit", "user_id", "thread_id"):
                     if rec.get(k) is not None:
                         cur[k] = rec.get(k)
                 runs[rid] = cur
@@ -473,8 +587,10 @@ class LocalToolLogger(BaseCallbackHandler):
 
     # -------- API (aus JSONL) --------
     def get_run_summary_by_thread_id(self, thread_id: str) -> List[Dict[str, Any]]:
+        if self.store is not None:
+            return [_fmt_run(r) for r in self.store.get_runs_by_thread_id(str(thread_id))]
         tid_safe = _to_str_safe(thread_id)
-        runs = self._build_runs_from_file()
+        runs = self._build_runs_from_file(thread_id=tid_safe)
         items = [r for r in runs.values() if _to_str_safe(r.get("thread_id")) == tid_safe]
         items.sort(key=lambda r: r.get("ts_start") or "")
         out: List[Dict[str, Any]] = []
@@ -486,6 +602,7 @@ class LocalToolLogger(BaseCallbackHandler):
                 "input": _to_str_safe(r.get("input")),
                 "output": r.get("output"),#_to_str_safe(r.get("output")),
                 "execution_time_s": float(r["execution_time_s"]) if r.get("execution_time_s") is not None else None,
+                "cache_hit": bool(r.get("cache_hit")),
                 "ts_start": _to_str_safe(r.get("ts_start")),
                 "ts_end": _to_str_safe(r.get("ts_end")),
                 "user_id": _to_str_safe(r.get("user_id")),
@@ -494,6 +611,9 @@ class LocalToolLogger(BaseCallbackHandler):
         return out
 
     def get_run_summary_by_run_id(self, run_id: str) -> Optional[Dict[str, Any]]:
+        if self.store is not None:
+            r = self.store.get_run(run_id)
+            return _fmt_run(r) if r else None
         runs = self._build_runs_from_file()
         r = runs.get(run_id)
         if not r:
@@ -505,6 +625,7 @@ class LocalToolLogger(BaseCallbackHandler):
             "input": _to_str_safe(r.get("input")),
             "output": r.get("output"),#_to_str_safe(r.get("output")),
             "execution_time_s": float(r["execution_time_s"]) if r.get("execution_time_s") is not None else None,
+            "cache_hit": bool(r.get("cache_hit")),
             "ts_start": _to_str_safe(r.get("ts_start")),
             "ts_end": _to_str_safe(r.get("ts_end")),
             "user_id": _to_str_safe(r.get("user_id")),
@@ -514,8 +635,10 @@ class LocalToolLogger(BaseCallbackHandler):
     # -------- Korrelationen (aus JSONL) --------
     def get_message_ids_by_llm_run_id(self, llm_run_id: str) -> List[str]:
         """
-        Liest JSONL und liefert alle message_ids zu einem LLM-Run.
+        Liefert alle message_ids zu einem LLM-Run (Store, sonst JSONL).
         """
+        if self.store is not None:
+            return self.store.get_message_ids_by_llm_run_id(llm_run_id)
         m = self._build_llm_map_from_file()
         return m.get(str(llm_run_id), [])
 
@@ -525,6 +648,13 @@ class LocalToolLogger(BaseCallbackHandler):
         """
         Liefert einen Tool-Run inkl. der korrelierten message_ids (über parent_run_id -> llm_end).
         """
+        if self.store is not None:
+            r = self.store.get_run(run_id)
+            if not r:
+                return None
+            enriched = _fmt_run(r)
+            enriched["message_ids"] = self.store.get_message_ids_by_llm_run_id(r.get("parent_run_id") or "")
+            return enriched
         runs = self._build_runs_from_file()
         rec = runs.get(run_id)
         if not rec:
@@ -538,6 +668,7 @@ class LocalToolLogger(BaseCallbackHandler):
             "input": _to_str_safe(rec.get("input")),
             "output": rec.get("output"),#_to_str_safe(rec.get("output")),
             "execution_time_s": float(rec["execution_time_s"]) if rec.get("execution_time_s") is not None else None,
+            "cache_hit": bool(rec.get("cache_hit")),
             "ts_start": _to_str_safe(rec.get("ts_start")),
             "ts_end": _to_str_safe(rec.get("ts_end")),
             "user_id": _to_str_safe(rec.get("user_id")),
@@ -559,6 +690,7 @@ class LocalToolLogger(BaseCallbackHandler):
                 "input": _to_str_safe(r.get("input")),
                 "output": r.get("output"),#_to_str_safe(r.get("output")),
                 "execution_time_s": float(r["execution_time_s"]) if r.get("execution_time_s") is not None else None,
+                "cache_hit": bool(r.get("cache_hit")),
                 "ts_start": _to_str_safe(r.get("ts_start")),
                 "ts_end": _to_str_safe(r.get("ts_end")),
                 "user_id": _to_str_safe(r.get("user_id")),
@@ -572,9 +704,32 @@ class LocalToolLogger(BaseCallbackHandler):
         self._runs.clear()
         self._llm_run_to_msgs.clear()
 
+    # -------- Store IO --------
+    def _write_store(self, rec: Dict[str, Any]) -> None:
+        """Reiht das Event für den Store ein; geschrieben wird gebündelt im Hintergrund (ToolRunStore.submit)."""
+        if self.store is None or not self.write_store:
+            return
+        try:
+            self.store.submit(rec)
+        except Exception:
+            # wie beim File: Logging darf keine Pipeline brechen
+            get_assistant_logger().warning("Writing tool run to store failed", exc_info=True)
+
+    def _import_jsonl_once(self) -> int:
+        """Importiert eine bestehende JSONL-Datei einmalig in den Store (Migration)."""
+        if self.store is None or not (self.logfile.exists() or list_segments(self.logfile)):
+            return 0
+        key = f"jsonl_imported:{self.logfile.resolve().as_posix()}"
+        if self.store.get_meta(key):
+            return 0
+        n = self.store.import_records(self._iter_log_records() or [])
+        self.store.set_meta(key, _iso_now())
+        get_assistant_logger().info("Imported %d tool log events from %s into tool run store", n, self.logfile)
+        return n
+
     # -------- File IO --------
     def _append_file(self, data: Dict[str, Any]) -> None:
-        if not self.write_file:
+        if not self.write_file or self._writer is None:
             return
         try:
             safe: Dict[str, Any] = {}
@@ -587,8 +742,33 @@ class LocalToolLogger(BaseCallbackHandler):
                         safe[k] = v
                     else:
                         safe[k] = _to_str_safe(v)
-            with self.logfile.open("a", encoding="utf-8") as f:
-                f.write(json.dumps(safe, ensure_ascii=False) + "\n")
+            self._writer.write(json.dumps(safe, ensure_ascii=False))
         except Exception:
             # bewusst still; Logging darf keine Pipeline brechen
             pass
+
+
+_IMPORTED_LOGS: set = set()
+_IMPORT_LOCK = threading.Lock()
+
+
+def import_tool_logs_into_store(logfile: str = "logs/tool_logs.jsonl",
+                                store_file: str = "logs/tool_runs.sqlite") -> int:
+    """
+    Migration einer bestehenden JSONL-Datei (inkl. rotierter Segmente) in den ToolRunStore.
+    Einmal beim Start aufrufen (Agent.__init__), nicht pro Logger: pro Prozess und
+    (Store, Datei) höchstens ein Versuch, danach über store_meta markiert. Fehler nur loggen.
+    :return: Anzahl importierter Events
+    """
+    key = (Path(store_file).resolve().as_posix(), Path(logfile).resolve().as_posix())
+    with _IMPORT_LOCK:
+        if key in _IMPORTED_LOGS:
+            return 0
+        _IMPORTED_LOGS.add(key)
+        try:
+            reader = LocalToolLogger(logfile=logfile, write_file=False, store_file=None)
+            reader.store = get_tool_run_store(store_file)
+            return reader._import_jsonl_once()
+        except Exception:
+            get_assistant_logger().warning("Importing tool logs from '%s' failed", logfile, exc_info=True)
+            return 0
@@ -0,0 +1,262 @@
+import asyncio
+import contextvars
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from assistant.logger import get_assistant_logger
+
+TOOL_TIMINGS_KEY = "tool_timings"
+
+
+class ToolTimings:
+    """
+    Sammelt pro Turn die Tool-Phasen (ein Eintrag pro Ausführung des Tool-Knotens).
+    Wird über config["configurable"][TOOL_TIMINGS_KEY] an den Knoten gereicht und landet in dev_notes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._phases: List[Dict[str, Any]] = []
+
+    def add(self, phase: Dict[str, Any]) -> None:
+        with self._lock:
+            self._phases.append(phase)
+
+    def phases(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._phases)
+
+
+class ParallelToolNode:
+    """
+    Führt die Tool-Calls der letzten AIMessage parallel aus (Ersatz für ToolNode im Graphen).
+
+    - Sync (graph.invoke): Thread-Pool; async (graph.ainvoke): asyncio.gather, Tools mit
+      Coroutine laufen direkt, die anderen im Executor.
+    - Pro Tool begrenzt ``concurrency`` (Name -> max. parallele Calls, prozessweit) die Last auf
+      das jeweilige Backend; ``default_concurrency`` gilt für alle anderen.
+    - ``timeout_s`` pro Call, gemessen ab Erhalt des Concurrency-Slots: danach gibt es eine
+      Fehler-ToolMessage (ein Sync-Tool läuft im Hintergrund zu Ende, das Ergebnis wird verworfen).
+      Sync: bekommt ein Call nicht innerhalb von ``timeout_s`` (ab Beginn der Phase) einen Slot,
+      wird er gar nicht ausgeführt und liefert ebenfalls den Timeout-Fehler.
+    - Ergebnisse in der Reihenfolge der Tool-Calls; Fehler werden wie bei ToolNode als
+      ToolMessage(status="error") zurückgegeben.
+    - Wall-Time pro Call und Überlappung der Phase gehen an ToolTimings (falls in der Config).
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[Any],
+        concurrency: Optional[Dict[str, int]] = None,
+        default_concurrency: int = 4,
+        timeout_s: Optional[float] = 30.0,
+        max_workers: int = 8,
+    ):
+        self.tools_by_name = {t.name: t for t in tools}
+        self.concurrency = dict(concurrency or {})
+        self.default_concurrency = max(1, int(default_concurrency))
+        self.timeout_s = timeout_s
+        self.max_workers = max(1, int(max_workers))
+        self._sems: Dict[str, threading.BoundedSemaphore] = {}
+        self._asems: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = weakref.WeakKeyDictionary()
+        self._sems_lock = threading.Lock()
+        self._log = get_assistant_logger()
+
+    # -------- Helpers --------
+    @staticmethod
+    def _tool_calls(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+        msg = state["messages"][-1]
+        if not isinstance(msg, AIMessage):
+            return []
+        return list(getattr(msg, "tool_calls", None) or [])
+
+    def _limit(self, name: str) -> int:
+        return max(1, int(self.concurrency.get(name, self.default_concurrency)))
+
+    def _sem(self, name: str) -> threading.BoundedSemaphore:
+        with self._sems_lock:
+            sem = self._sems.get(name)
+            if sem is None:
+                sem = self._sems[name] = threading.BoundedSemaphore(self._limit(name))
+            return sem
+
+    def _asem(self, name: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._sems_lock:
+            sems = self._asems.setdefault(loop, {})
+            sem = sems.get(name)
+            if sem is None:
+                sem = sems[name] = asyncio.Semaphore(self._limit(name))
+            return sem
+
+    @staticmethod
+    def _error_message(call: Dict[str, Any], error: str) -> ToolMessage:
+        return ToolMessage(
+            content=f"Error: {error}\n Please fix your mistakes.",
+            name=call.get("name"),
+            tool_call_id=call.get("id"),
+            status="error",
+        )
+
+    @staticmethod
+    def _as_tool_message(call: Dict[str, Any], output: Any) -> ToolMessage:
+        if isinstance(output, ToolMessage):
+            return output
+        return ToolMessage(content=str(output), name=call.get("name"), tool_call_id=call.get("id"))
+
+    def _record(self, config: Optional[RunnableConfig], t0: float, timings: List[Dict[str, Any]]) -> None:
+        recorder = ((config or {}).get("configurable") or {}).get(TOOL_TIMINGS_KEY)
+        if not isinstance(recorder, ToolTimings) or not timings:
+            return
+        wall = time.perf_counter() - t0
+        busy = sum(t["wall_s"] for t in timings)
+        recorder.add({
+            "calls": timings,
+            "wall_s": round(wall, 4),
+            "sum_s": round(busy, 4),
+            # 1.0 = sequentiell, n = n Calls liefen vollständig parallel
+            "overlap": round(busy / wall, 2) if wall > 0 else None,
+        })
+
+    # -------- Sync --------
+    def _run_one(
+        self,
+        call: Dict[str, Any],
+        config: Optional[RunnableConfig],
+        start_deadline: Optional[float] = None,
+        on_start: Optional[Callable[[], bool]] = None,
+    ) -> Optional[ToolMessage]:
+        """
+        Wartet höchstens bis ``start_deadline`` auf den Slot des Tools und führt den Call aus.
+        ``on_start`` meldet den Start; liefert es False (Call schon aufgegeben), läuft nichts (-> None).
+        """
+        tool = self.tools_by_name.get(call.get("name"))
+        if tool is None:
+            return self._error_message(call, f"{call.get('name')} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].")
+        sem = self._sem(tool.name)
+        wait = None if start_deadline is None else max(0.0, start_deadline - time.perf_counter())
+        if not sem.acquire(timeout=wait):
+            return self._error_message(call, f"Tool timed out after {self.timeout_s}s waiting for a free slot")
+        try:
+            if on_start is not None and not on_start():
+                return None
+            try:
+                return self._as_tool_message(call, tool.invoke({**call, "type": "tool_call"}, config))
+            except Exception as e:
+                return self._error_message(call, repr(e))
+        finally:
+            sem.release()
+
+    def __call__(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        calls = self._tool_calls(state)
+        t0 = time.perf_counter()
+        timings: Dict[int, Dict[str, Any]] = {}
+        started: Dict[int, float] = {}     # Call-Index -> Zeitpunkt, ab dem sein Timeout läuft
+        abandoned = set()                  # ohne Slot aufgegeben, darf nicht mehr starten
+        state_lock = threading.Lock()
+        start_deadline = None if self.timeout_s is None else t0 + self.timeout_s
+
+        def mark_started(i):
+            with state_lock:
+                if i in abandoned:
+                    return False
+                started[i] = time.perf_counter()
+                return True
+
+        def timed(i, call):
+            msg = self._run_one(call, config, start_deadline, lambda: mark_started(i))
+            if msg is not None:
+                timings.setdefault(i, self._timing(call, msg, t0, started.get(i, t0)))
+            return msg
+
+        if not calls:
+            return {"messages": []}
+        # eigener Pool statt Executor der Config: ein hängendes Tool darf den Turn nicht blockieren
+        pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(calls)), thread_name_prefix="tool")
+        futures = [pool.submit(_with_context(timed), i, c) for i, c in enumerate(calls)]
+        messages = []
+        for i, (call, fut) in enumerate(zip(calls, futures)):
+            msg = None
+            while msg is None:
+                with state_lock:
+                    begun = started.get(i)
+                    if begun is None and start_deadline is not None and time.perf_counter() >= start_deadline:
+                        # noch kein Slot (bzw. kein Pool-Thread) bis zur Deadline: nicht mehr ausführen
+                        abandoned.add(i)
+                if i in abandoned:
+                    fut.cancel()
+                    self._log.warning("Tool '%s' did not start within %.1fs", call.get("name"), self.timeout_s)
+                    msg = self._error_message(call, f"Tool timed out after {self.timeout_s}s waiting for a free slot")
+                    timings[i] = self._timing(call, msg, t0, t0)
+                    break
+                if begun is None:
+                    deadline = start_deadline
+                else:
+                    deadline = None if self.timeout_s is None else begun + self.timeout_s
+                try:
+                    msg = fut.result(timeout=None if deadline is None else max(0.0, deadline - time.perf_counter()))
+                except FutureTimeout:
+                    if begun is not None:
+                        self._log.warning("Tool '%s' timed out after %.1fs", call.get("name"), self.timeout_s)
+                        msg = self._error_message(call, f"Tool timed out after {self.timeout_s}s")
+                        timings[i] = self._timing(call, msg, t0, begun)
+            messages.append(msg)
+        pool.shutdown(wait=False)
+        self._record(config, t0, [timings[i] for i in sorted(timings)])
+        return {"messages": messages}
+
+    # -------- Async --------
+    async def _arun_one(self, call: Dict[str, Any], config: Optional[RunnableConfig]) -> ToolMessage:
+        tool = self.tools_by_name.get(call.get("name"))
+        if tool is None:
+            return self._error_message(call, f"{call.get('name')} is not a valid tool, try one of [{', '.join(self.tools_by_name)}].")
+        async with self._asem(tool.name):
+            try:
+                # ainvoke nutzt die Coroutine des Tools bzw. den Executor für reine Sync-Tools
+                out = await asyncio.wait_for(tool.ainvoke({**call, "type": "tool_call"}, config), self.timeout_s)
+                return self._as_tool_message(call, out)
+            except asyncio.TimeoutError:
+                self._log.warning("Tool '%s' timed out after %.1fs", call.get("name"), self.timeout_s)
+                return self._error_message(call, f"Tool timed out after {self.timeout_s}s")
+            except Exception as e:
+                return self._error_message(call, repr(e))
+
+    async def ainvoke(self, state: Dict[str, Any], config: RunnableConfig) -> Dict[str, Any]:
+        calls = self._tool_calls(state)
+        t0 = time.perf_counter()
+        timings: Dict[int, Dict[str, Any]] = {}
+
+        async def timed(i, call):
+            start = time.perf_counter()
+            msg = await self._arun_one(call, config)
+            timings[i] = self._timing(call, msg, t0, start)
+            return msg
+
+        messages = list(await asyncio.gather(*(timed(i, c) for i, c in enumerate(calls))))
+        self._record(config, t0, [timings[i] for i in sorted(timings)])
+        return {"messages": messages}
+
+    @staticmethod
+    def _timing(call: Dict[str, Any], msg: ToolMessage, t0: float, start: float) -> Dict[str, Any]:
+        return {
+            "tool_name": call.get("name"),
+            "tool_call_id": call.get("id"),
+            "started_s": round(start - t0, 4),
+            "wall_s": round(time.perf_counter() - start, 4),
+            "status": getattr(msg, "status", "success"),
+        }
+
+
+def _with_context(fn):
+    # contextvars (LangChain-Callbacks/Tracing) in den Worker-Thread mitnehmen
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.copy().run(fn, *args, **kwargs)
+    return run
@@ -16,6 +16,7 @@ from assistant.checkpointers.postgres import get_postgres_checkpoint
 from assistant.utils.utils import merge_dicts
 class ComplexState(MessagesState):
     summary: str
+    summarized_until: str   # id der letzten Nachricht, die in `summary` eingeflossen ist
     messages_history: Annotated[list[AnyMessage], add_messages]
     user:     Annotated[dict, merge_dicts]
     context:  Annotated[dict, merge_dicts]
@@ -0,0 +1,110 @@
+import json
+import re
+from typing import Any, Dict
+
+
+class ResponseFieldStreamer:
+    """
+    Extrahiert inkrementell den Text eines String-Felds (Default: "response") aus einem
+    JSON-Objekt, das das LLM Token für Token streamt (AgentResponseFormat).
+
+    - Antwortet das LLM mit freiem Text (kein JSON), wird der Text unverändert durchgereicht.
+    - Escape-Sequenzen (inkl. \\uXXXX und Surrogate-Paare) werden erst dekodiert,
+      wenn sie vollständig angekommen sind.
+    """
+
+    def __init__(self, field: str = "response"):
+        self._key_re = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._mode = "detect"  # detect -> plain | seek -> in_string -> done
+        self._buf = ""
+
+    def feed(self, text: str) -> str:
+        """Nimmt den nächsten Chunk entgegen und liefert den neu lesbaren Text (ggf. "")."""
+        if not text or self._mode == "done":
+            return ""
+        self._buf += text
+
+        if self._mode == "detect":
+            stripped = self._buf.lstrip()
+            if not stripped:
+                return ""
+            # JSON (oder JSON im Codeblock) vs. freier Text
+            self._mode = "seek" if stripped[0] in "{[`" else "plain"
+
+        if self._mode == "plain":
+            out, self._buf = self._buf, ""
+            return out
+
+        if self._mode == "seek":
+            m = self._key_re.search(self._buf)
+            if not m:
+                return ""
+            self._buf = self._buf[m.end():]
+            self._mode = "in_string"
+
+        return self._drain_string()
+
+    def _drain_string(self) -> str:
+        raw = self._buf
+        n = len(raw)
+        i = 0
+        safe_end = 0
+        closed = False
+        while i < n:
+            c = raw[i]
+            if c == "\\":
+                if i + 1 >= n:
+                    break
+                if raw[i + 1] == "u":
+                    if i + 6 > n:
+                        break
+                    # High-Surrogate: auf das zugehörige Low-Surrogate warten
+                    if raw[i + 2] in "dD" and raw[i + 3] in "89abAB":
+                        if i + 12 > n:
+                            break
+                        i += 12
+                    else:
+                        i += 6
+                else:
+                    i += 2
+                safe_end = i
+                continue
+            if c == '"':
+                closed = True
+                break
+            i += 1
+            safe_end = i
+
+        segment = raw[:safe_end]
+        self._buf = raw[safe_end:]
+        if closed:
+            self._mode = "done"
+            self._buf = ""
+        if not segment:
+            return ""
+        try:
+            return json.loads('"' + segment + '"', strict=False)
+        except ValueError:
+            return segment
+
+
+def chunk_text(content: Any) -> str:
+    """Text aus einem AIMessageChunk.content (str oder Content-Blocks, Reasoning wird ignoriert)."""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        parts = []
+        for part in content:
+            if isinstance(part, str):
+                parts.append(part)
+            elif isinstance(part, dict) and part.get("type") in ("text", "output_text"):
+                parts.append(part.get("text") or "")
+        return "".join(parts)
+    return ""
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Formatiert ein Stream-Event als Server-Sent-Event."""
+    name = event.get("event", "message")
+    data = json.dumps(event, ensure_ascii=False, default=str)
+    return f"event: {name}\ndata: {data}\n\n"
@@ -1,15 +1,38 @@
+import os
 from langgraph.graph import StateGraph, START, END
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import AIMessage, SystemMessage, HumanMessage, RemoveMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
 from assistant.state import ComplexState
+from assistant.utils.image_store import resolve_image_refs
 from icecream import ic
-def check_summary(state: ComplexState):
+
+# Zusammenfassen, sobald der (bereinigte) Verlauf im Prompt dieses Budget überschreitet
+SUMMARY_TRIGGER_TOKENS = int(os.environ.get("SUMMARY_TRIGGER_TOKENS", 4000))
+# so viele Nachrichten bleiben nach dem Zusammenfassen wörtlich im State
+SUMMARY_KEEP_LAST = int(os.environ.get("SUMMARY_KEEP_LAST", 2))
+
+
+def _unsummarized_messages(state: ComplexState) -> list:
+    """Nachrichten nach der High-Water-Mark `summarized_until` (alle, falls sie nicht mehr im State ist)."""
     messages = state["messages"]
-    messages = _clean_messages(messages)
-    # len(messages) = 10 is more or less 5 turns
-    if len(messages) > 20:
-        return "summarize_conversation"
-    return END
+    mark = state.get("summarized_until")
+    if mark:
+        for i, m in enumerate(messages):
+            if m.id == mark:
+                return messages[i + 1:]
+    return messages
+
+
+def check_summary(state: ComplexState):
+    messages = _clean_messages(state["messages"])
+    # Token-Budget statt fester Anzahl Nachrichten (früher: len(messages) > 20)
+    if count_tokens_approximately(messages) <= SUMMARY_TRIGGER_TOKENS:
+        return END
+    # ohne neue Nachrichten seit der letzten Summary gibt es nichts zu ergänzen
+    if len(_clean_messages(_unsummarized_messages(state))) < 2:
+        return END
+    return "summarize_conversation"
 
 # def _clean_messages(messages):
 #     clean_history = [
@@ -46,8 +69,13 @@ def _clean_messages(messages):
 
         clean.append(m)
     return clean
-def summarize_conversation(state: ComplexState):
-
+def build_summary_update(state: ComplexState) -> dict:
+    """
+    Erweitert die laufende Zusammenfassung inkrementell: ans LLM gehen nur die Nachrichten
+    seit der High-Water-Mark `summarized_until` plus die bisherige Summary.
+    Danach werden alle Nachrichten bis auf die letzten SUMMARY_KEEP_LAST entfernt.
+    Wird vom Graph-Node (inline) und vom SummaryWorker (Hintergrund) genutzt.
+    """
     summary = state.get("summary", "")
     if summary:
         summary_message = (
@@ -59,13 +87,22 @@ def summarize_conversation(state: ComplexState):
             Erstelle eine Zusammenfassung des obigen Gesprächs. Halte die genannten Produkte und Themen klar und strukturiert.
         """
 
-    clean_history = _clean_messages(state["messages"])
+    delta = _unsummarized_messages(state)
+    clean_delta = _clean_messages(delta)
 
-    messages = clean_history + [HumanMessage(content=summary_message)]
+    messages = clean_delta + [HumanMessage(content=summary_message)]
 
     llm = ChatOpenAI(model="gpt-5-mini")
-    response = llm.invoke(messages)
+    response = llm.invoke(resolve_image_refs(messages))
 
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
+    keep = SUMMARY_KEEP_LAST
+    to_delete = state["messages"][:-keep] if keep > 0 else state["messages"]
+    delete_messages = [RemoveMessage(id=m.id) for m in to_delete]
 
-    return {"summary": response.content, "messages": delete_messages}
\ No newline at end of file
+    update = {"summary": response.content, "messages": delete_messages}
+    if delta:
+        update["summarized_until"] = delta[-1].id
+    return update
+
+def summarize_conversation(state: ComplexState):
+    return build_summary_update(state)
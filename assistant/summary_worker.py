@@ -0,0 +1,216 @@
+import asyncio
+import atexit
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional
+
+from langgraph.graph.state import CompiledStateGraph
+
+from assistant.logger import get_assistant_logger
+from assistant.summary import build_summary_update, check_summary
+
+SUMMARY_NODE = "summarize_conversation"
+
+
+class _ThreadLocks:
+    """Ein Lock pro Conversation-Thread; Einträge werden nach der letzten Freigabe entfernt."""
+
+    def __init__(self):
+        self._guard = threading.Lock()
+        self._locks: Dict[str, list] = {}   # thread_id -> [Lock, refcount]
+
+    @contextmanager
+    def hold(self, thread_id: str) -> Iterator[None]:
+        with self._guard:
+            entry = self._locks.setdefault(thread_id, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+        try:
+            yield
+        finally:
+            entry[0].release()
+            self._release_ref(thread_id, entry)
+
+    @asynccontextmanager
+    async def ahold(self, thread_id: str, poll_s: float = 0.02) -> AsyncIterator[None]:
+        """Wie hold(), wartet aber ohne den Event-Loop zu blockieren (Polling statt acquire())."""
+        with self._guard:
+            entry = self._locks.setdefault(thread_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            while not entry[0].acquire(blocking=False):
+                await asyncio.sleep(poll_s)
+        except BaseException:
+            self._release_ref(thread_id, entry)
+            raise
+        try:
+            yield
+        finally:
+            entry[0].release()
+            self._release_ref(thread_id, entry)
+
+    def _release_ref(self, thread_id: str, entry: list) -> None:
+        with self._guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._locks.pop(thread_id, None)
+
+    def __len__(self) -> int:
+        with self._guard:
+            return len(self._locks)
+
+
+class SummaryWorker:
+    """
+    Fasst Konversationen im Hintergrund zusammen, nachdem die Antwort schon ausgeliefert ist.
+
+    - Queue + ein Worker-Thread; ein Thread wird höchstens einmal gleichzeitig eingereiht.
+    - Der LLM-Call läuft ohne Lock auf einem Snapshot. Geschrieben wird unter dem
+      Thread-Lock, den auch Agent.chat für die Dauer eines Turns hält (siehe thread_lock).
+    - Vor dem Schreiben wird geprüft, ob die Summary inzwischen von jemand anderem
+      geändert wurde (Versionsvergleich). Es werden nur Messages entfernt, die schon im
+      Snapshot waren – Nachrichten eines parallelen Turns bleiben erhalten.
+    - Locks gelten pro Prozess; bei mehreren Workern/Prozessen verhindert der
+      Versionsvergleich doppelte Summaries, nicht aber parallele Turns.
+    """
+
+    def __init__(self, get_graph: Callable[[], CompiledStateGraph]):
+        self._get_graph = get_graph
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._pending: set = set()
+        self._pending_lock = threading.Lock()
+        self._locks = _ThreadLocks()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+        self._in_flight = 0
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Any] = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "processed": 0,
+            "skipped": 0,
+            "stale": 0,
+            "failed": 0,
+            "lag_s_last": None,
+            "lag_s_max": 0.0,
+            "lag_s_total": 0.0,
+        }
+        self._log = get_assistant_logger()
+
+    # -------- Locks --------
+    def thread_lock(self, thread_id: str):
+        """Context-Manager, der den Conversation-Thread exklusiv hält (Turn bzw. Summary-Write)."""
+        return self._locks.hold(thread_id)
+
+    def athread_lock(self, thread_id: str):
+        """Async-Variante von thread_lock() für Agent.achat."""
+        return self._locks.ahold(thread_id)
+
+    # -------- Lifecycle --------
+    def start(self) -> None:
+        with self._start_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="summary-worker", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Arbeitet die Queue ab (max. timeout Sekunden) und beendet den Worker."""
+        with self._start_lock:
+            thread = self._thread
+            if thread is None or self._stopped:
+                return
+            self._stopped = True
+            self._queue.put(None)
+        thread.join(timeout)
+
+    def submit(self, thread_id: str) -> bool:
+        """
+        Reiht einen Thread zur Zusammenfassung ein.
+        :return: False, wenn der Thread bereits wartet
+        """
+        with self._pending_lock:
+            if thread_id in self._pending:
+                with self._stats_lock:
+                    self._stats["deduplicated"] += 1
+                return False
+            self._pending.add(thread_id)
+        self.start()
+        self._queue.put((thread_id, time.time()))
+        with self._stats_lock:
+            self._stats["enqueued"] += 1
+        return True
+
+    # -------- Worker --------
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            thread_id, enqueued_at = item
+            with self._pending_lock:
+                self._pending.discard(thread_id)
+            with self._stats_lock:
+                self._in_flight += 1
+            outcome = "failed"
+            try:
+                outcome = self._process(thread_id)
+            except Exception as e:
+                self._log.error("Background summary for thread '%s' failed: %s",
+                                thread_id, e.__class__.__name__, exc_info=True)
+            finally:
+                lag = time.time() - enqueued_at
+                with self._stats_lock:
+                    self._in_flight -= 1
+                    self._stats[outcome] += 1
+                    self._stats["lag_s_last"] = lag
+                    self._stats["lag_s_max"] = max(self._stats["lag_s_max"], lag)
+                    self._stats["lag_s_total"] += lag
+                self._queue.task_done()
+
+    def _process(self, thread_id: str) -> str:
+        graph = self._get_graph()
+        config = {"configurable": {"thread_id": thread_id}}
+
+        snapshot = graph.get_state(config).values
+        if check_summary(snapshot) != SUMMARY_NODE:
+            return "skipped"
+        base_summary = snapshot.get("summary", "")
+
+        # teurer LLM-Call ohne Lock
+        update = build_summary_update(snapshot)
+
+        with self.thread_lock(thread_id):
+            current = graph.get_state(config).values
+            if current.get("summary", "") != base_summary:
+                # jemand anderes hat inzwischen zusammengefasst -> verwerfen
+                return "stale"
+            current_ids = {m.id for m in current.get("messages", [])}
+            removes = [m for m in update["messages"] if m.id in current_ids]
+            graph.update_state(
+                config,
+                {**update, "messages": removes},
+                as_node=SUMMARY_NODE,
+            )
+        return "processed"
+
+    # -------- Metrics --------
+    def metrics(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            st = dict(self._stats)
+            in_flight = self._in_flight
+        done = st["processed"] + st["skipped"] + st["stale"] + st["failed"]
+        return {
+            "queue_depth": self._queue.qsize(),
+            "in_flight": in_flight,
+            "locked_threads": len(self._locks),
+            "lag_s_avg": (st["lag_s_total"] / done) if done else None,
+            "running": bool(self._thread and self._thread.is_alive()),
+            **st,
+        }
@@ -1,72 +1,207 @@
+import asyncio
 import os
+import random
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
 import requests
-from typing import Optional
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
 HOST_VAR_NAME = "FARMELY_HOST"
 API_KEY_VAR_NAME = "FARMELY_API_KEY"
 
+FARMELY_CONNECT_TIMEOUT_S = float(os.environ.get("FARMELY_CONNECT_TIMEOUT_S", 3))
+FARMELY_READ_TIMEOUT_S = float(os.environ.get("FARMELY_READ_TIMEOUT_S", 10))
+FARMELY_RETRIES = int(os.environ.get("FARMELY_RETRIES", 2))
+FARMELY_BACKOFF_S = float(os.environ.get("FARMELY_BACKOFF_S", 0.3))
+FARMELY_POOL_SIZE = int(os.environ.get("FARMELY_POOL_SIZE", 16))
+# parallele Einzel-Requests bei Batch-Abfragen
+FARMELY_BATCH_CONCURRENCY = int(os.environ.get("FARMELY_BATCH_CONCURRENCY", 8))
+# optionaler Batch-Endpoint für Lagerbestände, z. B. "/api/v1/product/stock" (GET ?ids=1,2,3).
+# Leer = nicht vorhanden -> parallele Einzel-Requests.
+FARMELY_STOCK_BATCH_PATH = os.environ.get("FARMELY_STOCK_BATCH_PATH", "")
 
-def fetch_customer_history(customer_id: str, timestamp: Optional[int] = None):
+# bei diesen Status-Codes lohnt ein erneuter Versuch (nur GET, also idempotent)
+_RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class FarmelyClient:
     """
-    Ruft die Customer-History über die API ab.
+    HTTP-Client für die Farmely-API.
 
-    :param customer_id: ID des Kunden
-    :param timestamp: Optionaler UNIX-Timestamp (int)
-    :return: Response JSON oder Fehlermeldung
+    - Sync: eine requests.Session mit Keep-Alive-Pool (``pool_size``) und urllib3-Retry
+      (Backoff, nur GET, bei Verbindungsfehlern und 429/5xx).
+    - Async: ein httpx.AsyncClient pro Event-Loop mit denselben Timeouts/Limits; Retry mit
+      exponentiellem Backoff + Jitter.
+    - Fehler werden wie bisher ausgegeben und als None zurückgegeben; fehlende Host/API-Key
+      Umgebungsvariablen lösen EnvironmentError aus.
     """
-    # Umgebungsvariablen lesen
-    host = os.getenv(HOST_VAR_NAME)
-    api_key = os.getenv(API_KEY_VAR_NAME)
 
-    if not host or not api_key:
-        raise EnvironmentError("HOST oder APIKEY ist nicht in den Umgebungsvariablen gesetzt.")
+    def __init__(
+        self,
+        host: Optional[str] = None,
+        api_key: Optional[str] = None,
+        connect_timeout_s: float = FARMELY_CONNECT_TIMEOUT_S,
+        read_timeout_s: float = FARMELY_READ_TIMEOUT_S,
+        retries: int = FARMELY_RETRIES,
+        backoff_s: float = FARMELY_BACKOFF_S,
+        pool_size: int = FARMELY_POOL_SIZE,
+    ):
+        self.host = (host or os.getenv(HOST_VAR_NAME) or "").rstrip("/")
+        self.api_key = api_key or os.getenv(API_KEY_VAR_NAME)
+        self.timeout = (connect_timeout_s, read_timeout_s)
+        self.retries = max(0, int(retries))
+        self.backoff_s = backoff_s
+        self.pool_size = max(1, int(pool_size))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(
+                total=self.retries,
+                backoff_factor=self.backoff_s,
+                status_forcelist=_RETRY_STATUS,
+                allowed_methods=frozenset(["GET"]),
+                raise_on_status=False,
+            ),
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._aclients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+        self._aclients_lock = threading.Lock()
+
+    def _check_env(self) -> None:
+        if not self.host or not self.api_key:
+            raise EnvironmentError("HOST oder APIKEY ist nicht in den Umgebungsvariablen gesetzt.")
+
+    def _headers(self, accept: str = "application/json") -> Dict[str, str]:
+        return {"Accept": accept, "X-API-KEY": self.api_key}
+
+    # -------- sync --------
+    def get_json(self, path: str, params: Optional[Dict[str, Any]] = None,
+                 accept: str = "application/json", error_msg: str = "Fehler beim API-Request") -> Optional[Any]:
+        self._check_env()
+        response = None
+        try:
+            response = self.session.get(
+                f"{self.host}{path}", headers=self._headers(accept), params=params or {}, timeout=self.timeout
+            )
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"{error_msg}: {e}")
+            print(f"Status Code: {response.status_code if response is not None else 'N/A'}")
+            print(f"Response Text: {response.text if response is not None else 'N/A'}")
+            return None
+
+    # -------- async --------
+    def _aclient(self) -> httpx.AsyncClient:
+        # httpx-Clients sind an den Event-Loop gebunden, auf dem ihre Verbindungen entstanden sind
+        loop = asyncio.get_running_loop()
+        with self._aclients_lock:
+            client = self._aclients.get(loop)
+            if client is None or client.is_closed:
+                client = httpx.AsyncClient(
+                    timeout=httpx.Timeout(self.timeout[1], connect=self.timeout[0]),
+                    limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+                )
+                self._aclients[loop] = client
+            return client
+
+    async def aget_json(self, path: str, params: Optional[Dict[str, Any]] = None,
+                        accept: str = "application/json", error_msg: str = "Fehler beim API-Request") -> Optional[Any]:
+        self._check_env()
+        client = self._aclient()
+        url = f"{self.host}{path}"
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = await client.get(url, headers=self._headers(accept), params=params or {})
+                if response.status_code in _RETRY_STATUS and attempt < self.retries:
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                response.raise_for_status()
+                return response.json()
+            except httpx.TransportError as e:
+                if attempt < self.retries:
+                    await asyncio.sleep(self._backoff(attempt))
+                    continue
+                print(f"{error_msg}: {e}")
+                return None
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"{error_msg}: {e}")
+                print(f"Status Code: {response.status_code if response is not None else 'N/A'}")
+                print(f"Response Text: {response.text if response is not None else 'N/A'}")
+                return None
+        return None
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_s * (2 ** attempt) * (1 + random.random() * 0.2)
+
+    async def aclose(self) -> None:
+        with self._aclients_lock:
+            clients = list(self._aclients.values())
+            self._aclients.clear()
+        for client in clients:
+            await client.aclose()
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_CLIENT: Optional[FarmelyClient] = None
+_CLIENT_LOCK = threading.Lock()
 
+
+def get_farmely_client() -> FarmelyClient:
+    """Prozessweit geteilter Client (Host/API-Key werden beim ersten Aufruf aus der Umgebung gelesen)."""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = FarmelyClient()
+        return _CLIENT
+
+
+def _customer_history_params(timestamp: Optional[int]) -> Dict[str, Any]:
     # Timestamp validieren (wenn gesetzt)
     if timestamp is not None:
         if not isinstance(timestamp, int) or timestamp < 0:
             raise ValueError("Timestamp muss ein positiver UNIX-Zeitstempel (int) sein.")
+    return {"since": timestamp} if timestamp is not None else {}
 
-    # URL zusammenbauen
-    url = f"{host}/api/v1/customer/{customer_id}/history"
-    params = {"since": timestamp} if timestamp is not None else {}
-
-    # Header setzen
-    headers = {
-        "Accept": "text/plain, application/json",
-        "X-API-KEY": api_key
-    }
-
-    # API Request
-    try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Fehler beim API-Request: {e}")
-        return None
-    
-def fetch_changed_products(timestamp: int, sample: Optional[int] = None):
+
+def fetch_customer_history(customer_id: str, timestamp: Optional[int] = None):
     """
-    Ruft geänderte Produkte ab (per Timestamp oder zufällige Auswahl via Sample).
-    Der 'changed' Parameter ist verpflichtend.
+    Ruft die Customer-History über die API ab.
 
-    :param timestamp: Optionaler UNIX-Timestamp (int), ignoriert wenn sample gesetzt ist
-    :param sample: Optionaler Sample-Wert (int), gibt Zufallsprodukte zurück
-    :return: Response JSON oder None bei Fehler
+    :param customer_id: ID des Kunden
+    :param timestamp: Optionaler UNIX-Timestamp (int)
+    :return: Response JSON oder Fehlermeldung
     """
-    # Umgebungsvariablen lesen
-    host = os.getenv(HOST_VAR_NAME)
-    api_key = os.getenv(API_KEY_VAR_NAME)
+    return get_farmely_client().get_json(
+        f"/api/v1/customer/{customer_id}/history",
+        params=_customer_history_params(timestamp),
+        accept="text/plain, application/json",
+    )
 
-    if not host or not api_key:
-        raise EnvironmentError("HOST oder APIKEY ist nicht in den Umgebungsvariablen gesetzt.")
 
+async def afetch_customer_history(customer_id: str, timestamp: Optional[int] = None):
+    """Async-Variante von fetch_customer_history."""
+    return await get_farmely_client().aget_json(
+        f"/api/v1/customer/{customer_id}/history",
+        params=_customer_history_params(timestamp),
+        accept="text/plain, application/json",
+    )
 
-    params = {}
-    # Sample überschreibt Timestamp
 
+def _changed_products_params(timestamp: int, sample: Optional[int]) -> Dict[str, Any]:
+    params = {}
     if not isinstance(timestamp, int) or timestamp < 0:
         raise ValueError("Timestamp muss ein positiver UNIX-Zeitstempel (int) sein.")
     params["since"] = timestamp
@@ -74,24 +209,28 @@ def fetch_changed_products(timestamp: int, sample: Optional[int] = None):
         if not isinstance(sample, int) or sample <= 0:
             raise ValueError("Sample muss ein positiver Integer sein.")
         params["test"] = sample
+    return params
+
+
+def fetch_changed_products(timestamp: int, sample: Optional[int] = None):
+    """
+    Ruft geänderte Produkte ab (per Timestamp oder zufällige Auswahl via Sample).
+    Der 'changed' Parameter ist verpflichtend.
+
+    :param timestamp: Optionaler UNIX-Timestamp (int), ignoriert wenn sample gesetzt ist
+    :param sample: Optionaler Sample-Wert (int), gibt Zufallsprodukte zurück
+    :return: Response JSON oder None bei Fehler
+    """
+    return get_farmely_client().get_json(
+        "/api/v1/product/changed", params=_changed_products_params(timestamp, sample)
+    )
 
-    # URL & Header
-    url = f"{host}/api/v1/product/changed"
-    headers = {
-        "Accept": "application/json",
-        "X-API-KEY": api_key
-    }
-
-    # Request senden
-    try:
-        response = requests.get(url, headers=headers, params=params)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Fehler beim API-Request: {e}")
-        print(f"Status Code: {response.status_code if 'response' in locals() else 'N/A'}")
-        print(f"Response Text: {response.text if 'response' in locals() else 'N/A'}")
-        return None
+
+async def afetch_changed_products(timestamp: int, sample: Optional[int] = None):
+    """Async-Variante von fetch_changed_products."""
+    return await get_farmely_client().aget_json(
+        "/api/v1/product/changed", params=_changed_products_params(timestamp, sample)
+    )
 
 
 def fetch_product_stock_api(product_id: str):
@@ -103,68 +242,112 @@ def fetch_product_stock_api(product_id: str):
     """
     if not product_id:
         raise ValueError("Product ID ist erforderlich.")
-        return None
+    return get_farmely_client().get_json(
+        f"/api/v1/product/{product_id}/stock", error_msg="Fehler beim Abrufen des Lagerbestands"
+    )
+
+
+async def afetch_product_stock_api(product_id: str):
+    """Async-Variante von fetch_product_stock_api."""
+    if not product_id:
+        raise ValueError("Product ID ist erforderlich.")
+    return await get_farmely_client().aget_json(
+        f"/api/v1/product/{product_id}/stock", error_msg="Fehler beim Abrufen des Lagerbestands"
+    )
+
+
+def _unique_ids(product_ids: Sequence[str]) -> List[str]:
+    ids = list(dict.fromkeys(str(pid) for pid in product_ids if pid not in (None, "")))
+    if not ids:
+        raise ValueError("Product ID ist erforderlich.")
+    return ids
+
 
-    # Umgebungsvariablen lesen
-    host = os.getenv(HOST_VAR_NAME)
-    api_key = os.getenv(API_KEY_VAR_NAME)
-
-    if not host or not api_key:
-        raise EnvironmentError("HOST oder APIKEY ist nicht in den Umgebungsvariablen gesetzt.")
-
-    # URL & Header vorbereiten
-    url = f"{host}/api/v1/product/{product_id}/stock"
-    headers = {
-        "Accept": "application/json",
-        "X-API-KEY": api_key
-    }
-
-    # API-Call
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        response_json = response.json()
-        print(response_json)
-        return response_json
-    except requests.RequestException as e:
-        print(f"Fehler beim Abrufen des Lagerbestands: {e}")
-        print(f"Status Code: {response.status_code if 'response' in locals() else 'N/A'}")
-        print(f"Response Text: {response.text if 'response' in locals() else 'N/A'}")
+def _split_batch_response(data: Any, ids: List[str]) -> Optional[Dict[str, Any]]:
+    """
+    Batch-Antwort -> {product_id: stock}. Akzeptiert ein Dict (id -> stock) oder eine Liste
+    von Objekten mit ``product_id``/``id``. Unbekanntes Format oder keine der angefragten IDs
+    enthalten (z. B. {"data": [...]}) -> None (Fallback auf Einzel-Requests).
+    """
+    if isinstance(data, dict):
+        by_id = {str(k): v for k, v in data.items()}
+    elif isinstance(data, list):
+        by_id = {}
+        for item in data:
+            if not isinstance(item, dict):
+                return None
+            pid = item.get("product_id", item.get("id", item.get("ID")))
+            if pid is not None:
+                by_id[str(pid)] = item
+    else:
+        return None
+    if not any(pid in by_id for pid in ids):
         return None
+    return {pid: by_id.get(pid) for pid in ids}
+
+
+def fetch_product_stock_many(product_ids: Sequence[str],
+                             max_concurrency: int = FARMELY_BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """
+    Lagerbestände mehrerer Produkte: über FARMELY_STOCK_BATCH_PATH (ein Request), sonst
+    parallele Einzel-Requests (höchstens ``max_concurrency`` gleichzeitig, Keep-Alive-Pool).
+
+    :return: {product_id: JSON-Antwort oder None bei Fehler}, Reihenfolge wie ``product_ids``
+    """
+    ids = _unique_ids(product_ids)
+    client = get_farmely_client()
+    if FARMELY_STOCK_BATCH_PATH and len(ids) > 1:
+        data = client.get_json(FARMELY_STOCK_BATCH_PATH, params={"ids": ",".join(ids)},
+                               error_msg="Fehler beim Abrufen der Lagerbestände")
+        result = _split_batch_response(data, ids) if data is not None else None
+        if result is not None:
+            return result
+    if len(ids) == 1:
+        return {ids[0]: fetch_product_stock_api(ids[0])}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(ids)))) as pool:
+        return dict(zip(ids, pool.map(fetch_product_stock_api, ids)))
+
+
+async def afetch_product_stock_many(product_ids: Sequence[str],
+                                    max_concurrency: int = FARMELY_BATCH_CONCURRENCY) -> Dict[str, Any]:
+    """Async-Variante von fetch_product_stock_many (Semaphore statt Thread-Pool)."""
+    ids = _unique_ids(product_ids)
+    client = get_farmely_client()
+    if FARMELY_STOCK_BATCH_PATH and len(ids) > 1:
+        data = await client.aget_json(FARMELY_STOCK_BATCH_PATH, params={"ids": ",".join(ids)},
+                                      error_msg="Fehler beim Abrufen der Lagerbestände")
+        result = _split_batch_response(data, ids) if data is not None else None
+        if result is not None:
+            return result
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def one(pid: str):
+        async with sem:
+            return await afetch_product_stock_api(pid)
+
+    return dict(zip(ids, await asyncio.gather(*(one(pid) for pid in ids))))
+
+
 def fetch_product(product_id: str):
     """
-    Ruft den Lagerbestand eines Produkts anhand seiner ID ab.
+    Ruft ein Produkt anhand seiner ID ab.
 
     :param product_id: Die Produkt-ID
-    :return: JSON-Antwort mit Lagerbestand oder None bei Fehler
+    :return: JSON-Antwort mit den Produktdaten oder None bei Fehler
     """
-    # Umgebungsvariablen lesen
-    host = os.getenv(HOST_VAR_NAME)
-    api_key = os.getenv(API_KEY_VAR_NAME)
-
-    if not host or not api_key:
-        raise EnvironmentError("HOST oder APIKEY ist nicht in den Umgebungsvariablen gesetzt.")
-
-    # URL & Header vorbereiten
-    url = f"{host}/api/v1/product/{product_id}"
-    headers = {
-        "Accept": "application/json",
-        "X-API-KEY": api_key
-    }
-
-    # API-Call
-    try:
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException as e:
-        print(f"Fehler beim Abrufen des Lagerbestands: {e}")
-        print(f"Status Code: {response.status_code if 'response' in locals() else 'N/A'}")
-        print(f"Response Text: {response.text if 'response' in locals() else 'N/A'}")
-        return None
+    return get_farmely_client().get_json(
+        f"/api/v1/product/{product_id}", error_msg="Fehler beim Abrufen des Produkts"
+    )
+
+
+async def afetch_product(product_id: str):
+    """Async-Variante von fetch_product."""
+    return await get_farmely_client().aget_json(
+        f"/api/v1/product/{product_id}", error_msg="Fehler beim Abrufen des Produkts"
+    )
+
 
- 
 if __name__ == "__main__":
     product_id = "4"
     stock = fetch_product_stock_api(product_id)
-    print(stock)
\ No newline at end of file
+    print(stock)
@@ -1,33 +1,55 @@
-from langchain_core.tools import tool
-from assistant.tools.farmely.farmely_api import fetch_product_stock_api
+from langchain_core.tools import StructuredTool
+from assistant.tools.farmely.farmely_api import (
+    afetch_product_stock_api,
+    afetch_product_stock_many,
+    fetch_product_stock_api,
+    fetch_product_stock_many,
+)
 import json
-import os
 from assistant.logger import log_execution
-from pathlib import Path
+from assistant.tools.farmely.product_index import ProductMatch, get_product_name_index
+from typing import Any, Dict, List, Optional
 
-def _get_product_id_by_name(product_name: str) -> str:
+def _get_product_id_by_name(product_name: str) -> Optional[str]:
     """
     Fetches the product ID by its name.
     :param product_name: The name of the product
-    :return: The product ID as a string or None if not found
+    :return: The product ID as a string or None if not found or ambiguous
     """
-    curr_dir = Path(__file__).resolve().parent
-    file_name = "rag_products.json"
-    file_path = curr_dir / "data" / file_name
+    return get_product_name_index().resolve(product_name).product_id
+
+
+def _resolve_product_id(product_id: str) -> ProductMatch:
     try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            products = json.load(f)
-    except FileNotFoundError:
-        print(f"File {file_name} not found.")
-        return product_name
- 
-    produkt_id = next((p.get("ID", p.get("Id", p.get("id", None))) for p in products if p["Name"] == product_name), None)
-    return str(produkt_id)
+        int(product_id)
+        return ProductMatch(product_id=product_id)
+    except ValueError:
+        # Fallback: Name über den In-Memory-Index auflösen
+        print(f"Invalid product ID: {product_id}. Must be an integer. I try to check the product name.")
+        match = get_product_name_index().resolve(product_id)
+        if not match.product_id and not match.candidates:
+            print(f"Product with name {product_id} not found.")
+        return match
+
+
+def _format_stock(stock_json: Optional[dict], product_id: str) -> Optional[str]:
+    if not stock_json:
+        return None
+    stock_json["product_id"] = product_id
+    return json.dumps(stock_json, indent=4, ensure_ascii=False)
+
+
+def _format_candidates(requested: str, match: ProductMatch) -> Optional[str]:
+    if not match.candidates:
+        return None
+    return json.dumps({
+        "error": f"Product name '{requested}' is ambiguous. Retry with one of the candidate product IDs.",
+        "candidates": match.candidates,
+    }, indent=4, ensure_ascii=False)
 
 
-@tool
 @log_execution()
-def fetch_product_stock(product_id: str):
+def _fetch_product_stock(product_id: str):
     """
     Fetches the stock of a product by its ID. 
 
@@ -35,22 +57,78 @@ def fetch_product_stock(product_id: str):
     :return: JSON string with stock information or None on error
     """
     print(f"Fetching stock for product ID: {product_id}")
-    try:
-        _id = int(product_id)
-    except ValueError:
-        # Fallback: make an db call later
-        print(f"Invalid product ID: {product_id}. Must be an integer. I try to check the product name.")
-        product_id = _get_product_id_by_name(product_id)
-        if not product_id:
-            print(f"Product with name {product_id} not found.")
-            return None
-        
-    stock_json = fetch_product_stock_api(str(product_id))
-    if not stock_json:
-        return None
-    stock_json["product_id"] = product_id
-    stock_json_str = json.dumps(stock_json, indent=4, ensure_ascii=False)
-    return stock_json_str
+    match = _resolve_product_id(product_id)
+    if not match.product_id:
+        return _format_candidates(product_id, match)
+    return _format_stock(fetch_product_stock_api(match.product_id), match.product_id)
+
+
+@log_execution()
+async def _afetch_product_stock(product_id: str):
+    print(f"Fetching stock for product ID: {product_id}")
+    match = _resolve_product_id(product_id)
+    if not match.product_id:
+        return _format_candidates(product_id, match)
+    return _format_stock(await afetch_product_stock_api(match.product_id), match.product_id)
+
+
+# sync für graph.invoke, coroutine für graph.ainvoke (ToolNode wählt passend)
+fetch_product_stock = StructuredTool.from_function(
+    func=_fetch_product_stock,
+    coroutine=_afetch_product_stock,
+    name="fetch_product_stock",
+)
+
+def _resolve_product_ids(product_ids: List[str]) -> Dict[str, ProductMatch]:
+    # Eingabe (ID oder Name) -> Auflösung
+    return {str(pid): _resolve_product_id(str(pid)) for pid in dict.fromkeys(product_ids)}
+
+
+def _format_stock_batch(resolved: Dict[str, ProductMatch], stocks: Dict[str, Any]) -> str:
+    results = []
+    for requested, match in resolved.items():
+        pid = match.product_id
+        stock = stocks.get(pid) if pid else None
+        if stock is not None:
+            # Batch-Endpoint kann auch reine Zahlen liefern (id -> Bestand)
+            results.append({**(stock if isinstance(stock, dict) else {"stock": stock}), "product_id": pid})
+        elif match.candidates:
+            results.append({"product_id": requested, "error": "ambiguous", "candidates": match.candidates})
+        else:
+            results.append({"product_id": pid or requested, "error": "not found" if not pid else "unavailable"})
+    return json.dumps({"results": results}, indent=4, ensure_ascii=False)
+
+
+@log_execution()
+def _fetch_product_stock_batch(product_ids: List[str]):
+    """
+    Fetches the stock of several products at once (use instead of multiple fetch_product_stock calls).
+
+    :param product_ids: List of product IDs
+    :return: JSON string {"results": [...]} with one entry per product, in the given order
+    """
+    print(f"Fetching stock for product IDs: {product_ids}")
+    resolved = _resolve_product_ids(product_ids)
+    ids = [m.product_id for m in resolved.values() if m.product_id]
+    stocks = fetch_product_stock_many(ids) if ids else {}
+    return _format_stock_batch(resolved, stocks)
+
+
+@log_execution()
+async def _afetch_product_stock_batch(product_ids: List[str]):
+    print(f"Fetching stock for product IDs: {product_ids}")
+    resolved = _resolve_product_ids(product_ids)
+    ids = [m.product_id for m in resolved.values() if m.product_id]
+    stocks = await afetch_product_stock_many(ids) if ids else {}
+    return _format_stock_batch(resolved, stocks)
+
+
+fetch_product_stock_batch = StructuredTool.from_function(
+    func=_fetch_product_stock_batch,
+    coroutine=_afetch_product_stock_batch,
+    name="fetch_product_stock_batch",
+)
+
 
 if __name__ == "__main__":
     product_id = "4"
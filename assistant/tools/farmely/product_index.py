@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from assistant.tools.internal.reference_data import FileBackedData
+from assistant.utils.fuzzy_index import FuzzyNameIndex
+
+RAG_PRODUCTS_FILE = Path(os.environ.get(
+    "RAG_PRODUCTS_PATH", Path(__file__).resolve().parent / "data" / "rag_products.json"
+))
+# Fuzzy-Treffer wird nur übernommen, wenn er gut genug ist und klar vor dem nächsten liegt
+PRODUCT_MATCH_MIN_SCORE = float(os.environ.get("PRODUCT_MATCH_MIN_SCORE", 0.85))
+PRODUCT_MATCH_MARGIN = float(os.environ.get("PRODUCT_MATCH_MARGIN", 0.05))
+
+
+def _product_id(product: Dict[str, Any]) -> Optional[str]:
+    pid = product.get("ID", product.get("Id", product.get("id")))
+    return None if pid is None else str(pid)
+
+
+@dataclass
+class ProductMatch:
+    """Ergebnis der Namensauflösung: eindeutige ``product_id`` oder ``candidates`` zur Auswahl."""
+    product_id: Optional[str] = None
+    candidates: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class ProductNameIndex:
+    """
+    Name -> Produkt-ID aus rag_products.json, einmal pro Dateiversion aufgebaut.
+    Stufen: exakter Name, casefold, danach fuzzy (FuzzyNameIndex). Mehrdeutige Treffer
+    liefern Kandidaten statt einer geratenen ID.
+    """
+
+    def __init__(self, products: List[Dict[str, Any]]):
+        self.exact: Dict[str, List[str]] = {}
+        self.folded: Dict[str, List[str]] = {}
+        self.names: Dict[str, str] = {}
+        entries = []
+        for p in products:
+            name, pid = p.get("Name"), _product_id(p)
+            if not name or pid is None:
+                continue
+            self.names.setdefault(pid, name)
+            for key, index in ((name, self.exact), (name.strip().casefold(), self.folded)):
+                ids = index.setdefault(key, [])
+                if pid not in ids:
+                    ids.append(pid)
+            entries.append((name, pid))
+        self.fuzzy: FuzzyNameIndex[str] = FuzzyNameIndex(entries)
+
+    @classmethod
+    def load(cls, path: Path) -> "ProductNameIndex":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                products = json.load(f)
+        except FileNotFoundError:
+            # leerer Index; sobald die Datei existiert, wird neu geladen
+            return cls([])
+        return cls(products if isinstance(products, list) else [])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _candidates(self, scored: List[tuple]) -> List[Dict[str, Any]]:
+        return [{"product_id": pid, "name": self.names.get(pid), "score": score} for pid, score in scored]
+
+    def resolve(self, name: str, limit: int = 5) -> ProductMatch:
+        for ids in (self.exact.get(name), self.folded.get(name.strip().casefold())):
+            if ids and len(ids) == 1:
+                return ProductMatch(product_id=ids[0])
+            if ids:
+                return ProductMatch(candidates=self._candidates([(pid, 1.0) for pid in ids[:limit]]))
+        hits = self.fuzzy.search(name, limit=limit)
+        if not hits:
+            return ProductMatch()
+        top_id, top_score = hits[0]
+        runner_up = next((s for pid, s in hits[1:] if pid != top_id), 0.0)
+        if top_score >= PRODUCT_MATCH_MIN_SCORE and top_score - runner_up >= PRODUCT_MATCH_MARGIN:
+            return ProductMatch(product_id=top_id)
+        return ProductMatch(candidates=self._candidates(hits))
+
+
+_INDEX: Optional[FileBackedData[ProductNameIndex]] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def _index_source() -> FileBackedData[ProductNameIndex]:
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None:
+            _INDEX = FileBackedData(RAG_PRODUCTS_FILE, ProductNameIndex.load)
+        return _INDEX
+
+
+def get_product_name_index() -> ProductNameIndex:
+    """Prozessweiter Index; wird neu aufgebaut, wenn sich rag_products.json ändert."""
+    return _index_source().get()
+
+
+def invalidate_product_name_index() -> None:
+    """Erzwingt einen Neuaufbau beim nächsten Zugriff (z. B. nach einem Katalog-Update)."""
+    global _INDEX
+    with _INDEX_LOCK:
+        _INDEX = None
@@ -1,6 +1,8 @@
+import random
 import sqlite3
 from pathlib import Path
 from langchain_core.tools import tool
+from assistant.tools.internal.reference_data import get_category_data
 
 # just for logging 2025-08-13
 # ['Körperpflege', 'Reinigungsmittel', 'Fertiggerichte & Konserven', 'Milchprodukte & Eier', 'Feinkost & Fertiggerichte', 'Haushaltswaren', 'Limonade', 'Fleisch & Fisch (tiefgekühlt)', 'Müsli, Flocken & Nüsse', 'Öl, Essig & Soßen', 'Sonstiges', 'Sonstige Getränke', 'Sonstige Drogerieartikel', 'Sonstiges Gebäck', 'Pasta, Getreide & Hülsenfrüchte', 'Salziges Gebäck & Snacks', 'Wurstwaren', 'Smoothies & Sirupe', 'Gewürze & Kochhilfen', 'Brotaufstriche & Honig', 'Süßwaren', 'Vegan & Vegetarisch', 'Gemüse', 'Wasser', 'Wein & Sekt', 'Tiernahrung', 'Baby-Körperpflege', 'Babynahrung', 'Backzutaten', 'Bier', 'Brot & Brötchen', 'Käse', 'Kakao & Kaffee-Alternativen', 'Kaffee', 'Fertiggerichte & Gebäck (tiefgekühlt)', 'Obst', 'Obst (tiefgekühlt)', 'Eis & Desserts (tiefgekühlt)', 'Säfte', 'Fleisch & Fisch', 'Haltbare Milch & Milchgetränke', 'Samen & Kerne', 'Spirituosen', 'Tee', 'Gemüse & Kräuter (tiefgekühlt)']
@@ -14,12 +16,7 @@ def get_all_categories() -> list[str]:
     """
     returns all categories as german titles as a list
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT DISTINCT Kategorie FROM categories")
-    categories = [row["Kategorie"] for row in cursor.fetchall()]
-    conn.close()
-    return categories
+    return list(get_category_data().category_list)
 
 @tool
 def get_products_per_categorie(categorie:str, limit:int=10) -> list[dict]:
@@ -32,17 +29,14 @@ def get_products_per_categorie(categorie:str, limit:int=10) -> list[dict]:
     - A list of dictionaries representing the products in the specified category.
     Returns "Kategorie nicht gefunden" if the category is not found.
     """
-    if categorie not in get_all_categories():
+    data = get_category_data()
+    if categorie not in data.categories:
         return "Kategorie nicht gefunden"
     if limit > 10:
         limit = 10
-    conn = get_connection()
-    cursor = conn.cursor()
-    # order by random to prevent bias
-    cursor.execute("SELECT * FROM products_categories WHERE Kategorie = ? ORDER BY RANDOM() LIMIT ?", (categorie, limit))
-    rows = cursor.fetchall()
-    conn.close()
-    return [dict(row) for row in rows]
+    products = data.products_by_category.get(categorie, [])
+    # random sample to prevent bias
+    return [dict(row) for row in random.sample(products, min(max(limit, 0), len(products)))]
 #categories_product_count
 
 @tool
@@ -52,13 +46,7 @@ def get_category_counts() -> dict:
 
 
     """
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * from categories_product_count")
-    rows = cursor.fetchall()
-    conn.close()
-    # flat dict
-    return {row["Kategorie"]: row["anzahl_produkte"] for row in rows}
+    return dict(get_category_data().counts)
 
 
 if __name__ == "__main__":
@@ -4,6 +4,7 @@ from pathlib import Path
 import json
 from typing import Any
 from langchain_core.tools import tool
+from assistant.tools.internal.reference_data import get_producer_data
 #    Otherwise you can get all producers by setting identifier to * (string) or all (string). 
 
 def _get_connection():
@@ -13,30 +14,33 @@ def _get_connection():
     return conn
 
 @tool
-def get_producer_information_by_identifier(identifier:Any) -> dict:
+def get_producer_information_by_identifier(identifier:Any, limit: int = 5) -> dict:
     """
     Retrieve a producer by its identifier from the database.
     Identifier can be the Name (string) or ID (int).
+    Names are matched fuzzily (typos, umlauts, partial names are fine); results are ranked
+    by match_score, best match first.
 
     params:
     identifier (int or str): The ID or name of the producer to retrieve.
+    limit (int): Maximum number of producers returned for a name search (default 5).
     Returns:
     dict: A dictionary containing the producer's information, or a message if not found.
 
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
+    # In-Memory-Daten aus producers.db (lädt bei Dateiänderung neu)
+    data = get_producer_data()
 
+    producers = []
+    if isinstance(identifier, str) and identifier.strip().isdigit():
+        identifier = int(identifier.strip())
     if isinstance(identifier, int):
-        cursor.execute("SELECT * FROM producers WHERE id = ?", (identifier,))
+        row = data.by_id.get(identifier)
+        producers = [row] if row else []
     elif isinstance(identifier, str):
-        cursor.execute("SELECT * FROM producers WHERE name LIKE ?", (f"%{identifier}%",))
-    producers = cursor.fetchall()
-
-    conn.close()
+        producers = [{**row, "match_score": score} for row, score in data.search(identifier, limit=max(1, limit))]
 
     if producers:
-        producers = [dict(producer) for producer in producers]
         return json.dumps(producers, indent=4, ensure_ascii=False)
     else:
         return f"No producer found with the given identifier {identifier}."
@@ -50,13 +54,7 @@ def get_all_producer_names() -> list[str]:
     Returns:
         list[str]: A list of all producer names.
     """
-    conn = _get_connection()
-    cursor = conn.cursor()
-
-    cursor.execute("SELECT DISTINCT name FROM producers")
-    rows = cursor.fetchall()
-    conn.close()
-    return json.dumps([dict(row).get("name") for row in rows], ensure_ascii=False)
+    return json.dumps(get_producer_data().names, ensure_ascii=False)
 
 
 if __name__ == "__main__":
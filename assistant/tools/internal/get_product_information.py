@@ -5,9 +5,9 @@ import re
 from pathlib import Path
 from typing import Literal
 import os
-import duckdb
 from langchain.tools import tool
 from icecream import ic
+from assistant.utils.duckdb_pool import get_connection_manager
 # Adjust to your environment
 DUCKDB_FILE = Path(os.environ.get("PRODUCT_DB_PATH", "products_db/products.duckdb"))
 MAX_QUERY_ROWS = 100
@@ -175,20 +175,14 @@ def run_product_sql(
       # Append a LIMIT as a safety net; keep it simple (no OFFSET merge)
         final_sql = f"{sql.rstrip().rstrip(';')}\nLIMIT {int(MAX_QUERY_ROWS)}"
 
-    con = duckdb.connect(DUCKDB_FILE.as_posix())
-
-    try:
-        if format == "records":
-            res = con.execute(final_sql)
-            cols = [d[0] for d in res.description]
-            return [dict(zip(cols, row)) for row in res.fetchall()]
-        elif format == "json":
-            df = con.execute(final_sql).fetchdf()
-            return df.to_json(orient="records", force_ascii=False)
-        else:
-            raise ValueError("Unsupported format. Use 'records' or 'json'.")
-    finally:
-        con.close()
+    con = get_connection_manager(DUCKDB_FILE)
+
+    if format == "records":
+        return con.execute(final_sql)
+    elif format == "json":
+        return json.dumps(con.execute(final_sql), ensure_ascii=False, default=str)
+    else:
+        raise ValueError("Unsupported format. Use 'records' or 'json'.")
 
 
 # ── helpers ───────────────────────────────────────────────────────────────────
@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar, Union
+
+from assistant.logger import get_assistant_logger
+from assistant.utils.fuzzy_index import FuzzyNameIndex
+
+PRODUCERS_DB_FILE = Path(os.environ.get("PRODUCERS_DB_PATH", "producers_db/producers.db"))
+CATEGORIES_DB_FILE = Path(os.environ.get("CATEGORIES_DB_PATH", "products_db/products_categories.db"))
+# wie oft (höchstens) die mtime der Quelldatei geprüft wird
+REFERENCE_DATA_CHECK_INTERVAL_S = float(os.environ.get("REFERENCE_DATA_CHECK_INTERVAL_S", 2.0))
+
+T = TypeVar("T")
+
+
+def _read_rows(db_file: Path, sql: str) -> List[Dict[str, Any]]:
+    conn = sqlite3.connect(f"file:{db_file.as_posix()}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return [dict(row) for row in conn.execute(sql).fetchall()]
+    finally:
+        conn.close()
+
+
+class FileBackedData(Generic[T]):
+    """
+    Hält aus einer Datei geladene Referenzdaten im Speicher und lädt sie neu, sobald sich
+    mtime/size der Datei ändern (geprüft höchstens alle ``check_interval_s``).
+    Leser bekommen immer einen vollständigen Snapshot; neu geladen wird unter Lock und
+    dann atomar ersetzt.
+    """
+
+    def __init__(self, path: Union[str, Path], loader: Callable[[Path], T],
+                 check_interval_s: float = REFERENCE_DATA_CHECK_INTERVAL_S):
+        self.path = Path(path)
+        self._loader = loader
+        self.check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._data: Optional[T] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self.loads = 0
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self) -> T:
+        now = time.monotonic()
+        data = self._data
+        if data is not None and now - self._checked_at < self.check_interval_s:
+            return data
+        with self._lock:
+            if self._data is None or now - self._checked_at >= self.check_interval_s:
+                sig = self._file_signature()
+                if self._data is None or sig != self._signature:
+                    self._data = self._loader(self.path)
+                    self._signature = sig
+                    self.loads += 1
+                self._checked_at = now
+            return self._data
+
+
+class ProducerData:
+    """producers-Tabelle: Zeilen, id -> Zeile, eindeutige Namen und Namens-Suchindex."""
+
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+        self.by_id: Dict[int, Dict[str, Any]] = {}
+        for row in rows:
+            if row.get("id") is not None:
+                self.by_id.setdefault(row["id"], row)
+        self.names: List[str] = list(dict.fromkeys(r.get("name") for r in rows))
+        # einmal pro Laden aufgebaut; Tippfehler-tolerante Suche über normalisierte Trigramme
+        self.name_index: FuzzyNameIndex[Dict[str, Any]] = FuzzyNameIndex((r.get("name"), r) for r in rows)
+
+    @classmethod
+    def load(cls, db_file: Path) -> "ProducerData":
+        return cls(_read_rows(db_file, "SELECT * FROM producers"))
+
+    def search(self, query: str, limit: int = 5) -> List[Tuple[Dict[str, Any], float]]:
+        """Produzenten nach Namensähnlichkeit, [(Zeile, Score)] absteigend."""
+        return self.name_index.search(query, limit=limit)
+
+
+class CategoryData:
+    """Kategorien (Set), Produktzahl je Kategorie und Produkte gruppiert nach Kategorie."""
+
+    def __init__(self, categories: List[str], counts: Dict[str, int], products: List[Dict[str, Any]]):
+        self.category_list = categories
+        self.categories = frozenset(categories)
+        self.counts = counts
+        self.products_by_category: Dict[str, List[Dict[str, Any]]] = {}
+        for row in products:
+            self.products_by_category.setdefault(row.get("Kategorie"), []).append(row)
+
+    @classmethod
+    def load(cls, db_file: Path) -> "CategoryData":
+        categories = [r["Kategorie"] for r in _read_rows(db_file, "SELECT DISTINCT Kategorie FROM categories")]
+        counts = {
+            r["Kategorie"]: r["anzahl_produkte"]
+            for r in _read_rows(db_file, "SELECT * from categories_product_count")
+        }
+        products = _read_rows(db_file, "SELECT * FROM products_categories")
+        return cls(categories, counts, products)
+
+
+_PRODUCERS: Optional[FileBackedData[ProducerData]] = None
+_CATEGORIES: Optional[FileBackedData[CategoryData]] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_producer_data() -> ProducerData:
+    global _PRODUCERS
+    with _REGISTRY_LOCK:
+        if _PRODUCERS is None:
+            _PRODUCERS = FileBackedData(PRODUCERS_DB_FILE, ProducerData.load)
+    return _PRODUCERS.get()
+
+
+def get_category_data() -> CategoryData:
+    global _CATEGORIES
+    with _REGISTRY_LOCK:
+        if _CATEGORIES is None:
+            _CATEGORIES = FileBackedData(CATEGORIES_DB_FILE, CategoryData.load)
+    return _CATEGORIES.get()
+
+
+def preload_reference_data(*extra: Callable[[], Any]) -> None:
+    """
+    Beim Start aufrufen, damit der erste Tool-Call nicht die Ladezeit trägt (Fehler nur loggen).
+    ``extra``: weitere Getter, die ebenfalls vorgeladen werden (z. B. der Produktnamen-Index).
+    """
+    for getter in (get_producer_data, get_category_data, *extra):
+        try:
+            getter()
+        except Exception as e:
+            get_assistant_logger().warning("Preloading reference data failed: %s", e.__class__.__name__)
@@ -0,0 +1,194 @@
+import copy
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, StructuredTool
+
+TOOL_CACHE_MAX_ENTRIES = int(os.environ.get("TOOL_CACHE_MAX_ENTRIES", 2048))
+TOOL_CACHE_DISABLED = os.environ.get("TOOL_CACHE_DISABLED", "0") in ("1", "true", "True")
+# per Request: config["configurable"]["tool_cache_bypass"] = True
+BYPASS_KEY = "tool_cache_bypass"
+CACHE_HIT_EVENT = "tool_cache_hit"
+
+_MISSING = object()
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    ttl_s:   Lebensdauer eines Eintrags in Sekunden (None = bis zur Verdrängung / Versionswechsel)
+    version: liefert die aktuelle Datenversion (z. B. mtime der Quelldatei); ändert sie sich,
+             gelten alte Einträge nicht mehr
+    """
+    ttl_s: Optional[float] = None
+    version: Optional[Callable[[], Any]] = None
+
+
+def file_version(path: Union[str, Path]) -> Callable[[], Any]:
+    """Versionsfunktion aus mtime/size einer Datei (None, wenn sie fehlt)."""
+    path = Path(path)
+
+    def version() -> Any:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+    return version
+
+
+def _normalize(value: Any) -> Any:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def canonical_args(args: Dict[str, Any]) -> str:
+    """Kanonische Form der Tool-Argumente (sortierte Keys, getrimmte Strings) als Cache-Key."""
+    return json.dumps(_normalize(args or {}), sort_keys=True, ensure_ascii=False,
+                      separators=(",", ":"), default=str)
+
+
+class ToolResultCache:
+    """
+    LRU-Cache für Tool-Ergebnisse, Key = (Tool-Name, kanonische Argumente).
+    Ablauf per TTL und/oder Datenversion (siehe CachePolicy); Zähler pro Tool.
+    """
+
+    def __init__(self, max_entries: int = TOOL_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, tool_name: str, key: str) -> None:
+        st = self._stats.setdefault(tool_name, {"hits": 0, "misses": 0, "expired": 0, "bypassed": 0})
+        st[key] += 1
+
+    def get(self, tool_name: str, key: str, policy: CachePolicy, version: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get((tool_name, key))
+            if entry is not None:
+                stored_at, stored_version, value = entry
+                if (policy.ttl_s is not None and now - stored_at > policy.ttl_s) or stored_version != version:
+                    del self._data[(tool_name, key)]
+                    self._count(tool_name, "expired")
+                else:
+                    self._data.move_to_end((tool_name, key))
+                    self._count(tool_name, "hits")
+                    return value
+            self._count(tool_name, "misses")
+        return _MISSING
+
+    def put(self, tool_name: str, key: str, value: Any, version: Any = None) -> None:
+        with self._lock:
+            self._data[(tool_name, key)] = (time.monotonic(), version, value)
+            self._data.move_to_end((tool_name, key))
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def count_bypass(self, tool_name: str) -> None:
+        with self._lock:
+            self._count(tool_name, "bypassed")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._data), "max_entries": self.max_entries,
+                    "tools": {k: dict(v) for k, v in self._stats.items()}}
+
+
+_CACHE: Optional[ToolResultCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_tool_result_cache() -> ToolResultCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ToolResultCache()
+        return _CACHE
+
+
+def _accepts_callbacks(func: Optional[Callable]) -> bool:
+    try:
+        return func is not None and "callbacks" in inspect.signature(func).parameters
+    except (TypeError, ValueError):
+        return False
+
+
+def _bypass(config: Optional[RunnableConfig]) -> bool:
+    return TOOL_CACHE_DISABLED or bool(((config or {}).get("configurable") or {}).get(BYPASS_KEY))
+
+
+def cached_tool(tool: BaseTool, policy: CachePolicy, cache: Optional[ToolResultCache] = None) -> BaseTool:
+    """
+    Liefert ein Tool mit gleichem Namen/Schema, das Ergebnisse in ``cache`` ablegt.
+    Treffer werden als Custom-Event (CACHE_HIT_EVENT) an die Callbacks gemeldet, der
+    LocalToolLogger markiert den Tool-Run dann mit ``cache_hit``.
+    Ergebnisse werden kopiert ausgegeben, damit Aufrufer den Cache-Eintrag nicht verändern.
+    ``None`` (Fehler, z. B. Farmely nicht erreichbar) wird nicht gecacht.
+    """
+    cache = cache or get_tool_result_cache()
+    func = getattr(tool, "func", None)
+    coroutine = getattr(tool, "coroutine", None)
+    if func is None and coroutine is None:
+        return tool
+    name = tool.name
+    func_cb, coro_cb = _accepts_callbacks(func), _accepts_callbacks(coroutine)
+
+    def _lookup(kwargs: Dict[str, Any], config: Optional[RunnableConfig]):
+        if _bypass(config):
+            cache.count_bypass(name)
+            return None, None, _MISSING
+        key = canonical_args(kwargs)
+        version = policy.version() if policy.version else None
+        return key, version, cache.get(name, key, policy, version)
+
+    def run(callbacks=None, config: RunnableConfig = None, **kwargs):
+        key, version, hit = _lookup(kwargs, config)
+        if hit is not _MISSING:
+            if callbacks is not None and getattr(callbacks, "parent_run_id", None):
+                callbacks.on_custom_event(CACHE_HIT_EVENT, {"tool_name": name}, run_id=callbacks.parent_run_id)
+            return copy.deepcopy(hit)
+        out = func(**kwargs, callbacks=callbacks) if func_cb else func(**kwargs)
+        if key is not None and out is not None:
+            cache.put(name, key, copy.deepcopy(out), version)
+        return out
+
+    async def arun(callbacks=None, config: RunnableConfig = None, **kwargs):
+        key, version, hit = _lookup(kwargs, config)
+        if hit is not _MISSING:
+            if callbacks is not None and getattr(callbacks, "parent_run_id", None):
+                await callbacks.on_custom_event(CACHE_HIT_EVENT, {"tool_name": name}, run_id=callbacks.parent_run_id)
+            return copy.deepcopy(hit)
+        out = await (coroutine(**kwargs, callbacks=callbacks) if coro_cb else coroutine(**kwargs))
+        if key is not None and out is not None:
+            cache.put(name, key, copy.deepcopy(out), version)
+        return out
+
+    return StructuredTool(
+        name=name,
+        description=tool.description,
+        args_schema=tool.args_schema,
+        func=run if func is not None else None,
+        coroutine=arun if coroutine is not None else None,
+        return_direct=tool.return_direct,
+        response_format=getattr(tool, "response_format", "content"),
+    )
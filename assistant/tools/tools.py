@@ -2,10 +2,26 @@ from langchain.tools import Tool
 from assistant.rag.rag_factory import get_vector_store
 from langchain.tools.retriever import create_retriever_tool
 from langgraph.prebuilt import ToolNode
-from assistant.tools.farmely.farmely_api_langchain import fetch_product_stock
+from assistant.tools.farmely.farmely_api_langchain import fetch_product_stock, fetch_product_stock_batch
+from assistant.tools.farmely.product_index import get_product_name_index
 from assistant.tools.internal.get_product_information import run_product_sql
 from assistant.tools.internal.get_producer_information import get_producer_information_by_identifier, get_all_producer_names
 from assistant.tools.internal.get_overview_of_product_categories import get_category_counts, get_products_per_categorie
+from assistant.tools.internal.get_product_information import DUCKDB_FILE
+from assistant.tools.internal.reference_data import CATEGORIES_DB_FILE, PRODUCERS_DB_FILE, preload_reference_data
+from assistant.tools.tool_cache import CachePolicy, cached_tool, file_version
+
+# Cache-Policy pro Tool-Name; Tools ohne Eintrag werden nicht gecacht
+# (get_products_per_categorie liefert absichtlich eine zufällige Auswahl)
+TOOL_CACHE_POLICIES = {
+    "products_similarity_search":             CachePolicy(ttl_s=15 * 60),
+    "run_product_sql":                        CachePolicy(version=file_version(DUCKDB_FILE)),
+    "fetch_product_stock":                    CachePolicy(ttl_s=60),
+    "fetch_product_stock_batch":              CachePolicy(ttl_s=60),
+    "get_producer_information_by_identifier": CachePolicy(version=file_version(PRODUCERS_DB_FILE)),
+    "get_all_producer_names":                 CachePolicy(version=file_version(PRODUCERS_DB_FILE)),
+    "get_category_counts":                    CachePolicy(version=file_version(CATEGORIES_DB_FILE)),
+}
 def get_retriever_tool(tool_name:str, db:str, **kwargs) -> Tool:
     if tool_name == "products_similarity_search":
         retriever = get_vector_store(db, **kwargs)
@@ -30,6 +46,8 @@ def get_tool(name:str, **kwargs) -> Tool:
         return run_product_sql
     elif name == "fetch_product_stock":
         return fetch_product_stock
+    elif name == "fetch_product_stock_batch":
+        return fetch_product_stock_batch
     elif name == "get_product_information_by_id":
         return NotImplementedError
     elif name == "get_producer_information_by_identifier":
@@ -45,12 +63,16 @@ def get_tool(name:str, **kwargs) -> Tool:
     else:
         raise ValueError(f"Tool '{name}' not recognized.")
     
-def get_farmely_tools() -> list[Tool]:
+def get_farmely_tools(cache: bool = True) -> list[Tool]:
+    """
+    :param cache: Tools mit Eintrag in TOOL_CACHE_POLICIES über den prozessweiten ToolResultCache wrappen
+    """
     tools = [
 
         get_tool("products_similarity_search", db="chroma", CHROMA_PRODUCT_DB="chroma_products"),
         get_tool("run_product_sql"),
         get_tool("fetch_product_stock"),
+        get_tool("fetch_product_stock_batch"),
         # get_tool("get_product_information_by_id"),
         get_tool("get_producer_information_by_identifier"),
         get_tool("get_category_counts"),
@@ -58,6 +80,13 @@ def get_farmely_tools() -> list[Tool]:
         # get_tool("get_all_products_by_supplier"),
         get_tool("get_all_producer_names"),
     ]
+    # Produzenten/Kategorien/Produktnamen einmal in den Speicher laden (statt beim ersten Tool-Call)
+    preload_reference_data(get_product_name_index)
+    if cache:
+        tools = [
+            cached_tool(t, TOOL_CACHE_POLICIES[t.name]) if t.name in TOOL_CACHE_POLICIES else t
+            for t in tools
+        ]
     return tools
 
 if __name__ == "__main__":
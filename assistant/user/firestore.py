@@ -95,4 +95,67 @@ class UserFirestore:
     def get_thread_ids_by_user_id(self, user_id: str) -> List[str]:
         """Get thread ids for a user."""
         threads_list = self.get_threads_by_user_id(user_id)
-        return [thread.get('thread_id') for thread in threads_list]
\ No newline at end of file
+        return [thread.get('thread_id') for thread in threads_list]
+    # Transcript (Read-Model für /messages): threads/{thread_id}/messages/{message_id}
+    def get_thread_message_ids(self, thread_id: str, limit: int = 50) -> List[str]:
+        """IDs der letzten ``limit`` Nachrichten eines Threads (neueste zuerst)."""
+        col = self.db.collection('threads').document(thread_id).collection('messages')
+        docs = col.order_by('seq', direction=firestore.Query.DESCENDING).limit(limit).stream()
+        return [d.id for d in docs]
+
+    def append_thread_messages(self, thread_id: str, entries: List[Dict]) -> int:
+        """
+        Hängt gerenderte Nachrichten an; vorhandene message_ids werden übersprungen.
+        Läuft in einer Transaktion: ``message_seq`` am Thread-Dokument vergibt die seq-Nummern,
+        parallele Appends desselben Threads werden von Firestore wiederholt statt doppelt nummeriert.
+        """
+        entries = list({e["message_id"]: e for e in entries if e.get("message_id")}.values())
+        if not entries:
+            return 0
+        thread_ref = self.db.collection('threads').document(thread_id)
+        col = thread_ref.collection('messages')
+        refs = [col.document(e["message_id"]) for e in entries]
+
+        @firestore.transactional
+        def append(transaction) -> int:
+            snaps = {snap.reference.path: snap for snap in transaction.get_all([thread_ref, *refs])}
+            thread = snaps.get(thread_ref.path)
+            seq = (thread.to_dict() or {}).get('message_seq') if thread is not None and thread.exists else None
+            if seq is None:
+                # ältere Threads ohne Zähler: einmalig aus der letzten Nachricht übernehmen
+                last = list(transaction.get(col.order_by('seq', direction=firestore.Query.DESCENDING).limit(1)))
+                seq = int(last[0].to_dict().get('seq', 0)) if last else 0
+            n = 0
+            for e, ref in zip(entries, refs):
+                if ref.path in snaps and snaps[ref.path].exists:
+                    continue
+                seq += 1
+                transaction.set(ref, {
+                    'message_id': e["message_id"],
+                    'seq': seq,
+                    'role': e.get("role"),
+                    'content': e.get("content"),
+                    'images': e.get("images"),
+                    'dev_notes': e.get("dev_notes") or {},
+                    'created_at': datetime.now().isoformat(),
+                })
+                n += 1
+            if n:
+                transaction.set(thread_ref, {'message_seq': seq}, merge=True)
+            return n
+
+        try:
+            return append(self.db.transaction())
+        except Exception as e:
+            print(f"Error appending thread messages: {e}")
+            return 0
+
+    def get_thread_messages(self, thread_id: str, limit: int = None, before: int = None) -> List[Dict]:
+        """Nachrichten eines Threads chronologisch; ``before`` ist ein seq-Cursor."""
+        query = self.db.collection('threads').document(thread_id).collection('messages')
+        if before is not None:
+            query = query.where('seq', '<', int(before))
+        query = query.order_by('seq', direction=firestore.Query.DESCENDING)
+        if limit is not None:
+            query = query.limit(int(limit))
+        return [d.to_dict() for d in reversed(list(query.stream()))]
@@ -42,3 +42,13 @@ class MySQLUserSQL(UserSQL):
 
     def _escape_identifier(self, identifier: str) -> str:
         return f"`{identifier}`"
+
+    # ------------------------------------------------ Index (MySQL kennt kein CREATE INDEX IF NOT EXISTS)
+    def _create_index(self, name: str, table: str, columns: str, unique: bool = False) -> None:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        try:
+            self.executescript(f"CREATE {kind} {name} ON {table} ({columns})")
+        except pymysql.err.OperationalError as e:
+            if e.args and e.args[0] == 1061:  # Duplicate key name
+                return
+            raise
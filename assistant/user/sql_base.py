@@ -1,8 +1,24 @@
 # usersql.py
 import json
+import threading
+import zlib
 from abc import ABC, abstractmethod
 from contextlib import closing
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
+
+# seq-Vergabe pro Thread: prozessweit per Lock (gestreift über thread_id), prozessübergreifend
+# über UNIQUE (thread_id, seq) + Retry
+_SEQ_LOCKS = [threading.Lock() for _ in range(64)]
+SEQ_CONFLICT_RETRIES = 5
+
+
+def _seq_lock(thread_id: str) -> threading.Lock:
+    return _SEQ_LOCKS[zlib.crc32(str(thread_id).encode("utf-8")) % len(_SEQ_LOCKS)]
+
+
+def _is_conflict(exc: Exception) -> bool:
+    # sqlite3 / psycopg2 / pymysql heißen alle IntegrityError
+    return type(exc).__name__ == "IntegrityError"
 
 
 class UserSQL(ABC):
@@ -20,6 +36,7 @@ class UserSQL(ABC):
 
         """
         self.dsn = data_source_name
+        self._transcript_ready = False
     # DB specific methods
     @abstractmethod
     def _connect(self):
@@ -106,11 +123,44 @@ class UserSQL(ABC):
         """
         try:
             self.executescript(ddl)
+            self._create_transcript_table()
             return True
         except Exception as e:
             print("Error creating tables:", e)
             return False
 
+    def _create_transcript_table(self) -> None:
+        """Read-Model für /messages: eine Zeile pro sichtbarer Nachricht eines Threads."""
+        ddl = f"""
+        CREATE TABLE IF NOT EXISTS thread_messages (
+            thread_id    {self.short_text_type} NOT NULL,
+            message_id   {self.short_text_type} NOT NULL,
+            seq          INTEGER NOT NULL,
+            role         {self.short_text_type},
+            content      {self.long_text_type},
+            images       {self.json_type},
+            dev_notes    {self.json_type},
+            created_at   TIMESTAMP DEFAULT {self.timestamp_default},
+            PRIMARY KEY (thread_id, message_id)
+        )
+        """
+        self.executescript(ddl)
+        self._create_index("idx_thread_messages_seq", "thread_messages", "thread_id, seq")
+        try:
+            # Migration für bestehende Tabellen; scheitert, falls dort schon doppelte seq-Werte stehen
+            self._create_index("uq_thread_messages_seq", "thread_messages", "thread_id, seq", unique=True)
+        except Exception as e:
+            print("Error creating unique index on thread_messages (thread_id, seq):", e)
+        self._transcript_ready = True
+
+    def _create_index(self, name: str, table: str, columns: str, unique: bool = False) -> None:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        self.executescript(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})")
+
+    def _ensure_transcript_table(self) -> None:
+        if not self._transcript_ready:
+            self._create_transcript_table()
+
     #   User-CRUD
     def _create_anonymous_user(self) -> bool:
         return self.add_user("anonymous", {"preferences": {}})
@@ -182,6 +232,94 @@ class UserSQL(ABC):
     def get_thread_ids_by_user(self, user_id: str) -> List[str]:
         return [t["thread_id"] for t in self.get_threads_by_user(user_id)]
 
+    #  Transcript (Read-Model für /messages)
+    def get_thread_message_ids(self, thread_id: str, limit: int = 50) -> List[str]:
+        """IDs der letzten ``limit`` Nachrichten eines Threads (neueste zuerst)."""
+        self._ensure_transcript_table()
+        sql = (f"SELECT message_id FROM thread_messages WHERE thread_id = {self.placeholder} "
+               f"ORDER BY seq DESC LIMIT {int(limit)}")
+        with closing(self._connect()) as conn, closing(self.dict_cursor(conn)) as cur:
+            cur.execute(sql, (thread_id,))
+            rows = cur.fetchall()
+        return [r["message_id"] for r in rows or []]
+
+    def append_thread_messages(self, thread_id: str, entries: List[Dict[str, Any]]) -> int:
+        """
+        Hängt gerenderte Nachrichten (role, content, images, dev_notes, message_id) an.
+        Bereits vorhandene message_ids werden übersprungen.
+        :return: Anzahl neu geschriebener Nachrichten
+        """
+        entries = [e for e in entries if e.get("message_id")]
+        if not entries:
+            return 0
+        self._ensure_transcript_table()
+        ph = self.placeholder
+        existing_sql = f"SELECT message_id FROM thread_messages WHERE thread_id = {ph}"
+        seq_sql = f"SELECT COALESCE(MAX(seq), 0) AS max_seq FROM thread_messages WHERE thread_id = {ph}"
+        insert_sql = (f"INSERT INTO thread_messages (thread_id, message_id, seq, role, content, images, dev_notes) "
+                      f"VALUES ({ph}, {ph}, {ph}, {ph}, {ph}, {ph}, {ph})")
+        ids = [e["message_id"] for e in entries]
+        with _seq_lock(thread_id):
+            for attempt in range(SEQ_CONFLICT_RETRIES):
+                try:
+                    with closing(self._connect()) as conn, closing(self.dict_cursor(conn)) as cur:
+                        cur.execute(existing_sql + f" AND message_id IN ({', '.join([ph] * len(ids))})", (thread_id, *ids))
+                        known = {r["message_id"] for r in cur.fetchall() or []}
+                        new = [e for e in entries if e["message_id"] not in known]
+                        if not new:
+                            return 0
+                        cur.execute(seq_sql, (thread_id,))
+                        seq = int(cur.fetchone()["max_seq"])
+                        rows = []
+                        for e in new:
+                            seq += 1
+                            rows.append((
+                                thread_id, e["message_id"], seq, e.get("role"), e.get("content"),
+                                self._to_db_json(e.get("images")), self._to_db_json(e.get("dev_notes") or {}),
+                            ))
+                        cur.executemany(insert_sql, rows)
+                        conn.commit()
+                    return len(rows)
+                except Exception as e:
+                    # anderer Prozess hat dieselbe seq/message_id geschrieben -> neu lesen und nochmal
+                    if _is_conflict(e) and attempt < SEQ_CONFLICT_RETRIES - 1:
+                        continue
+                    print("Error appending thread messages:", e)
+                    return 0
+
+    def get_thread_messages(self, thread_id: str, limit: Optional[int] = None,
+                            before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Nachrichten eines Threads in chronologischer Reihenfolge.
+        :param limit:  höchstens so viele (die neuesten vor ``before``)
+        :param before: Cursor – nur Nachrichten mit seq < before
+        """
+        self._ensure_transcript_table()
+        ph = self.placeholder
+        sql = ("SELECT message_id, seq, role, content, images, dev_notes FROM thread_messages "
+               f"WHERE thread_id = {ph}")
+        params: List[Any] = [thread_id]
+        if before is not None:
+            sql += f" AND seq < {ph}"
+            params.append(int(before))
+        sql += " ORDER BY seq DESC"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        with closing(self._connect()) as conn, closing(self.dict_cursor(conn)) as cur:
+            cur.execute(sql, tuple(params))
+            rows = cur.fetchall() or []
+        out = []
+        for r in reversed(rows):
+            r = dict(r)
+            for k in ("images", "dev_notes"):
+                if isinstance(r.get(k), str):
+                    try:
+                        r[k] = json.loads(r[k])
+                    except Exception:
+                        pass
+            out.append(r)
+        return out
+
     #   Utility
     @staticmethod
     def _format_nested_dict(d: Any) -> Any:
@@ -0,0 +1,304 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from assistant.utils.log_segments import compact_pending, compact_segment, enforce_retention, rotated_name
+
+try:
+    import fcntl  # nur POSIX; sperrt die Datei für parallele Prozesse (Flask-Worker)
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+FsyncPolicy = Literal["never", "interval", "always"]
+Backpressure = Literal["drop", "block"]
+
+DEFAULT_QUEUE_SIZE = int(os.environ.get("TOOL_LOG_QUEUE_SIZE", 10000))
+DEFAULT_FLUSH_INTERVAL_S = float(os.environ.get("TOOL_LOG_FLUSH_INTERVAL_S", 1.0))
+DEFAULT_FLUSH_BATCH = int(os.environ.get("TOOL_LOG_FLUSH_BATCH", 256))
+DEFAULT_FSYNC: FsyncPolicy = os.environ.get("TOOL_LOG_FSYNC", "interval")  # type: ignore[assignment]
+DEFAULT_BACKPRESSURE: Backpressure = os.environ.get("TOOL_LOG_BACKPRESSURE", "drop")  # type: ignore[assignment]
+# Rotation (0 = aus) und Aufbewahrung der komprimierten Segmente
+DEFAULT_ROTATE_MAX_BYTES = int(os.environ.get("TOOL_LOG_ROTATE_MAX_BYTES", 64 * 1024 * 1024))
+DEFAULT_ROTATE_DAILY = os.environ.get("TOOL_LOG_ROTATE_DAILY", "1") not in ("0", "false", "False")
+DEFAULT_MAX_SEGMENTS = int(os.environ.get("TOOL_LOG_MAX_SEGMENTS", 90))
+DEFAULT_RETENTION_DAYS = float(os.environ.get("TOOL_LOG_RETENTION_DAYS", 30))
+
+
+class BufferedLineWriter:
+    """
+    Gepufferter Append-Writer für Zeilen-Logs (JSONL), geschrieben von einem Hintergrund-Thread.
+
+    - write() legt die Zeile nur in eine begrenzte Queue (kein File-I/O im Request-Pfad).
+    - Geflusht wird, sobald ``flush_batch`` Zeilen anliegen oder ``flush_interval_s`` vergangen ist;
+      ein Batch geht als ein einziger write()-Aufruf raus.
+    - fsync: "never" (nur OS-Cache), "interval" (höchstens einmal pro flush_interval_s),
+      "always" (nach jedem Batch).
+    - Volle Queue: "drop" verwirft die Zeile (gezählt in stats), "block" wartet bis
+      ``block_timeout_s`` und verwirft erst dann.
+    - Mehrere Threads teilen sich einen Writer pro Datei (get_line_writer); zwischen Prozessen
+      wird per O_APPEND + flock pro Batch geschrieben, Zeilen werden also nicht vermischt.
+    - close() bzw. atexit schreibt die Queue vollständig weg.
+    - Rotation: ab ``rotate_max_bytes`` bzw. beim ersten Write eines neuen (UTC-)Tages wird die
+      Datei in ein Segment umbenannt, gzip-komprimiert und mit Sidecar-Index versehen
+      (siehe log_segments). Danach greift die Aufbewahrung (max_segments / retention_days).
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S,
+        flush_batch: int = DEFAULT_FLUSH_BATCH,
+        fsync: FsyncPolicy = DEFAULT_FSYNC,
+        backpressure: Backpressure = DEFAULT_BACKPRESSURE,
+        block_timeout_s: float = 1.0,
+        rotate_max_bytes: int = DEFAULT_ROTATE_MAX_BYTES,
+        rotate_daily: bool = DEFAULT_ROTATE_DAILY,
+        max_segments: int = DEFAULT_MAX_SEGMENTS,
+        retention_days: float = DEFAULT_RETENTION_DAYS,
+    ):
+        if fsync not in ("never", "interval", "always"):
+            raise ValueError(f"Unknown fsync policy '{fsync}'")
+        if backpressure not in ("drop", "block"):
+            raise ValueError(f"Unknown backpressure mode '{backpressure}'")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.flush_interval_s = max(0.01, float(flush_interval_s))
+        self.flush_batch = max(1, int(flush_batch))
+        self.fsync = fsync
+        self.backpressure = backpressure
+        self.block_timeout_s = block_timeout_s
+        self.rotate_max_bytes = max(0, int(rotate_max_bytes))
+        self.rotate_daily = rotate_daily
+        self.max_segments = max_segments
+        self.retention_days = retention_days
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._flush_requested = threading.Event()
+        self._flushed = threading.Condition()
+        self._closed = False
+        self._last_fsync = time.monotonic()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {
+            "written": 0,
+            "dropped": 0,
+            "batches": 0,
+            "fsyncs": 0,
+            "write_errors": 0,
+            "rotations": 0,
+        }
+        self._enqueued = 0
+        self._done = 0
+        self._thread = threading.Thread(target=self._run, name=f"line-writer:{self.path.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # -------- Producer --------
+    def write(self, line: str) -> bool:
+        """
+        Reiht eine Zeile ein (ohne abschließendes Newline).
+        :return: False, wenn die Zeile wegen Backpressure verworfen wurde
+        """
+        if self._closed:
+            return False
+        try:
+            if self.backpressure == "block":
+                self._queue.put(line, timeout=self.block_timeout_s)
+            else:
+                self._queue.put_nowait(line)
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            return False
+        with self._stats_lock:
+            self._enqueued += 1
+        if self._queue.qsize() >= self.flush_batch:
+            self._flush_requested.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wartet, bis alle bisher eingereihten Zeilen geschrieben sind."""
+        with self._stats_lock:
+            target = self._enqueued
+        self._flush_requested.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._flushed:
+            while True:
+                with self._stats_lock:
+                    if self._done >= target:
+                        return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Schreibt die Queue leer und beendet den Writer-Thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_requested.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    # -------- Consumer --------
+    def _drain(self, first: Optional[str]) -> "tuple[List[str], bool]":
+        batch: List[str] = [] if first is None else [first]
+        stop = first is None
+        while not stop:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        return batch, stop
+
+    def _run(self) -> None:
+        try:
+            compact_pending(self.path)
+        except Exception:
+            pass
+        stop = False
+        while not stop:
+            self._flush_requested.wait(self.flush_interval_s)
+            self._flush_requested.clear()
+            try:
+                first = self._queue.get_nowait()
+            except queue.Empty:
+                continue
+            batch, stop = self._drain(first)
+            if batch:
+                self._write_batch(batch)
+
+    def _open_locked(self) -> int:
+        """
+        Öffnet die aktive Datei und sperrt sie. Hat ein anderer Prozess sie inzwischen
+        rotiert (Inode passt nicht mehr zum Pfad), wird neu geöffnet.
+        """
+        while True:
+            fd = os.open(self.path.as_posix(), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.path.samestat(os.fstat(fd), os.stat(self.path)):
+                    return fd
+            except FileNotFoundError:
+                pass
+            self._close_locked(fd)
+
+    @staticmethod
+    def _close_locked(fd: int) -> None:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    def _should_rotate(self, fd: int) -> bool:
+        st = os.fstat(fd)
+        if st.st_size == 0:
+            return False
+        if self.rotate_max_bytes and st.st_size >= self.rotate_max_bytes:
+            return True
+        if self.rotate_daily:
+            return time.gmtime(st.st_mtime)[:3] != time.gmtime()[:3]
+        return False
+
+    def _write_batch(self, batch: List[str]) -> None:
+        data = ("\n".join(batch) + "\n").encode("utf-8")
+        rotated: Optional[Path] = None
+        try:
+            fd = self._open_locked()
+            try:
+                if self._should_rotate(fd):
+                    # unter dem Lock umbenennen: wartende Prozesse sehen danach einen anderen Inode
+                    rotated = rotated_name(self.path)
+                    os.rename(self.path, rotated)
+                    self._close_locked(fd)
+                    fd = self._open_locked()
+                view = memoryview(data)
+                while view:
+                    n = os.write(fd, view)
+                    view = view[n:]
+                if self._should_fsync():
+                    os.fsync(fd)
+                    self._last_fsync = time.monotonic()
+                    with self._stats_lock:
+                        self._stats["fsyncs"] += 1
+            finally:
+                self._close_locked(fd)
+            with self._stats_lock:
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+        except Exception:
+            # bewusst still; Logging darf keine Pipeline brechen
+            with self._stats_lock:
+                self._stats["write_errors"] += 1
+        finally:
+            with self._stats_lock:
+                self._done += len(batch)
+            with self._flushed:
+                self._flushed.notify_all()
+        if rotated is not None:
+            self._compact(rotated)
+
+    def _compact(self, rotated: Path) -> None:
+        try:
+            compact_segment(rotated)
+            enforce_retention(self.path, self.max_segments, self.retention_days)
+            with self._stats_lock:
+                self._stats["rotations"] += 1
+        except Exception:
+            with self._stats_lock:
+                self._stats["write_errors"] += 1
+
+    def _should_fsync(self) -> bool:
+        if self.fsync == "always":
+            return True
+        if self.fsync == "interval":
+            return (time.monotonic() - self._last_fsync) >= self.flush_interval_s
+        return False
+
+    # -------- Stats --------
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "path": self.path.as_posix(),
+                "queue_depth": self._queue.qsize(),
+                "fsync": self.fsync,
+                "backpressure": self.backpressure,
+                "running": self._thread.is_alive(),
+                **self._stats,
+            }
+
+
+_WRITERS: Dict[str, BufferedLineWriter] = {}
+_WRITERS_LOCK = threading.Lock()
+
+
+def get_line_writer(path: Union[str, Path]) -> BufferedLineWriter:
+    """
+    Liefert den prozessweit geteilten Writer für ``path``.
+    """
+    key = Path(path).resolve().as_posix()
+    with _WRITERS_LOCK:
+        writer = _WRITERS.get(key)
+        if writer is None or writer._closed:
+            writer = BufferedLineWriter(path)
+            _WRITERS[key] = writer
+        return writer
+
+
+def get_line_writer_stats() -> List[Dict[str, Any]]:
+    with _WRITERS_LOCK:
+        writers = list(_WRITERS.values())
+    return [w.stats() for w in writers]
@@ -0,0 +1,288 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import duckdb
+
+DEFAULT_HEALTH_CHECK_INTERVAL_S = float(os.environ.get("DUCKDB_HEALTH_CHECK_INTERVAL_S", 30))
+
+
+# Alias, unter dem die Datei in der Parent-Connection hängt (jeder Cursor macht USE darauf)
+_CATALOG = "db"
+
+
+def file_signature(path: Union[str, Path]) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) der Datei oder None; ändert sich bei Austausch und bei In-place-Updates."""
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class _Parent:
+    """Eine Parent-Connection (eigene DuckDB-Instanz) und die Cursor, die Threads darauf halten."""
+
+    __slots__ = ("con", "cursors", "opened_at")
+
+    def __init__(self, con: duckdb.DuckDBPyConnection):
+        self.con = con
+        self.cursors: Dict[int, duckdb.DuckDBPyConnection] = {}   # Thread-Ident -> Cursor
+        self.opened_at = time.time()
+
+    def close(self) -> None:
+        for cur in self.cursors.values():
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self.cursors.clear()
+        try:
+            self.con.close()
+        except Exception:
+            pass
+
+
+class DuckDBConnectionManager:
+    """
+    Shared (read-only) DuckDB connection for one database file.
+
+    - Eine Parent-Connection pro Datei, jeder Worker-Thread bekommt einen eigenen
+      Cursor (``con.cursor()``), der wiederverwendet wird.
+    - Health-Check (``SELECT 1``) pro Cursor höchstens alle ``health_check_interval_s``.
+      Dabei wird auch geprüft, ob die Datei ersetzt wurde (mtime/size) -> Reconnect.
+    - Reconnect schließt die alte Parent-Connection nicht sofort: sie wird "retired", jeder
+      Thread wechselt beim nächsten Zugriff auf die neue Generation und schließt dabei seinen
+      alten Cursor; ohne Cursor (oder nur noch mit Cursorn beendeter Threads) wird der alte
+      Parent geschlossen. Laufende Queries anderer Threads werden so nicht abgebrochen.
+    - Jeder Parent ist eine eigene In-Memory-Instanz mit der Datei per ATTACH; ein normales
+      duckdb.connect(path) würde über den Instanz-Cache die alte (noch offene) Datei liefern.
+    - Zähler: geöffnete Verbindungen, Reconnects, Queries, Fehler, offene Zeit.
+    """
+
+    def __init__(
+        self,
+        db_file: Union[str, Path],
+        read_only: bool = True,
+        health_check_interval_s: float = DEFAULT_HEALTH_CHECK_INTERVAL_S,
+    ):
+        self.db_file = Path(db_file)
+        self.read_only = read_only
+        self.health_check_interval_s = health_check_interval_s
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._parent: Optional[_Parent] = None
+        self._retired: List[_Parent] = []
+        self._generation = 0
+        self._source_signature: Optional[Tuple[int, int]] = None
+        self._counters: Dict[str, int] = {
+            "connects": 0,
+            "reconnects": 0,
+            "cursors_created": 0,
+            "queries": 0,
+            "query_errors": 0,
+            "health_checks": 0,
+            "health_check_failures": 0,
+        }
+        self._queries_current_connection = 0
+
+    # -------- Connection lifecycle --------
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        return file_signature(self.db_file)
+
+    def _open_parent(self) -> _Parent:
+        con = duckdb.connect(":memory:")
+        path = self.db_file.resolve().as_posix().replace("'", "''")
+        try:
+            con.execute(f"ATTACH '{path}' AS {_CATALOG}" + (" (READ_ONLY)" if self.read_only else ""))
+        except Exception:
+            con.close()
+            raise
+        return _Parent(con)
+
+    def _connect(self) -> None:
+        """Öffnet eine neue Parent-Connection, die alte wird retired (Lock muss gehalten werden)."""
+        if self._parent is not None:
+            self._retire(self._parent)
+            self._counters["reconnects"] += 1
+        self._parent = self._open_parent()
+        self._generation += 1
+        self._source_signature = self._file_signature()
+        self._queries_current_connection = 0
+        self._counters["connects"] += 1
+
+    def _retire(self, parent: _Parent) -> None:
+        self._retired.append(parent)
+        self._sweep_retired()
+
+    def _sweep_retired(self) -> None:
+        """Schließt retired Parents ohne Cursor lebender Threads (Lock muss gehalten werden)."""
+        alive = {t.ident for t in threading.enumerate()}
+        still_open = []
+        for parent in self._retired:
+            for ident in [i for i in parent.cursors if i not in alive]:
+                try:
+                    parent.cursors.pop(ident).close()
+                except Exception:
+                    pass
+            if parent.cursors:
+                still_open.append(parent)
+            else:
+                parent.close()
+        self._retired = still_open
+
+    def _close_all(self) -> None:
+        """Schließt alle Cursor und Parent-Connections, auch retired (Lock muss gehalten werden)."""
+        for parent in self._retired:
+            parent.close()
+        self._retired = []
+        if self._parent is not None:
+            self._parent.close()
+        self._parent = None
+
+    def _cursor(self) -> duckdb.DuckDBPyConnection:
+        local = self._local
+        with self._lock:
+            if self._parent is None:
+                self._connect()
+            if getattr(local, "generation", None) != self._generation:
+                ident = threading.get_ident()
+                old_parent = getattr(local, "parent", None)
+                if old_parent is not None and old_parent is not self._parent:
+                    # eigener Cursor auf einem retired Parent: dieser Thread nutzt ihn gerade nicht
+                    stale = old_parent.cursors.pop(ident, None)
+                    if stale is not None:
+                        try:
+                            stale.close()
+                        except Exception:
+                            pass
+                    self._sweep_retired()
+                cur = self._parent.con.cursor()
+                cur.execute(f"USE {_CATALOG}")
+                previous = self._parent.cursors.pop(ident, None)
+                if previous is not None and previous is not getattr(local, "cursor", None):
+                    # Ident eines beendeten Threads wiederverwendet
+                    try:
+                        previous.close()
+                    except Exception:
+                        pass
+                self._parent.cursors[ident] = cur
+                self._counters["cursors_created"] += 1
+                local.cursor = cur
+                local.parent = self._parent
+                local.generation = self._generation
+                local.last_check = time.monotonic()
+            return local.cursor
+
+    def _needs_health_check(self) -> bool:
+        last = getattr(self._local, "last_check", None)
+        return last is None or (time.monotonic() - last) > self.health_check_interval_s
+
+    def _health_check(self, cur: duckdb.DuckDBPyConnection) -> duckdb.DuckDBPyConnection:
+        """Prüft Cursor + Datei. Gibt einen (ggf. neuen) gesunden Cursor zurück."""
+        self._local.last_check = time.monotonic()
+        with self._lock:
+            self._counters["health_checks"] += 1
+            if self._file_signature() != self._source_signature:
+                # Datei wurde ersetzt/aktualisiert -> neu verbinden
+                self._connect()
+                return self._cursor()
+        try:
+            cur.execute("SELECT 1").fetchone()
+            return cur
+        except Exception:
+            with self._lock:
+                self._counters["health_check_failures"] += 1
+                if getattr(self._local, "generation", None) == self._generation:
+                    self._connect()
+            return self._cursor()
+
+    def refresh(self) -> None:
+        """Neue Parent-Connection bei der nächsten Query (z. B. nach DB-Refresh); laufende Queries laufen zu Ende."""
+        with self._lock:
+            if self._parent is not None:
+                self._counters["reconnects"] += 1
+                self._retire(self._parent)
+            self._parent = None
+            self._generation += 1
+
+    def close(self) -> None:
+        with self._lock:
+            self._close_all()
+            self._generation += 1
+
+    @property
+    def generation(self) -> int:
+        """Wird bei jedem (Re-)Connect erhöht; eignet sich zum Invalidieren abgeleiteter Zustände."""
+        return self._generation
+
+    # -------- Queries --------
+    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
+        """Führt eine Query aus und liefert die Zeilen als Liste von Dicts ("records")."""
+        for attempt in range(2):
+            cur = self._cursor()
+            if attempt == 0 and self._needs_health_check():
+                cur = self._health_check(cur)
+            try:
+                # execute, description und fetchall gemeinsam: alle brauchen die Connection
+                res = cur.execute(sql, params) if params is not None else cur.execute(sql)
+                cols = [d[0] for d in res.description]
+                rows = res.fetchall()
+                break
+            except duckdb.ConnectionException:
+                # Verbindung wurde zwischenzeitlich geschlossen -> einmal neu versuchen
+                if attempt == 0:
+                    with self._lock:
+                        if getattr(self._local, "generation", None) == self._generation:
+                            self._connect()
+                    continue
+                with self._lock:
+                    self._counters["query_errors"] += 1
+                raise
+            except Exception:
+                with self._lock:
+                    self._counters["query_errors"] += 1
+                raise
+        with self._lock:
+            self._counters["queries"] += 1
+            self._queries_current_connection += 1
+        return [dict(zip(cols, row)) for row in rows]
+
+    # -------- Stats --------
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "db_file": self.db_file.as_posix(),
+                "read_only": self.read_only,
+                "is_open": self._parent is not None,
+                "open_for_s": (time.time() - self._parent.opened_at) if self._parent else 0.0,
+                "queries_current_connection": self._queries_current_connection,
+                "open_cursors": len(self._parent.cursors) if self._parent else 0,
+                "retired_connections": len(self._retired),
+                **self._counters,
+            }
+
+
+_MANAGERS: Dict[str, DuckDBConnectionManager] = {}
+_MANAGERS_LOCK = threading.Lock()
+
+
+def get_connection_manager(db_file: Union[str, Path], read_only: bool = True) -> DuckDBConnectionManager:
+    """
+    Liefert den prozessweit geteilten Connection-Manager für ``db_file``.
+    """
+    key = Path(db_file).resolve().as_posix()
+    with _MANAGERS_LOCK:
+        manager = _MANAGERS.get(key)
+        if manager is None:
+            manager = DuckDBConnectionManager(db_file, read_only=read_only)
+            _MANAGERS[key] = manager
+        return manager
+
+
+def get_connection_stats() -> List[Dict[str, Any]]:
+    with _MANAGERS_LOCK:
+        managers = list(_MANAGERS.values())
+    return [m.stats() for m in managers]
@@ -0,0 +1,119 @@
+import re
+import unicodedata
+from collections import Counter
+from typing import Any, Dict, Generic, Iterable, List, Set, Tuple, TypeVar
+
+T = TypeVar("T")
+
+_UMLAUTS = str.maketrans({"ä": "ae", "ö": "oe", "ü": "ue", "ß": "ss"})
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(text: Any) -> str:
+    """
+    Vergleichsform eines Namens: casefold, Umlaute transliteriert (ä -> ae, ß -> ss),
+    übrige Akzente entfernt, Satzzeichen -> Leerzeichen.
+    "Bäckerei Müller-Groß" -> "baeckerei mueller gross"
+    """
+    s = str(text or "").casefold().translate(_UMLAUTS)
+    s = unicodedata.normalize("NFKD", s)
+    s = "".join(c for c in s if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", s).strip()
+
+
+def _trigrams(s: str) -> Set[str]:
+    padded = f"  {s} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _dice(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return 2.0 * len(a & b) / (len(a) + len(b))
+
+
+class FuzzyNameIndex(Generic[T]):
+    """
+    In-Process-Suchindex für Namen (Produzenten, Produkte) mit Tippfehler-Toleranz.
+
+    - Namen werden normalisiert (normalize_name) und als Trigramme in einen invertierten
+      Index gelegt; Kandidaten sind Einträge mit gemeinsamen Trigrammen.
+    - Score (0..1): 1.0 exakt, 0.9+ Teilstring bzw. alle Query-Tokens enthalten, sonst das
+      Maximum aus Trigramm-Dice des ganzen Namens und dem Mittel der besten Dice-Werte je
+      Query-Token (robust gegen vertauschte Wörter).
+    - Sehr kurze Queries (< 3 Zeichen) werden per Teilstring gesucht.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, T]]):
+        self._names: List[str] = []
+        self._values: List[T] = []
+        self._grams: List[Set[str]] = []
+        self._tokens: List[List[Tuple[str, Set[str]]]] = []
+        self._postings: Dict[str, List[int]] = {}
+        self._exact: Dict[str, List[int]] = {}
+        for name, value in entries:
+            norm = normalize_name(name)
+            if not norm:
+                continue
+            idx = len(self._names)
+            self._names.append(norm)
+            self._values.append(value)
+            grams = _trigrams(norm)
+            self._grams.append(grams)
+            self._tokens.append([(tok, _trigrams(tok)) for tok in norm.split()])
+            self._exact.setdefault(norm, []).append(idx)
+            for g in grams:
+                self._postings.setdefault(g, []).append(idx)
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _score(self, idx: int, query: str, q_grams: Set[str], q_tokens: List[Tuple[str, Set[str]]]) -> float:
+        name = self._names[idx]
+        if name == query:
+            return 1.0
+        name_tokens = self._tokens[idx]
+        if query in name:
+            # kürzere Namen mit gleichem Treffer zuerst
+            return 0.9 + 0.09 * len(query) / len(name)
+        token_scores = []
+        for q_tok, q_tok_grams in q_tokens:
+            best = 0.0
+            for tok, tok_grams in name_tokens:
+                if tok == q_tok:
+                    best = 1.0
+                    break
+                best = max(best, _dice(q_tok_grams, tok_grams))
+            token_scores.append(best)
+        if token_scores and min(token_scores) == 1.0:
+            return 0.9
+        token_avg = sum(token_scores) / len(token_scores) if token_scores else 0.0
+        return max(_dice(q_grams, self._grams[idx]), token_avg * 0.95)
+
+    def search(self, query: Any, limit: int = 5, min_score: float = 0.35,
+               max_candidates: int = 200) -> List[Tuple[T, float]]:
+        """
+        :return: [(value, score)] absteigend nach Score, höchstens ``limit`` Einträge
+        """
+        q = normalize_name(query)
+        if not q:
+            return []
+        if len(q) < 3:
+            hits = [(i, 0.9 if self._names[i] != q else 1.0) for i in range(len(self._names)) if q in self._names[i]]
+        else:
+            q_grams = _trigrams(q)
+            shared = Counter()
+            for g in q_grams:
+                for i in self._postings.get(g, ()):
+                    shared[i] += 1
+            for i in self._exact.get(q, ()):
+                shared[i] += len(q_grams)
+            q_tokens = [(tok, _trigrams(tok)) for tok in q.split()]
+            hits = [(i, self._score(i, q, q_grams, q_tokens)) for i, _ in shared.most_common(max_candidates)]
+        hits = [(i, s) for i, s in hits if s >= min_score]
+        hits.sort(key=lambda h: (-h[1], len(self._names[h[0]]), h[0]))
+        return [(self._values[i], round(s, 3)) for i, s in hits[:max(0, limit)]]
+
+    def exact(self, query: Any) -> List[T]:
+        """Alle Einträge mit identischem normalisiertem Namen."""
+        return [self._values[i] for i in self._exact.get(normalize_name(query), ())]
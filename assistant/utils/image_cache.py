@@ -0,0 +1,147 @@
+import base64
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+import requests
+from PIL import Image
+
+from assistant.logger import get_assistant_logger
+
+HISTORY_IMAGE_CACHE_DIR = os.environ.get("HISTORY_IMAGE_CACHE_DIR", "cache/history_images")
+HISTORY_IMAGE_MAX_BYTES = int(os.environ.get("HISTORY_IMAGE_MAX_BYTES", 8 * 1024 * 1024))
+HISTORY_IMAGE_TIMEOUT_S = float(os.environ.get("HISTORY_IMAGE_TIMEOUT_S", 5))
+HISTORY_IMAGE_MAX_WORKERS = int(os.environ.get("HISTORY_IMAGE_MAX_WORKERS", 8))
+HISTORY_IMAGE_MAX_SIDE = int(os.environ.get("HISTORY_IMAGE_MAX_SIDE", 512))
+
+
+class ImageThumbnailCache:
+    """
+    Lokaler, inhaltsadressierter Thumbnail-Cache für Bilder aus der Chat-Historie.
+
+    - Thumbnails liegen als ``<sha256 des Originals>.jpg`` im Cache-Verzeichnis;
+      ``urls/<sha256 der URL>`` verweist auf den Inhalts-Hash (gleiche Bilder unter
+      verschiedenen URLs werden nur einmal gespeichert).
+    - Downloads laufen parallel (``max_workers``) mit Timeout und Größenlimit; was nicht
+      geladen werden kann, liefert None (Aufrufer gibt dann die URL zurück).
+    """
+
+    def __init__(
+        self,
+        cache_dir: Union[str, Path] = HISTORY_IMAGE_CACHE_DIR,
+        max_bytes: int = HISTORY_IMAGE_MAX_BYTES,
+        timeout_s: float = HISTORY_IMAGE_TIMEOUT_S,
+        max_workers: int = HISTORY_IMAGE_MAX_WORKERS,
+        max_side: int = HISTORY_IMAGE_MAX_SIDE,
+    ):
+        self.cache_dir = Path(cache_dir)
+        (self.cache_dir / "urls").mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.timeout_s = timeout_s
+        self.max_side = max_side
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="history-img")
+        self._session = requests.Session()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "fetched": 0, "too_large": 0, "failed": 0}
+
+    # -------- Cache-Pfade --------
+    @staticmethod
+    def _sha256(data: Union[str, bytes]) -> str:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        return hashlib.sha256(data).hexdigest()
+
+    def _url_ref(self, url: str) -> Path:
+        return self.cache_dir / "urls" / self._sha256(url)
+
+    def _thumb_path(self, content_hash: str) -> Path:
+        return self.cache_dir / f"{content_hash}.jpg"
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    # -------- Laden --------
+    def _download(self, url: str) -> Optional[bytes]:
+        with self._session.get(url, stream=True, timeout=self.timeout_s) as resp:
+            resp.raise_for_status()
+            length = resp.headers.get("Content-Length")
+            if length and length.isdigit() and int(length) > self.max_bytes:
+                self._count("too_large")
+                return None
+            buf = bytearray()
+            for chunk in resp.iter_content(64 * 1024):
+                buf.extend(chunk)
+                if len(buf) > self.max_bytes:
+                    self._count("too_large")
+                    return None
+            return bytes(buf)
+
+    def _thumbnail(self, raw: bytes) -> bytes:
+        with Image.open(BytesIO(raw)) as img:
+            img = img.convert("RGB")
+            img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            out = BytesIO()
+            img.save(out, format="JPEG", quality=80)
+            return out.getvalue()
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def _get_one(self, url: str) -> Optional[str]:
+        ref = self._url_ref(url)
+        try:
+            content_hash = ref.read_text(encoding="ascii").strip()
+            thumb = self._thumb_path(content_hash).read_bytes()
+            self._count("hits")
+            return "data:image/jpeg;base64," + base64.b64encode(thumb).decode("ascii")
+        except OSError:
+            pass
+        try:
+            raw = self._download(url)
+            if raw is None:
+                return None
+            content_hash = self._sha256(raw)
+            path = self._thumb_path(content_hash)
+            if path.exists():
+                thumb = path.read_bytes()
+            else:
+                thumb = self._thumbnail(raw)
+                self._write_atomic(path, thumb)
+            self._write_atomic(ref, content_hash.encode("ascii"))
+            self._count("fetched")
+            return "data:image/jpeg;base64," + base64.b64encode(thumb).decode("ascii")
+        except Exception as e:
+            self._count("failed")
+            get_assistant_logger().warning("Loading history image failed: %s", e.__class__.__name__)
+            return None
+
+    def get_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """Lädt alle (eindeutigen) URLs parallel; Ergebnis: url -> data-URL (oder None)."""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        if not unique:
+            return {}
+        return dict(zip(unique, self._pool.map(self._get_one, unique)))
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+_CACHE: Optional[ImageThumbnailCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_image_thumbnail_cache() -> ImageThumbnailCache:
+    global _CACHE
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ImageThumbnailCache()
+        return _CACHE
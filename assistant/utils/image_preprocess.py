@@ -0,0 +1,108 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps
+
+from assistant.logger import get_assistant_logger
+
+_FORMAT_TO_MIME = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+    "BMP": "image/bmp",
+    "TIFF": "image/tiff",
+}
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    if img.mode in ("RGBA", "LA", "PA"):
+        return True
+    return img.mode == "P" and "transparency" in img.info
+
+
+class ImagePreprocessor:
+    """
+    Verkleinert Upload-Bilder auf ``max_side`` (längste Kante) vor dem Speichern.
+
+    - JPEGs werden per ``draft()`` schon beim Dekodieren verkleinert (DCT-Skalierung).
+    - Bilder, die schon klein genug sind, werden nicht neu kodiert.
+    - Ausgabeformat passend zum Input: mit Transparenz PNG, sonst JPEG; animierte Bilder bleiben unverändert.
+    - Mehrere Dateien parallel im Thread-Pool; Ergebnisse per LRU nach Hash des Inputs gecacht.
+    """
+
+    def __init__(self, max_side: int = 1280, jpeg_quality: int = 85,
+                 max_workers: int = 4, cache_size: int = 128):
+        self.max_side = max_side
+        self.jpeg_quality = jpeg_quality
+        self.cache_size = cache_size
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="img-prep")
+        self._cache: "OrderedDict[str, Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"processed": 0, "passthrough": 0, "cache_hits": 0, "errors": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _resize(self, raw: bytes) -> Tuple[bytes, Optional[str]]:
+        with Image.open(BytesIO(raw)) as img:
+            fmt = img.format
+            mime = _FORMAT_TO_MIME.get(fmt or "")
+            if max(img.size) <= self.max_side or getattr(img, "is_animated", False):
+                self._count("passthrough")
+                return raw, mime
+            if fmt == "JPEG":
+                # decodiert direkt in (mindestens) Zielgröße statt in voller Auflösung
+                img.draft("RGB", (self.max_side, self.max_side))
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((self.max_side, self.max_side), Image.LANCZOS)
+            buf = BytesIO()
+            if _has_alpha(img):
+                img.save(buf, format="PNG", optimize=True)
+                mime = "image/png"
+            else:
+                if img.mode != "RGB":
+                    img = img.convert("RGB")
+                img.save(buf, format="JPEG", quality=self.jpeg_quality, optimize=True)
+                mime = "image/jpeg"
+            self._count("processed")
+            return buf.getvalue(), mime
+
+    def process(self, raw: bytes) -> Tuple[bytes, Optional[str]]:
+        """
+        :return: (bytes, mime) – mime ist None, wenn das Format nicht erkannt wurde
+        """
+        key = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                self._stats["cache_hits"] += 1
+                return hit
+        try:
+            result = self._resize(raw)
+        except Exception as e:
+            # kein (lesbares) Bild -> unverändert weiterreichen, wie bisher
+            self._count("errors")
+            get_assistant_logger().warning("Image preprocessing failed: %s", e.__class__.__name__)
+            return raw, None
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return result
+
+    def process_many(self, raws: Sequence[bytes]) -> List[Tuple[bytes, Optional[str]]]:
+        """Verarbeitet mehrere Bilder parallel, Reihenfolge bleibt erhalten."""
+        if len(raws) <= 1:
+            return [self.process(r) for r in raws]
+        return list(self._pool.map(self.process, raws))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"cache_entries": len(self._cache), **self._stats}
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+IMAGE_STORE_DIR = os.environ.get("IMAGE_STORE_DIR", "data/images")
+# LRU für fertige data-URLs (Bytes), damit dieselben Bilder nicht pro LLM-Call neu kodiert werden
+IMAGE_STORE_DATA_URL_CACHE_BYTES = int(os.environ.get("IMAGE_STORE_DATA_URL_CACHE_BYTES", 64 * 1024 * 1024))
+
+IMAGE_REF_PREFIX = "img://sha256/"
+
+_EXT_TO_MIME = {
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+    "gif": "image/gif",
+    "webp": "image/webp",
+    "bmp": "image/bmp",
+    "tiff": "image/tiff",
+    "svg": "image/svg+xml",
+}
+_MIME_TO_EXT = {v: k for k, v in _EXT_TO_MIME.items()}
+_MIME_TO_EXT["image/jpg"] = "jpeg"
+
+
+def sniff_image_mime(raw: bytes) -> Optional[str]:
+    """MIME-Typ anhand der Magic Bytes (ohne das Bild zu dekodieren)."""
+    if raw.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if raw.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if raw[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    if raw.startswith(b"BM"):
+        return "image/bmp"
+    if raw[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    return None
+
+
+def is_image_ref(url: Any) -> bool:
+    return isinstance(url, str) and url.startswith(IMAGE_REF_PREFIX)
+
+
+def parse_image_ref(ref: str) -> Tuple[str, str]:
+    """img://sha256/<hex>.<ext> -> (hex, mime)"""
+    name = ref[len(IMAGE_REF_PREFIX):]
+    digest, _, ext = name.partition(".")
+    if len(digest) != 64 or not all(c in "0123456789abcdef" for c in digest):
+        raise ValueError(f"Invalid image reference '{ref}'")
+    return digest, _EXT_TO_MIME.get(ext, "image/png")
+
+
+class ImageStore:
+    """
+    Inhaltsadressierter Bildspeicher im lokalen Dateisystem.
+
+    - put() legt die Bytes unter ``<root>/<hh>/<sha256>.<ext>`` ab und liefert eine Referenz
+      ``img://sha256/<sha256>.<ext>``; identische Uploads werden nur einmal gespeichert.
+    - Messages/Checkpoints enthalten nur diese Referenz. Erst direkt vor dem LLM-Call macht
+      resolve_image_refs() daraus data-URLs (mit LRU-Cache für die kodierten Strings).
+    """
+
+    def __init__(self, root: Union[str, Path] = IMAGE_STORE_DIR,
+                 data_url_cache_bytes: int = IMAGE_STORE_DATA_URL_CACHE_BYTES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.data_url_cache_bytes = data_url_cache_bytes
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._cache_size = 0
+        self._lock = threading.Lock()
+        self._stats = {"puts": 0, "dedup_puts": 0, "data_url_hits": 0, "data_url_misses": 0}
+
+    def _path(self, digest: str, ext: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.{ext}"
+
+    def put(self, raw: bytes, mime: Optional[str] = None) -> str:
+        mime = sniff_image_mime(raw) or (mime or "").lower() or "image/png"
+        ext = _MIME_TO_EXT.get(mime, "png")
+        digest = hashlib.sha256(raw).hexdigest()
+        path = self._path(digest, ext)
+        if path.exists():
+            with self._lock:
+                self._stats["dedup_puts"] += 1
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp.write_bytes(raw)
+            os.replace(tmp, path)
+            with self._lock:
+                self._stats["puts"] += 1
+        return f"{IMAGE_REF_PREFIX}{digest}.{ext}"
+
+    def get(self, ref: str) -> bytes:
+        digest, mime = parse_image_ref(ref)
+        return self._path(digest, _MIME_TO_EXT.get(mime, "png")).read_bytes()
+
+    def to_data_url(self, ref: str) -> str:
+        with self._lock:
+            cached = self._cache.get(ref)
+            if cached is not None:
+                self._cache.move_to_end(ref)
+                self._stats["data_url_hits"] += 1
+                return cached
+            self._stats["data_url_misses"] += 1
+        _, mime = parse_image_ref(ref)
+        data_url = f"data:{mime};base64," + base64.b64encode(self.get(ref)).decode("ascii")
+        with self._lock:
+            if ref not in self._cache and len(data_url) <= self.data_url_cache_bytes:
+                self._cache[ref] = data_url
+                self._cache_size += len(data_url)
+                while self._cache_size > self.data_url_cache_bytes:
+                    _, old = self._cache.popitem(last=False)
+                    self._cache_size -= len(old)
+        return data_url
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"root": self.root.as_posix(), "data_url_cache_bytes": self._cache_size, **self._stats}
+
+
+_STORE: Optional[ImageStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_image_store() -> ImageStore:
+    global _STORE
+    with _STORE_LOCK:
+        if _STORE is None:
+            _STORE = ImageStore()
+        return _STORE
+
+
+def resolve_image_refs(messages: Sequence[Any], store: Optional[ImageStore] = None) -> List[Any]:
+    """
+    Ersetzt Bild-Referenzen in Message-Contents durch data-URLs (für den LLM-Call).
+    Messages ohne Referenzen werden unverändert (dieselben Objekte) zurückgegeben.
+    """
+    out = []
+    for msg in messages:
+        content = getattr(msg, "content", None)
+        if not isinstance(content, list) or not any(
+            isinstance(p, dict) and p.get("type") == "image_url"
+            and is_image_ref((p.get("image_url") or {}).get("url"))
+            for p in content
+        ):
+            out.append(msg)
+            continue
+        store = store or get_image_store()
+        new_content = []
+        for part in content:
+            url = (part.get("image_url") or {}).get("url") if isinstance(part, dict) else None
+            if isinstance(part, dict) and part.get("type") == "image_url" and is_image_ref(url):
+                try:
+                    part = {**part, "image_url": {"url": store.to_data_url(url)}}
+                except (OSError, ValueError):
+                    # Bild fehlt im Store (z. B. anderer Host) -> LLM-Call nicht abbrechen
+                    part = {"type": "text", "text": "[Bild nicht mehr verfügbar]"}
+            new_content.append(part)
+        out.append(msg.model_copy(update={"content": new_content}))
+    return out
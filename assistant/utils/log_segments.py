@@ -0,0 +1,240 @@
+import gzip
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+SEGMENT_SUFFIX = ".gz"
+INDEX_SUFFIX = ".idx.json"
+# Rohsegment, das ein Prozess gerade komprimiert: <segment>.compacting.<pid>
+CLAIM_MARK = ".compacting."
+_TS_KEYS = ("ts_start", "ts_end")
+
+
+def _segment_glob(logfile: Path) -> str:
+    # tool_logs.jsonl -> tool_logs-*.jsonl (roh) / tool_logs-*.jsonl.gz (komprimiert)
+    return f"{logfile.stem}-*{logfile.suffix}"
+
+
+def rotated_name(logfile: Union[str, Path]) -> Path:
+    """Zielname für ein frisch rotiertes (noch unkomprimiertes) Segment."""
+    logfile = Path(logfile)
+    now = time.time()
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.gmtime(now)) + f"{int(now * 1000) % 1000:03d}"
+    n = 0
+    while True:
+        candidate = logfile.with_name(f"{logfile.stem}-{stamp}-{os.getpid()}-{n}{logfile.suffix}")
+        if not candidate.exists() and not candidate.with_name(candidate.name + SEGMENT_SUFFIX).exists():
+            return candidate
+        n += 1
+
+
+def _claim(raw: Path) -> Optional[Path]:
+    """
+    Übernimmt ein Rohsegment exklusiv per rename (atomar, auch zwischen Prozessen).
+    Auch verwaiste Claims toter Prozesse lassen sich so neu übernehmen.
+    :return: Pfad des Claims oder None, wenn ein anderer Prozess schneller war
+    """
+    base = raw.name.split(CLAIM_MARK)[0]
+    claimed = raw.with_name(f"{base}{CLAIM_MARK}{os.getpid()}")
+    try:
+        os.rename(raw, claimed)
+    except OSError:
+        return None
+    return claimed
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # existiert, gehört nur jemand anderem
+    return True
+
+
+def _claim_owner_dead(claimed: Path) -> bool:
+    try:
+        pid = int(claimed.name.rsplit(CLAIM_MARK, 1)[1])
+    except (IndexError, ValueError):
+        return False
+    return pid != os.getpid() and not _pid_alive(pid)
+
+
+def _index_path(segment: Path) -> Path:
+    return segment.with_name(segment.name + INDEX_SUFFIX)
+
+
+def _iter_lines(path: Path) -> Iterator[Dict[str, Any]]:
+    opener = gzip.open if path.suffix == SEGMENT_SUFFIX else open
+    try:
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except Exception:
+                    continue
+                if isinstance(rec, dict):
+                    yield rec
+    except (OSError, EOFError):
+        return
+
+
+def compact_segment(raw: Union[str, Path]) -> Optional[Path]:
+    """
+    Komprimiert ein rotiertes JSONL-Segment (gzip) und schreibt daneben einen Sidecar-Index
+    mit den enthaltenen thread_ids und dem Zeitbereich. Das Rohsegment wird danach gelöscht.
+    Es wird vorher per rename übernommen (_claim); kommt ein anderer Prozess zuvor, passiert nichts.
+    """
+    raw = Path(raw)
+    base = raw.with_name(raw.name.split(CLAIM_MARK)[0])
+    claimed = _claim(raw)
+    if claimed is None:
+        return None
+    raw = claimed
+    thread_ids = set()
+    ts_min: Optional[str] = None
+    ts_max: Optional[str] = None
+    lines = 0
+    for rec in _iter_lines(raw):
+        lines += 1
+        tid = rec.get("thread_id")
+        if tid:
+            thread_ids.add(str(tid))
+        for k in _TS_KEYS:
+            ts = rec.get(k)
+            if isinstance(ts, str) and ts:
+                ts_min = ts if ts_min is None or ts < ts_min else ts_min
+                ts_max = ts if ts_max is None or ts > ts_max else ts_max
+
+    target = base.with_name(base.name + SEGMENT_SUFFIX)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(raw, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    index = {
+        "segment": target.name,
+        "lines": lines,
+        "ts_min": ts_min,
+        "ts_max": ts_max,
+        "thread_ids": sorted(thread_ids),
+    }
+    idx_tmp = _index_path(target).with_name(_index_path(target).name + ".tmp")
+    idx_tmp.write_text(json.dumps(index, ensure_ascii=False), encoding="utf-8")
+    # Index zuerst, damit ein sichtbares Segment immer einen Index hat
+    os.replace(idx_tmp, _index_path(target))
+    os.replace(tmp, target)
+    raw.unlink()
+    return target
+
+
+def compact_pending(logfile: Union[str, Path], min_age_s: float = 300.0) -> List[Path]:
+    """
+    Komprimiert liegengebliebene Rohsegmente (z. B. nach einem Absturz während der Rotation).
+    Jüngere Rohsegmente werden gerade vom rotierenden Prozess selbst komprimiert.
+    Claims (.compacting.<pid>) werden nur übernommen, wenn der Prozess nicht mehr läuft.
+    """
+    logfile = Path(logfile)
+    out = []
+    now = time.time()
+    claims = [c for c in logfile.parent.glob(_segment_glob(logfile) + CLAIM_MARK + "*") if _claim_owner_dead(c)]
+    for raw in sorted(list(logfile.parent.glob(_segment_glob(logfile))) + claims):
+        try:
+            if raw not in claims and now - raw.stat().st_mtime < min_age_s:
+                continue
+            seg = compact_segment(raw)
+        except OSError:
+            continue
+        if seg:
+            out.append(seg)
+    return out
+
+
+def list_segments(logfile: Union[str, Path]) -> List[Path]:
+    """Komprimierte Segmente, älteste zuerst (Name enthält den Rotationszeitpunkt)."""
+    logfile = Path(logfile)
+    return sorted(logfile.parent.glob(_segment_glob(logfile) + SEGMENT_SUFFIX))
+
+
+def read_index(segment: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(_index_path(segment).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def enforce_retention(
+    logfile: Union[str, Path],
+    max_segments: int = 0,
+    retention_days: float = 0,
+) -> int:
+    """
+    Löscht die ältesten Segmente (inkl. Index), bis höchstens ``max_segments`` übrig sind
+    bzw. keines älter als ``retention_days`` ist. 0 = keine Grenze.
+    :return: Anzahl gelöschter Segmente
+    """
+    segments = list_segments(logfile)
+    doomed = []
+    if max_segments and len(segments) > max_segments:
+        doomed.extend(segments[: len(segments) - max_segments])
+    if retention_days:
+        cutoff = time.time() - retention_days * 86400
+        for seg in segments:
+            try:
+                if seg not in doomed and seg.stat().st_mtime < cutoff:
+                    doomed.append(seg)
+            except OSError:
+                continue
+    for seg in doomed:
+        for p in (seg, _index_path(seg)):
+            try:
+                p.unlink()
+            except OSError:
+                pass
+    return len(doomed)
+
+
+def _segment_matches(
+    index: Optional[Dict[str, Any]],
+    thread_id: Optional[str],
+    ts_min: Optional[str],
+    ts_max: Optional[str],
+) -> bool:
+    if index is None:
+        return True  # ohne Index lässt sich nichts ausschließen
+    if thread_id is not None and str(thread_id) not in set(index.get("thread_ids") or []):
+        return False
+    if ts_min is not None and index.get("ts_max") and index["ts_max"] < ts_min:
+        return False
+    if ts_max is not None and index.get("ts_min") and index["ts_min"] > ts_max:
+        return False
+    return True
+
+
+def iter_records(
+    logfile: Union[str, Path],
+    thread_id: Optional[str] = None,
+    ts_min: Optional[str] = None,
+    ts_max: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Liest alle Events chronologisch: komprimierte Segmente, noch nicht komprimierte Rohsegmente
+    (auch gerade komprimierte Claims), dann die aktive Datei. Segmente, deren Index den Thread bzw. das Zeitfenster
+    (ISO-8601, UTC) ausschließt, werden gar nicht geöffnet. Die Records selbst werden
+    nicht gefiltert.
+    """
+    logfile = Path(logfile)
+    for seg in list_segments(logfile):
+        if _segment_matches(read_index(seg), thread_id, ts_min, ts_max):
+            yield from _iter_lines(seg)
+    pending = list(logfile.parent.glob(_segment_glob(logfile)))
+    pending += logfile.parent.glob(_segment_glob(logfile) + CLAIM_MARK + "*")
+    for raw in sorted(pending, key=lambda p: p.name.split(CLAIM_MARK)[0]):
+        yield from _iter_lines(raw)
+    if logfile.exists():
+        yield from _iter_lines(logfile)
@@ -0,0 +1,479 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+
+from assistant.utils.buffered_writer import (
+    DEFAULT_FLUSH_BATCH,
+    DEFAULT_FLUSH_INTERVAL_S,
+    DEFAULT_QUEUE_SIZE,
+    DEFAULT_RETENTION_DAYS,
+)
+
+# wie oft Schreibzugriffe höchstens alte Runs löschen (prune)
+PRUNE_INTERVAL_S = float(os.environ.get("TOOL_RUN_STORE_PRUNE_INTERVAL_S", 3600))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tool_runs (
+    run_id            TEXT PRIMARY KEY,
+    parent_run_id     TEXT,
+    tool_name         TEXT,
+    input             TEXT,
+    output_text       TEXT,
+    output_json       TEXT,
+    output_kind       TEXT,
+    status            TEXT,
+    execution_time_s  REAL,
+    cache_hit         INTEGER,
+    ts_start          TEXT,
+    ts_end            TEXT,
+    user_id           TEXT,
+    thread_id         TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tool_runs_parent ON tool_runs(parent_run_id);
+CREATE INDEX IF NOT EXISTS idx_tool_runs_thread ON tool_runs(thread_id, ts_end);
+
+CREATE TABLE IF NOT EXISTS llm_runs (
+    llm_run_id     TEXT PRIMARY KEY,
+    parent_run_id  TEXT,
+    ts_end         TEXT,
+    user_id        TEXT,
+    thread_id      TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_llm_runs_parent ON llm_runs(parent_run_id);
+CREATE INDEX IF NOT EXISTS idx_llm_runs_thread ON llm_runs(thread_id);
+
+CREATE TABLE IF NOT EXISTS llm_messages (
+    message_id  TEXT NOT NULL,
+    llm_run_id  TEXT NOT NULL,
+    pos         INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (message_id, llm_run_id)
+);
+CREATE INDEX IF NOT EXISTS idx_llm_messages_run ON llm_messages(llm_run_id);
+
+CREATE TABLE IF NOT EXISTS store_meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+# Spalten, die nach der ersten Version dazukamen: (Tabelle, Spalte, Typ)
+_ADDED_COLUMNS = [
+    ("tool_runs", "cache_hit", "INTEGER"),
+]
+
+
+def _json_or_none(v: Any) -> Optional[str]:
+    if v is None:
+        return None
+    if isinstance(v, str):
+        return v
+    try:
+        return json.dumps(v, ensure_ascii=False, default=str)
+    except Exception:
+        return None
+
+
+class ToolRunStore:
+    """
+    Indizierter Speicher (SQLite) für Tool-Runs und LLM-Runs des LocalToolLogger.
+
+    - Wird inkrementell aus den Callbacks befüllt: submit() reiht das Event nur ein, ein
+      Hintergrund-Thread schreibt die Queue wie BufferedLineWriter gebündelt weg
+      (eine Transaktion pro Flush). Volle Queue: Event wird verworfen (stats["dropped"]).
+    - Lesende Methoden flushen vorher, sehen also alle bis dahin eingereihten Events.
+    - Indizes auf message_id, llm_run_id, parent_run_id und thread_id -> Lookups ohne Datei-Scan.
+    - Eine Connection pro Thread, WAL-Modus: mehrere Threads/Prozesse (Flask-Worker) können
+      gleichzeitig lesen und schreiben.
+    - Aufbewahrung wie bei den JSONL-Segmenten (``retention_days``, TOOL_LOG_RETENTION_DAYS):
+      ältere Runs löscht prune(), von den Writes höchstens alle PRUNE_INTERVAL_S angestoßen.
+    """
+
+    def __init__(
+        self,
+        db_file: Union[str, Path],
+        busy_timeout_s: float = 5.0,
+        retention_days: float = DEFAULT_RETENTION_DAYS,
+        max_queue: int = DEFAULT_QUEUE_SIZE,
+        flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S,
+        flush_batch: int = DEFAULT_FLUSH_BATCH,
+    ):
+        self.db_file = Path(db_file)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_s = busy_timeout_s
+        self.retention_days = retention_days
+        self.flush_interval_s = max(0.01, float(flush_interval_s))
+        self.flush_batch = max(1, int(flush_batch))
+        self._local = threading.local()
+        self._last_prune: Optional[float] = None
+        with self._conn() as con:
+            con.executescript(_SCHEMA)
+            self._migrate(con)
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._flush_requested = threading.Event()
+        self._flushed = threading.Condition()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, int] = {"written": 0, "dropped": 0, "batches": 0, "write_errors": 0}
+        self._enqueued = 0
+        self._done = 0
+        self._thread = threading.Thread(target=self._run, name=f"tool-run-store:{self.db_file.name}", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def _migrate(con: sqlite3.Connection) -> None:
+        """Fehlende Spalten in bestehenden Stores ergänzen (CREATE TABLE IF NOT EXISTS ändert nichts)."""
+        for table, column, col_type in _ADDED_COLUMNS:
+            cols = {r[1] for r in con.execute(f"PRAGMA table_info({table})").fetchall()}
+            if column not in cols:
+                try:
+                    con.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_type}")
+                except sqlite3.OperationalError:
+                    # parallel von einem anderen Prozess ergänzt
+                    pass
+
+    # -------- Connection --------
+    def _conn(self) -> sqlite3.Connection:
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(self.db_file.as_posix(), timeout=self.busy_timeout_s)
+            con.row_factory = sqlite3.Row
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("PRAGMA synchronous=NORMAL")
+            self._local.con = con
+        return con
+
+    def _query(self, sql: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+        self._flush_pending()
+        return [dict(r) for r in self._conn().execute(sql, params).fetchall()]
+
+    # -------- Queue (Producer) --------
+    def submit(self, rec: Dict[str, Any]) -> bool:
+        """
+        Reiht ein Event im JSONL-Format ein (tool_start/tool_end/tool_error/llm_end); kein
+        SQLite-Zugriff im Aufrufer. Der Record wird kopiert, spätere Änderungen wirken nicht.
+        :return: False, wenn das Event verworfen wurde (Queue voll oder Store geschlossen)
+        """
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(dict(rec))
+        except queue.Full:
+            with self._stats_lock:
+                self._stats["dropped"] += 1
+            return False
+        with self._stats_lock:
+            self._enqueued += 1
+        if self._queue.qsize() >= self.flush_batch:
+            self._flush_requested.set()
+        return True
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """Wartet, bis alle bisher eingereihten Events geschrieben sind."""
+        with self._stats_lock:
+            target = self._enqueued
+        self._flush_requested.set()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._flushed:
+            while True:
+                with self._stats_lock:
+                    if self._done >= target:
+                        return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._flushed.wait(remaining)
+
+    def _flush_pending(self) -> None:
+        if threading.current_thread() is self._thread:
+            return
+        with self._stats_lock:
+            pending = self._done < self._enqueued
+        if pending:
+            self.flush()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Schreibt die Queue leer und beendet den Writer-Thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._flush_requested.set()
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+
+    # -------- Queue (Consumer) --------
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            self._flush_requested.wait(self.flush_interval_s)
+            self._flush_requested.clear()
+            batch: List[Dict[str, Any]] = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            with self._conn() as con:
+                for rec in batch:
+                    self._apply(con, rec)
+            with self._stats_lock:
+                self._stats["written"] += len(batch)
+                self._stats["batches"] += 1
+        except Exception:
+            # bewusst still; Logging darf keine Pipeline brechen
+            with self._stats_lock:
+                self._stats["write_errors"] += 1
+        finally:
+            with self._stats_lock:
+                self._done += len(batch)
+            with self._flushed:
+                self._flushed.notify_all()
+        self._maybe_prune()
+
+    # -------- Writes --------
+    @staticmethod
+    def _upsert_tool_start(con: sqlite3.Connection, rec: Dict[str, Any]) -> None:
+        con.execute(
+            """
+            INSERT INTO tool_runs (run_id, parent_run_id, tool_name, input, status, ts_start, user_id, thread_id)
+            VALUES (?, ?, ?, ?, 'running', ?, ?, ?)
+            ON CONFLICT(run_id) DO UPDATE SET
+                parent_run_id = COALESCE(excluded.parent_run_id, tool_runs.parent_run_id),
+                tool_name     = COALESCE(excluded.tool_name, tool_runs.tool_name),
+                input         = excluded.input,
+                ts_start      = excluded.ts_start,
+                user_id       = COALESCE(excluded.user_id, tool_runs.user_id),
+                thread_id     = COALESCE(excluded.thread_id, tool_runs.thread_id)
+            """,
+            (
+                str(rec.get("run_id")), rec.get("parent_run_id"), rec.get("tool_name"),
+                rec.get("input"), rec.get("ts_start"), rec.get("user_id"), rec.get("thread_id"),
+            ),
+        )
+
+    @staticmethod
+    def _upsert_tool_finish(con: sqlite3.Connection, rec: Dict[str, Any], status: str) -> None:
+        con.execute(
+            """
+            INSERT INTO tool_runs (run_id, parent_run_id, tool_name, output_text, output_json, output_kind,
+                                   status, execution_time_s, cache_hit, ts_end, user_id, thread_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(run_id) DO UPDATE SET
+                parent_run_id    = COALESCE(excluded.parent_run_id, tool_runs.parent_run_id),
+                tool_name        = COALESCE(excluded.tool_name, tool_runs.tool_name),
+                output_text      = COALESCE(excluded.output_text, tool_runs.output_text),
+                output_json      = COALESCE(excluded.output_json, tool_runs.output_json),
+                output_kind      = COALESCE(excluded.output_kind, tool_runs.output_kind),
+                status           = excluded.status,
+                execution_time_s = COALESCE(excluded.execution_time_s, tool_runs.execution_time_s),
+                cache_hit        = COALESCE(excluded.cache_hit, tool_runs.cache_hit),
+                ts_end           = COALESCE(excluded.ts_end, tool_runs.ts_end),
+                user_id          = COALESCE(excluded.user_id, tool_runs.user_id),
+                thread_id        = COALESCE(excluded.thread_id, tool_runs.thread_id)
+            """,
+            (
+                str(rec.get("run_id")), rec.get("parent_run_id"), rec.get("tool_name"),
+                rec.get("output_text"), _json_or_none(rec.get("output_json")), rec.get("output_kind"),
+                status, rec.get("execution_time_s"),
+                None if rec.get("cache_hit") is None else int(bool(rec.get("cache_hit"))), rec.get("ts_end"),
+                rec.get("user_id"), rec.get("thread_id"),
+            ),
+        )
+
+    @staticmethod
+    def _upsert_llm_end(con: sqlite3.Connection, rec: Dict[str, Any]) -> None:
+        llm_run_id = str(rec.get("llm_run_id"))
+        message_ids = [str(m) for m in (rec.get("message_ids") or []) if m]
+        con.execute(
+            """
+            INSERT INTO llm_runs (llm_run_id, parent_run_id, ts_end, user_id, thread_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(llm_run_id) DO UPDATE SET
+                parent_run_id = excluded.parent_run_id,
+                ts_end        = excluded.ts_end,
+                user_id       = excluded.user_id,
+                thread_id     = excluded.thread_id
+            """,
+            (llm_run_id, rec.get("parent_run_id"), rec.get("ts_end"), rec.get("user_id"), rec.get("thread_id")),
+        )
+        con.execute("DELETE FROM llm_messages WHERE llm_run_id = ?", (llm_run_id,))
+        con.executemany(
+            "INSERT OR IGNORE INTO llm_messages (message_id, llm_run_id, pos) VALUES (?, ?, ?)",
+            [(mid, llm_run_id, i) for i, mid in enumerate(message_ids)],
+        )
+
+    @classmethod
+    def _apply(cls, con: sqlite3.Connection, rec: Dict[str, Any]) -> bool:
+        """Schreibt ein Event im JSONL-Format; False bei unbekanntem/unvollständigem Event."""
+        ev = rec.get("event")
+        if ev == "tool_start" and rec.get("run_id"):
+            cls._upsert_tool_start(con, rec)
+        elif ev in ("tool_end", "tool_error") and rec.get("run_id"):
+            cls._upsert_tool_finish(con, rec, status="error" if ev == "tool_error" else "ok")
+        elif ev == "llm_end" and rec.get("llm_run_id"):
+            cls._upsert_llm_end(con, rec)
+        else:
+            return False
+        return True
+
+    def record_tool_start(self, rec: Dict[str, Any]) -> None:
+        with self._conn() as con:
+            self._upsert_tool_start(con, rec)
+        self._maybe_prune()
+
+    def record_tool_finish(self, rec: Dict[str, Any], status: str = "ok") -> None:
+        """Abschluss eines Tool-Runs (tool_end bzw. tool_error mit status='error')."""
+        with self._conn() as con:
+            self._upsert_tool_finish(con, rec, status)
+        self._maybe_prune()
+
+    def record_llm_end(self, rec: Dict[str, Any]) -> None:
+        with self._conn() as con:
+            self._upsert_llm_end(con, rec)
+        self._maybe_prune()
+
+    def prune(self, retention_days: Optional[float] = None) -> int:
+        """
+        Löscht Tool-Runs und LLM-Runs (samt message_id-Zuordnung), die älter als
+        ``retention_days`` sind (Default: self.retention_days; 0 = nichts löschen).
+        :return: Anzahl gelöschter Tool-Runs
+        """
+        days = self.retention_days if retention_days is None else retention_days
+        if not days:
+            return 0
+        cutoff = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(time.time() - days * 86400)) + "Z"
+        with self._conn() as con:
+            n = con.execute("DELETE FROM tool_runs WHERE COALESCE(ts_end, ts_start) < ?", (cutoff,)).rowcount
+            con.execute(
+                "DELETE FROM llm_messages WHERE llm_run_id IN (SELECT llm_run_id FROM llm_runs WHERE ts_end < ?)",
+                (cutoff,),
+            )
+            con.execute("DELETE FROM llm_runs WHERE ts_end < ?", (cutoff,))
+        return n
+
+    def _maybe_prune(self) -> None:
+        now = time.monotonic()
+        if self._last_prune is not None and now - self._last_prune < PRUNE_INTERVAL_S:
+            return
+        self._last_prune = now
+        try:
+            self.prune()
+        except sqlite3.Error:
+            # beim nächsten Intervall erneut; Writes dürfen daran nicht scheitern
+            pass
+
+    def import_records(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Übernimmt Events im JSONL-Format (tool_start/tool_end/tool_error/llm_end) in einer Transaktion."""
+        n = 0
+        with self._conn() as con:
+            for rec in records:
+                if self._apply(con, rec):
+                    n += 1
+        return n
+
+    def get_meta(self, key: str) -> Optional[str]:
+        self._flush_pending()
+        row = self._conn().execute("SELECT value FROM store_meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str) -> None:
+        with self._conn() as con:
+            con.execute(
+                "INSERT INTO store_meta (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                (key, value),
+            )
+
+    # -------- Reads --------
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._query("SELECT * FROM tool_runs WHERE run_id = ?", (str(run_id),))
+        return rows[0] if rows else None
+
+    def get_runs_by_thread_id(self, thread_id: str) -> List[Dict[str, Any]]:
+        return self._query(
+            "SELECT * FROM tool_runs WHERE thread_id = ? ORDER BY ts_start",
+            (str(thread_id),),
+        )
+
+    def get_runs_by_parent_ids(self, parent_run_ids: Sequence[str]) -> List[Dict[str, Any]]:
+        ids = [str(p) for p in parent_run_ids if p]
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        return self._query(
+            f"SELECT * FROM tool_runs WHERE parent_run_id IN ({placeholders}) ORDER BY ts_start",
+            ids,
+        )
+
+    def get_runs_in_window(self, thread_id: str, ts_min: str, ts_max: str) -> List[Dict[str, Any]]:
+        """Tool-Runs eines Threads, deren ts_end (ISO-8601, UTC) im Fenster liegt."""
+        return self._query(
+            "SELECT * FROM tool_runs WHERE thread_id = ? AND ts_end BETWEEN ? AND ? ORDER BY ts_start",
+            (str(thread_id), ts_min, ts_max),
+        )
+
+    def get_llm_runs_by_message_id(self, message_id: str) -> List[Dict[str, Any]]:
+        return self._query(
+            """
+            SELECT r.* FROM llm_messages m
+            JOIN llm_runs r ON r.llm_run_id = m.llm_run_id
+            WHERE m.message_id = ?
+            """,
+            (str(message_id),),
+        )
+
+    def get_message_ids_by_llm_run_id(self, llm_run_id: str) -> List[str]:
+        rows = self._query(
+            "SELECT message_id FROM llm_messages WHERE llm_run_id = ? ORDER BY pos",
+            (str(llm_run_id),),
+        )
+        return [r["message_id"] for r in rows]
+
+    def count_runs(self) -> int:
+        self._flush_pending()
+        return self._conn().execute("SELECT COUNT(*) FROM tool_runs").fetchone()[0]
+
+    # -------- Stats --------
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "path": self.db_file.as_posix(),
+                "queue_depth": self._queue.qsize(),
+                "running": self._thread.is_alive(),
+                **self._stats,
+            }
+
+
+_STORES: Dict[str, ToolRunStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_tool_run_store(db_file: Union[str, Path]) -> ToolRunStore:
+    """
+    Liefert den prozessweit geteilten Store für ``db_file``.
+    """
+    key = Path(db_file).resolve().as_posix()
+    with _STORES_LOCK:
+        store = _STORES.get(key)
+        if store is None or store._closed:
+            store = ToolRunStore(db_file)
+            _STORES[key] = store
+        return store
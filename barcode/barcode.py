@@ -1,8 +1,27 @@
-from typing import Optional, Dict, List, Union
-import duckdb
+from typing import Optional, Dict, List, Union, Sequence, Any
 from pathlib import Path
 import os
+import threading
+from assistant.utils.duckdb_pool import file_signature, get_connection_manager
+from barcode.product_cache import ProductCache
+
+try:
+    import fcntl  # nur POSIX; verhindert parallele Builds mehrerer Worker-Prozesse
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
 DUCKDB_FILE = Path(os.environ.get("PRODUCT_DB_PATH", "products_db/products.duckdb"))
+# flache, per Barcode indizierte Kopie der 7 LLM-Views (siehe build_product_lookup_table),
+# in eigener Datei, damit der Build die Produkt-DB nicht sperren muss
+PRODUCT_LOOKUP_TABLE = "product_lookup"
+PRODUCT_LOOKUP_DB_FILE = Path(os.environ.get("PRODUCT_LOOKUP_DB_PATH", "products_db/product_lookup.duckdb"))
+PRODUCT_LOOKUP_AUTOBUILD = os.environ.get("PRODUCT_LOOKUP_AUTOBUILD", "true").lower() in ("1", "true", "yes")
+
+# LRU+TTL-Cache vor allen Barcode-Lookups (Scan in /product_by_barcode + extract_context im /chat)
+_product_cache = ProductCache(
+    max_size=int(os.environ.get("PRODUCT_CACHE_MAX_SIZE", 5000)),
+    ttl_s=float(os.environ.get("PRODUCT_CACHE_TTL_S", 900)),
+    negative_ttl_s=float(os.environ.get("PRODUCT_CACHE_NEGATIVE_TTL_S", 120)),
+)
 
 def _normalize_barcodes(value) -> list[str]:
     """
@@ -47,50 +66,266 @@ def _sql_escape(value: str) -> str:
     # Minimal-escaping für SQL-Literale (ANSI)
     return value.replace("'", "''")
 
-def _execute_query(sql) -> List[Dict]:
-    con = duckdb.connect(DUCKDB_FILE.as_posix())
+def _execute_query(sql, params: Optional[Sequence[Any]] = None) -> List[Dict]:
+    # geteilte read-only Connection (ein Cursor pro Thread) statt connect/close pro Aufruf
+    return get_connection_manager(DUCKDB_FILE).execute(sql, params)
+
+# Join-Reihenfolge der LLM-Views (Alias, View) – bestimmt auch, welche Spalte bei Namensgleichheit gewinnt
+_PRODUCT_VIEWS = [
+    ("p", "v_product_core"),
+    ("a", "v_product_allergens"),
+    ("c", "v_product_claims"),
+    ("n", "v_product_nutrition"),
+    ("o", "v_product_origin"),
+    ("x", "v_product_certifications"),
+    ("r", "v_product_processing"),
+]
+
+def _product_join_from(catalog: str = "") -> str:
+    prefix = f"{catalog}." if catalog else ""
+    (core_alias, core), *rest = _PRODUCT_VIEWS
+    joins = "\n".join(f"    LEFT JOIN {prefix}{view} {alias} USING (id)" for alias, view in rest)
+    return f"    FROM {prefix}{core} {core_alias}\n{joins}"
+
+_PRODUCT_JOIN_SQL = "SELECT *\n" + _product_join_from()
+
+_lookup_state = {"key": None, "available": False}
+_lookup_lock = threading.RLock()
+_build_lock = threading.Lock()
+_build_thread: Optional[threading.Thread] = None
+
+def _quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+def _lookup_select_list() -> str:
+    """
+    Explizite, eindeutige Spaltenliste für die Lookup-Tabelle.
+    Entspricht dem dict(zip(...)) über `SELECT *` des View-Joins: Schlüssel in der Reihenfolge
+    ihres ersten Auftretens, Wert aus der letzten View mit dieser Spalte; `id` (USING) aus p.
+    (Ein CTAS über `SELECT *` würde doppelte Namen als note_1, note_2, … umbenennen.)
+    """
+    manager = get_connection_manager(DUCKDB_FILE)
+    source: Dict[str, str] = {}
+    for alias, view in _PRODUCT_VIEWS:
+        rows = manager.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = ? ORDER BY ordinal_position",
+            [view],
+        )
+        for row in rows:
+            name = row["column_name"]
+            if name == "id":
+                source.setdefault(name, _PRODUCT_VIEWS[0][0])
+            else:
+                source[name] = alias
+    return ", ".join(f"{alias}.{_quote_ident(name)} AS {_quote_ident(name)}" for name, alias in source.items())
+
+def _source_signature() -> Optional[str]:
+    """Datei-Signatur der Produkt-DB (mtime_ns:size); ändert sich bei Austausch und In-place-Refresh."""
+    sig = file_signature(DUCKDB_FILE)
+    return None if sig is None else f"{sig[0]}:{sig[1]}"
+
+def _stored_source_signature() -> Optional[str]:
+    if not PRODUCT_LOOKUP_DB_FILE.exists():
+        return None
     try:
-        res = con.execute(sql)
-        cols = [d[0] for d in res.description]
-        return [dict(zip(cols, row)) for row in res.fetchall()]
+        rows = get_connection_manager(PRODUCT_LOOKUP_DB_FILE).execute(
+            f"SELECT source_signature FROM {PRODUCT_LOOKUP_TABLE}_meta LIMIT 1"
+        )
+    except Exception:
+        return None
+    return rows[0]["source_signature"] if rows else None
+
+def build_product_lookup_table(wait: bool = True) -> Optional[int]:
+    """
+    Baut die flache Lookup-Tabelle `product_lookup` aus allen LLM-Views (p, a, c, n, o, x, r):
+    eine Zeile pro Barcode (kleinste id gewinnt) plus Index auf `barcode`.
+
+    Die Tabelle liegt in einer eigenen Datei (PRODUCT_LOOKUP_DB_FILE): gebaut wird in eine
+    Temp-Datei pro Prozess (Produkt-DB read-only per ATTACH), die danach atomar ersetzt wird.
+    Die Produkt-DB wird dabei nicht gesperrt, laufende Lookups lesen bis zum Tausch die alte Tabelle.
+    Ein Datei-Lock (`<lookup>.lock`) serialisiert Builds über Prozessgrenzen; die Datei-Signatur
+    der Produkt-DB wird mitgespeichert, veraltete Tabellen erkennt _lookup_table_available.
+    :param wait: False = nicht auf einen laufenden Build eines anderen Prozesses warten
+                 und nicht bauen, wenn die Tabelle inzwischen aktuell ist
+    :return: Anzahl Zeilen in der Lookup-Tabelle, None wenn nicht gebaut wurde
+    """
+    with _build_lock:
+        PRODUCT_LOOKUP_DB_FILE.parent.mkdir(parents=True, exist_ok=True)
+        lock_fd = os.open(PRODUCT_LOOKUP_DB_FILE.with_name(PRODUCT_LOOKUP_DB_FILE.name + ".lock").as_posix(),
+                          os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock_fd, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    return None   # anderer Prozess baut gerade
+            signature = _source_signature()
+            if not wait and _stored_source_signature() == signature:
+                count = None      # inzwischen von einem anderen Prozess gebaut
+            else:
+                count = _build_lookup_file(signature)
+            get_connection_manager(PRODUCT_LOOKUP_DB_FILE).refresh()
+        finally:
+            os.close(lock_fd)     # gibt auch den flock frei
+    with _lookup_lock:
+        _lookup_state["key"] = None
+    invalidate_product_cache()
+    return count
+
+def _build_lookup_file(signature: Optional[str]) -> int:
+    """Schreibt die Lookup-Datei neu (Datei-Lock muss gehalten werden)."""
+    import duckdb
+    select_list = _lookup_select_list()
+    tmp = PRODUCT_LOOKUP_DB_FILE.with_name(f"{PRODUCT_LOOKUP_DB_FILE.name}.{os.getpid()}.tmp")
+    for leftover in (tmp, tmp.with_name(tmp.name + ".wal")):
+        leftover.unlink(missing_ok=True)
+    con = duckdb.connect(tmp.as_posix())
+    try:
+        con.execute(f"ATTACH '{_sql_escape(DUCKDB_FILE.resolve().as_posix())}' AS src (READ_ONLY)")
+        con.execute(f"""
+        CREATE TABLE {PRODUCT_LOOKUP_TABLE} AS
+        SELECT {select_list}
+        {_product_join_from("src")}
+        WHERE p.barcode IS NOT NULL
+        QUALIFY row_number() OVER (PARTITION BY p.barcode ORDER BY p.id) = 1
+        """)
+        con.execute(f"CREATE UNIQUE INDEX {PRODUCT_LOOKUP_TABLE}_barcode_idx ON {PRODUCT_LOOKUP_TABLE} (barcode)")
+        con.execute(f"CREATE TABLE {PRODUCT_LOOKUP_TABLE}_meta AS SELECT ?::VARCHAR AS source_signature, now() AS built_at", [signature])
+        count = con.execute(f"SELECT count(*) FROM {PRODUCT_LOOKUP_TABLE}").fetchone()[0]
+        con.execute("DETACH src")
+        con.execute("CHECKPOINT")
     finally:
         con.close()
+    os.replace(tmp, PRODUCT_LOOKUP_DB_FILE)
+    return count
+
+def _build_in_background() -> None:
+    """Startet höchstens einen Build-Thread; der Request-Pfad wartet nie auf den Build."""
+    global _build_thread
+    with _lookup_lock:
+        if _build_thread is not None and _build_thread.is_alive():
+            return
+
+        def run():
+            try:
+                build_product_lookup_table(wait=False)
+            except Exception as e:
+                print(f"Building {PRODUCT_LOOKUP_TABLE} failed, falling back to view join: {e}")
+        _build_thread = threading.Thread(target=run, name="product-lookup-build", daemon=True)
+        _build_thread.start()
+
+def _lookup_table_available() -> bool:
+    """
+    Prüft, ob die Lookup-Tabelle zur aktuellen Datei-Signatur der Produkt-DB passt (ein stat pro
+    Aufruf, die gespeicherte Signatur wird nur bei geänderter Signatur bzw. Lookup-Generation
+    gelesen). Fehlt sie oder ist sie veraltet, wird auf den View-Join ausgewichen und (optional)
+    im Hintergrund neu gebaut; der Request-Pfad scannt nie die Views.
+    """
+    lookup = get_connection_manager(PRODUCT_LOOKUP_DB_FILE)
+    signature = _source_signature()
+    with _lookup_lock:
+        if _lookup_state["key"] == (signature, lookup.generation):
+            return _lookup_state["available"]
+        available = signature is not None and _stored_source_signature() == signature
+        if not available and PRODUCT_LOOKUP_AUTOBUILD:
+            _build_in_background()
+        # Generation erst nach der Query lesen (der erste Zugriff verbindet neu)
+        _lookup_state["key"] = (signature, lookup.generation)
+        _lookup_state["available"] = available
+        return available
+
+def _query_products_by_barcodes(barcodes: List[str]) -> Dict[str, Dict]:
+    """
+    Löst alle Barcodes mit EINER parametrisierten Query auf.
+    Bevorzugt die vorberechnete Tabelle `product_lookup` (Index-Lookup statt 7-fach-Join),
+    sonst der Join über alle LLM-Views.
+    Pro Barcode wird (wie bei get_product_by_barcode) das Produkt mit der kleinsten id genommen.
+    :return: Dict {barcode: product} – nur Treffer
+    """
+    if not barcodes:
+        return {}
+    placeholders = ", ".join("?" for _ in barcodes)
+    if _lookup_table_available():
+        sql = f"SELECT * FROM {PRODUCT_LOOKUP_TABLE} WHERE barcode IN ({placeholders});"
+        execute = get_connection_manager(PRODUCT_LOOKUP_DB_FILE).execute
+    else:
+        sql = f"""
+        {_PRODUCT_JOIN_SQL}
+        WHERE p.barcode IN ({placeholders})
+        QUALIFY row_number() OVER (PARTITION BY p.barcode ORDER BY p.id) = 1;
+        """
+        execute = _execute_query
+    try:
+        rows = execute(sql, list(barcodes))
+    except Exception as e:
+        raise RuntimeError(f"Error executing query: {e}")
+    return {str(row.get("barcode")): row for row in rows}
+
+def _lookup_cached(codes: List[str]) -> Dict[str, Optional[Dict]]:
+    """
+    Cache-first Lookup: Treffer (auch negative) kommen aus dem Cache,
+    alle Fehltreffer werden gemeinsam mit einer Query nachgeladen und gecacht.
+    :return: Dict {barcode: product | None} für alle codes
+    """
+    out: Dict[str, Optional[Dict]] = {}
+    missing: List[str] = []
+    for bc in codes:
+        found, product = _product_cache.get(bc)
+        if found:
+            out[bc] = product
+        else:
+            missing.append(bc)
+    if missing:
+        fetched = _query_products_by_barcodes(missing)
+        for bc in missing:
+            product = fetched.get(bc)
+            _product_cache.put(bc, product)
+            out[bc] = product
+    return out
+
+def invalidate_product_cache(barcodes=None) -> int:
+    """
+    Hook für Katalog-Refresh-Jobs: leert den Produkt-Cache komplett (barcodes=None)
+    oder nur für die angegebenen Barcodes.
+    :return: Anzahl entfernter Einträge
+    """
+    if barcodes is None:
+        return _product_cache.invalidate()
+    return _product_cache.invalidate(_normalize_barcodes(barcodes))
+
+def get_product_cache_stats() -> Dict[str, Any]:
+    return _product_cache.stats()
+
+def resolve_barcodes(barcodes) -> List[Dict]:
+    """
+    Batch-Lookup für mehrere Barcodes (z. B. Regal-Scan mit 5–20 Codes).
+    Reihenfolge der Eingabe bleibt erhalten, Fehltreffer werden markiert:
+      [{"barcode": "4001234567890", "exists": True, "product": {...}},
+       {"barcode": "4009999999999", "exists": False, "product": None}, ...]
+    """
+    codes = _normalize_barcodes(barcodes)
+    found = _lookup_cached(codes)
+    return [
+        {"barcode": bc, "exists": found.get(bc) is not None, "product": found.get(bc)}
+        for bc in codes
+    ]
 
 def get_products_by_barcodes(barcodes) -> List[Dict]:
-    products = []
-    for bc in barcodes:
-        product = get_product_by_barcode(bc)
-        if product:
-            products.append(product)
-    return products
+    """
+    Liefert alle gefundenen Produkte in Eingabe-Reihenfolge (eine Query für alle Barcodes).
+    Unbekannte Barcodes werden übersprungen; siehe resolve_barcodes für markierte Fehltreffer.
+    """
+    return [r["product"] for r in resolve_barcodes(barcodes) if r["exists"]]
 
 def get_product_by_barcode(barcode: str) -> Optional[Dict]:
     """
     Liefert das erste Produkt (als Dict) anhand des Barcodes zurück.
-    Nutzt SELECT * über alle LLM-Views (p, a, c, n, o, x, r).
+    Single-Row-Lookup auf `product_lookup` (Fallback: SELECT * über alle LLM-Views p, a, c, n, o, x, r),
+    mit LRU+TTL-Cache davor.
     """
     if not isinstance(barcode, str) or not barcode.strip():
         raise ValueError("Bitte einen gültigen Barcode (String) übergeben.")
 
-    bc = _sql_escape(barcode.strip())
-
-    # Hinweis: Dein Tool fügt nur dann ein LIMIT an, wenn keins vorhanden ist.
-    # Wir setzen bewusst LIMIT 1, damit keine Dubletten zurückkommen.
-    sql = f"""
-    SELECT *
-    FROM v_product_core p
-    LEFT JOIN v_product_allergens a USING (id)
-    LEFT JOIN v_product_claims c USING (id)
-    LEFT JOIN v_product_nutrition n USING (id)
-    LEFT JOIN v_product_origin o USING (id)
-    LEFT JOIN v_product_certifications x USING (id)
-    LEFT JOIN v_product_processing r USING (id)
-    WHERE p.barcode = '{bc}'
-    ORDER BY p.id
-    LIMIT 1;
-    """
-    try:
-        res: Union[str, List[Dict]] = _execute_query(sql)
-    except Exception as e:
-        raise RuntimeError(f"Error executing query: {e}")
-    return res[0] if res else None
\ No newline at end of file
+    normalized = _normalize_barcodes(barcode)
+    bc = normalized[0] if normalized else barcode.strip()
+    return _lookup_cached([bc]).get(bc)
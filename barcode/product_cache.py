@@ -0,0 +1,96 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class ProductCache:
+    """
+    Begrenzter In-Process-Cache (LRU + TTL) für Produkt-Lookups per Barcode.
+
+    - Schlüssel: normalisierter Barcode (siehe barcode._normalize_barcodes)
+    - Treffer leben ``ttl_s`` Sekunden, unbekannte Barcodes (negatives Caching) ``negative_ttl_s``
+    - Bei mehr als ``max_size`` Einträgen wird der am längsten nicht genutzte verdrängt
+    - Thread-safe; Statistiken über stats()
+    """
+
+    def __init__(self, max_size: int = 5000, ttl_s: float = 900.0, negative_ttl_s: float = 120.0):
+        self.max_size = max(1, int(max_size))
+        self.ttl_s = float(ttl_s)
+        self.negative_ttl_s = float(negative_ttl_s)
+        self._data: "OrderedDict[str, Tuple[float, Optional[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "negative_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def get(self, barcode: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        :return: (found, product) – found=True auch bei negativ gecachten Barcodes (product=None)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(barcode)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            expires_at, product = entry
+            if expires_at <= now:
+                del self._data[barcode]
+                self._stats["expirations"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._data.move_to_end(barcode)
+            if product is None:
+                self._stats["negative_hits"] += 1
+                return True, None
+            self._stats["hits"] += 1
+        # Kopie, damit Aufrufer den Cache-Eintrag nicht verändern
+        return True, dict(product)
+
+    def put(self, barcode: str, product: Optional[Dict[str, Any]]) -> None:
+        ttl = self.ttl_s if product is not None else self.negative_ttl_s
+        if ttl <= 0:
+            return
+        value = dict(product) if product is not None else None
+        with self._lock:
+            self._data[barcode] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(barcode)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, barcodes: Optional[Iterable[str]] = None) -> int:
+        """
+        Entfernt die angegebenen Barcodes (oder alles, wenn None).
+        :return: Anzahl entfernter Einträge
+        """
+        with self._lock:
+            if barcodes is None:
+                removed = len(self._data)
+                self._data.clear()
+            else:
+                removed = 0
+                for bc in barcodes:
+                    if self._data.pop(bc, None) is not None:
+                        removed += 1
+            self._stats["invalidations"] += removed
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["negative_hits"] + self._stats["misses"]
+            hit_count = self._stats["hits"] + self._stats["negative_hits"]
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl_s,
+                "negative_ttl_s": self.negative_ttl_s,
+                "hit_rate": (hit_count / lookups) if lookups else None,
+                **self._stats,
+            }
@@ -74,12 +74,13 @@ def setup_checkpoint_db(
 def setup_barcode_db():
     """
     Set up the barcode database.
-    This function checks if the barcode database exists and sets it up if not.
+    Builds the flat, barcode-indexed lookup table from the product views.
+    Run this again after every refresh of the product DB.
     """
-    from barcode.barcode import setup_product_db_sqlite
+    from barcode.barcode import build_product_lookup_table
     try:
-        setup_product_db_sqlite()
-        print("Barcode database setup completed successfully.")
+        rows = build_product_lookup_table()
+        print(f"Barcode database setup completed successfully ({rows} products).")
     except Exception as e:
         print(f"ERROR: Failed to set up barcode database: {e}")
         traceback.print_exc()
@@ -148,6 +149,8 @@ if __name__ == "__main__":
                 setup_product_dbs()
             elif sys.argv[1] == "product_db":
                 setup_product_db("chroma")
+            elif sys.argv[1] == "barcode_db":
+                setup_barcode_db()
 
             else:
                 print(f"Unknown argument: {sys.argv[1]}")